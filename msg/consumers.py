@@ -3,7 +3,8 @@ from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from users.models import CustomUser
 from pets.models import Pet
-from .models import Message
+from pets.popularity import record_message_start
+from .models import Message, starts_conversation
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -62,11 +63,15 @@ class ChatConsumer(AsyncWebsocketConsumer):
         try:
             receiver = CustomUser.objects.get(id=receiver_id)
             pet = Pet.objects.get(id=pet_id)
-            return Message.objects.create(
+            starts = starts_conversation(self.user, pet)
+            message = Message.objects.create(
                 sender=self.user,
                 receiver=receiver,
                 pet=pet,
                 content=content
             )
+            if starts:
+                record_message_start(pet.pk)
+            return message
         except (CustomUser.DoesNotExist, Pet.DoesNotExist):
             return None
\ No newline at end of file
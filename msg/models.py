@@ -1,7 +1,7 @@
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
-from pets.models import Pet
+from pets.models import ArchivedPet, Pet
 
 class Message(models.Model):
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sent_messages')
@@ -19,4 +19,26 @@ class Message(models.Model):
         ]
     
     def __str__(self):
-        return f"From {self.sender} to {self.receiver} about {self.pet}"
\ No newline at end of file
+        return f"From {self.sender} to {self.receiver} about {self.pet}"
+
+
+def starts_conversation(sender, pet):
+    """True if a message from ``sender`` would open a new enquiry about ``pet``."""
+    return sender.pk != pet.owner_id and not Message.objects.filter(sender=sender, pet=pet).exists()
+
+
+class ArchivedMessage(models.Model):
+    """A Message about a listing that has been archived, moved here with it."""
+    id = models.BigIntegerField(primary_key=True)
+    sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_sent_messages')
+    receiver = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_received_messages')
+    pet = models.ForeignKey(ArchivedPet, on_delete=models.CASCADE, related_name='messages')
+    content = models.TextField()
+    timestamp = models.DateTimeField()
+    is_read = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['timestamp']
+
+    def __str__(self):
+        return f"From {self.sender} to {self.receiver} about {self.pet} (archived)"
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from users.models import CustomUser
-from pets.models import Pet
+from pets.models import ArchivedPet, Pet
 from .models import Message
 
 
@@ -56,6 +56,8 @@ class ConversationSerializer(serializers.Serializer):
     pet_detail = PetSerializer(source='pet', read_only=True)
     latest_message = MessageSerializer(allow_null=True)
     unread_count = serializers.IntegerField()
+    # Conversations about archived listings are read-only
+    archived = serializers.SerializerMethodField()
 
     def get_pet(self, obj):
         """
@@ -72,4 +74,7 @@ class ConversationSerializer(serializers.Serializer):
         pet = obj.get('pet') if isinstance(obj, dict) else getattr(obj, 'pet', None)
         if pet:
             return {'id': getattr(pet, 'id', None), 'name': getattr(pet, 'name', '')}
-        return None
\ No newline at end of file
+        return None
+
+    def get_archived(self, obj):
+        return isinstance(obj.get('pet'), ArchivedPet)
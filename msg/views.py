@@ -1,7 +1,9 @@
 from django.db import models
 from rest_framework import generics, permissions
 from rest_framework.response import Response
-from .models import Message
+from pets.popularity import record_message_start
+from pets.models import ArchivedPet
+from .models import ArchivedMessage, Message, starts_conversation
 from .serializers import MessageSerializer, ConversationSerializer
 from .permissions import IsMessageParticipant
 
@@ -11,7 +13,11 @@ class SendMessageView(generics.CreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def perform_create(self, serializer):
+        pet = serializer.validated_data['pet']
+        starts = starts_conversation(self.request.user, pet)
         serializer.save(sender=self.request.user)
+        if starts:
+            record_message_start(pet.pk)
 
 class ConversationListView(generics.ListAPIView):
     serializer_class = ConversationSerializer
@@ -19,30 +25,36 @@ class ConversationListView(generics.ListAPIView):
     
     def get_queryset(self):
         user = self.request.user
-        messages = Message.objects.filter(
-            models.Q(sender=user) | models.Q(receiver=user)
-        ).select_related('sender', 'receiver', 'pet').order_by('-timestamp')
-        
         conversations = {}
-        for message in messages:
-            other_user = message.receiver if message.sender == user else message.sender
-            key = (other_user.id, message.pet.id)
-            if key not in conversations:
-                conversations[key] = {
-                    'other_user': other_user,
-                    'pet': message.pet,
-                    'latest_message': message,
-                    'unread_count': Message.objects.filter(
-                        models.Q(sender=other_user, receiver=user, pet=message.pet, is_read=False)
-                    ).count()
-                }
-        return list(conversations.values())
+        # Conversations about archived listings were moved to ArchivedMessage with them
+        for model in (Message, ArchivedMessage):
+            messages = model.objects.filter(
+                models.Q(sender=user) | models.Q(receiver=user)
+            ).select_related('sender', 'receiver', 'pet').order_by('-timestamp')
+
+            for message in messages:
+                other_user = message.receiver if message.sender == user else message.sender
+                key = (other_user.id, message.pet.id)
+                if key not in conversations:
+                    conversations[key] = {
+                        'other_user': other_user,
+                        'pet': message.pet,
+                        'latest_message': message,
+                        'unread_count': model.objects.filter(
+                            models.Q(sender=other_user, receiver=user, pet=message.pet, is_read=False)
+                        ).count()
+                    }
+        return sorted(conversations.values(), key=lambda conversation: conversation['latest_message'].timestamp, reverse=True)
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
+def message_model(pet_id):
+    """The model holding the messages about ``pet_id``, live or archived."""
+    return ArchivedMessage if ArchivedPet.objects.filter(pk=pet_id).exists() else Message
+
 class ConversationDetailView(generics.ListAPIView):
     serializer_class = MessageSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -51,15 +63,16 @@ class ConversationDetailView(generics.ListAPIView):
         user = self.request.user
         other_user_id = self.kwargs['user_id']
         pet_id = self.kwargs['pet_id']
+        model = message_model(pet_id)
         
-        Message.objects.filter(
+        model.objects.filter(
             sender__id=other_user_id,
             receiver=user,
             pet__id=pet_id,
             is_read=False
         ).update(is_read=True)
         
-        return Message.objects.filter(
+        return model.objects.filter(
             models.Q(sender=user, receiver__id=other_user_id) |
             models.Q(sender__id=other_user_id, receiver=user),
             pet__id=pet_id
@@ -74,8 +87,9 @@ class MarkMessagesReadView(generics.UpdateAPIView):
         user = self.request.user
         other_user_id = self.kwargs['user_id']
         pet_id = self.kwargs['pet_id']
+        model = message_model(pet_id)
         
-        Message.objects.filter(
+        model.objects.filter(
             sender__id=other_user_id,
             receiver=user,
             pet__id=pet_id,
@@ -15,6 +15,7 @@ from datetime import timedelta
 from decouple import config
 import dj_database_url
 import os
+import tempfile
 import cloudinary
 import cloudinary.uploader
 import cloudinary.api
@@ -108,6 +109,93 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Cache
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='petnest'),
+    }
+}
+PET_CACHE_TIMEOUT = config('PET_CACHE_TIMEOUT', default=300, cast=int)
+PET_CACHE_LOCK_TIMEOUT = config('PET_CACHE_LOCK_TIMEOUT', default=10, cast=int)
+PET_CACHE_LOCK_WAIT = config('PET_CACHE_LOCK_WAIT', default=2.0, cast=float)
+# Final payment statuses, so repeated gateway callbacks skip the database
+PAYMENT_STATUS_CACHE_TIMEOUT = config('PAYMENT_STATUS_CACHE_TIMEOUT', default=3600, cast=int)
+PET_FAST_LIST_SERIALIZER = config('PET_FAST_LIST_SERIALIZER', default=True, cast=bool)
+
+# Popularity: detail views and message starts are buffered per process and
+# flushed in batches; update_trending_scores decays and re-ranks on a schedule.
+PET_COUNTER_FLUSH_SECONDS = config('PET_COUNTER_FLUSH_SECONDS', default=10, cast=float)
+PET_COUNTER_MAX_PENDING = config('PET_COUNTER_MAX_PENDING', default=5000, cast=int)
+PET_TRENDING_HALF_LIFE_HOURS = config('PET_TRENDING_HALF_LIFE_HOURS', default=24, cast=float)
+PET_TRENDING_MESSAGE_WEIGHT = config('PET_TRENDING_MESSAGE_WEIGHT', default=10, cast=float)
+PET_TRENDING_MIN_SCORE = config('PET_TRENDING_MIN_SCORE', default=0.01, cast=float)
+
+# Breed / name typeahead index, held in memory by every worker
+AUTOCOMPLETE_MAX_TERMS = config('AUTOCOMPLETE_MAX_TERMS', default=20000, cast=int)
+AUTOCOMPLETE_REBUILD_SECONDS = config('AUTOCOMPLETE_REBUILD_SECONDS', default=600, cast=int)
+
+# "Similar pets" vectors, written by the build_pet_vectors command and
+# loaded by every worker; new listings are added in-process in between.
+# Until the command has run once, pets have no similar pets.
+PET_VECTORS_PATH = config('PET_VECTORS_PATH', default=str(BASE_DIR / 'pet_vectors.npz'))
+PET_VECTORS_MAX_TERMS = config('PET_VECTORS_MAX_TERMS', default=2000, cast=int)
+PET_VECTORS_MIN_DF = config('PET_VECTORS_MIN_DF', default=2, cast=int)
+PET_VECTORS_RELOAD_SECONDS = config('PET_VECTORS_RELOAD_SECONDS', default=60, cast=int)
+
+# Bulk pet imports and exports
+PET_IMPORT_BATCH_SIZE = config('PET_IMPORT_BATCH_SIZE', default=500, cast=int)
+PET_IMPORT_MAX_ERRORS = config('PET_IMPORT_MAX_ERRORS', default=1000, cast=int)
+PET_IMPORT_MAX_IMAGES = config('PET_IMPORT_MAX_IMAGES', default=5, cast=int)
+PET_IMPORT_IMAGE_ATTEMPTS = config('PET_IMPORT_IMAGE_ATTEMPTS', default=3, cast=int)
+PET_IMPORT_IMAGE_TIMEOUT = config('PET_IMPORT_IMAGE_TIMEOUT', default=10, cast=float)
+PET_EXPORT_CHUNK_SIZE = config('PET_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Pet image uploads. PET_IMAGE_STORAGE can point at
+# pets.storage.LocalStubImageStorage to work offline.
+PET_IMAGE_STORAGE = config('PET_IMAGE_STORAGE', default='pets.storage.CloudinaryImageStorage')
+PET_IMAGE_STORAGE_LATENCY = config('PET_IMAGE_STORAGE_LATENCY', default=0.2, cast=float)
+PET_IMAGE_UPLOAD_WORKERS = config('PET_IMAGE_UPLOAD_WORKERS', default=5, cast=int)
+
+# New listing photos are staged in a temporary directory (the app directory
+# is read-only on Vercel) and resized/uploaded after the request commits:
+# by an in-process worker pool where processes outlive their requests, or
+# before the response is sent where they don't, since a serverless runtime
+# freezes threads once the response is out. Run process_pet_images
+# periodically (e.g. cron) to sweep up anything left pending.
+PET_IMAGE_STAGING_DIR = config(
+    'PET_IMAGE_STAGING_DIR', default=os.path.join(tempfile.gettempdir(), 'petnest-staged-images')
+)
+PET_IMAGE_PROCESS_IN_BACKGROUND = config(
+    'PET_IMAGE_PROCESS_IN_BACKGROUND', default=not os.environ.get('VERCEL'), cast=bool
+)
+PET_IMAGE_PROCESSING_WORKERS = config('PET_IMAGE_PROCESSING_WORKERS', default=2, cast=int)
+PET_IMAGE_PENDING_GRACE = config('PET_IMAGE_PENDING_GRACE', default=600, cast=int)
+PET_IMAGE_MAX_DIMENSION = config('PET_IMAGE_MAX_DIMENSION', default=1600, cast=int)
+PET_IMAGE_JPEG_QUALITY = config('PET_IMAGE_JPEG_QUALITY', default=85, cast=int)
+
+# Uploads are deduplicated by content hash; this also matches visually
+# identical pet photos (same perceptual hash) that differ byte for byte.
+# ID scans and profile pictures only ever share exact copies.
+IMAGE_ASSET_NEAR_DUPLICATES = config('IMAGE_ASSET_NEAR_DUPLICATES', default=False, cast=bool)
+
+# Listings unavailable this long are moved to the archive tables
+PET_ARCHIVE_AFTER_DAYS = config('PET_ARCHIVE_AFTER_DAYS', default=90, cast=int)
+PET_ARCHIVE_BATCH_SIZE = config('PET_ARCHIVE_BATCH_SIZE', default=500, cast=int)
+
+# Delta sync (/pets/changes/): tokens older than the tombstones are refused,
+# and the newest few seconds are held back for in-flight transactions.
+PET_SYNC_TOMBSTONE_DAYS = config('PET_SYNC_TOMBSTONE_DAYS', default=30, cast=int)
+PET_SYNC_SETTLE_SECONDS = config('PET_SYNC_SETTLE_SECONDS', default=5, cast=int)
+
+# Saved searches, matched against listings as they are created or updated
+SAVED_SEARCH_MAX_PER_USER = config('SAVED_SEARCH_MAX_PER_USER', default=20, cast=int)
+
+# Direct-to-storage uploads
+UPLOAD_TICKET_TTL = config('UPLOAD_TICKET_TTL', default=600, cast=int)
+UPLOAD_TICKET_CLOCK_SKEW = config('UPLOAD_TICKET_CLOCK_SKEW', default=60, cast=int)
+UPLOAD_TICKET_MAX = config('UPLOAD_TICKET_MAX', default=5, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -171,6 +259,25 @@ SSLCOMMERZ_SUCCESS_URL = config('SSLCOMMERZ_SUCCESS_URL')
 SSLCOMMERZ_FAIL_URL = config('SSLCOMMERZ_FAIL_URL')
 SSLCOMMERZ_CANCEL_URL = config('SSLCOMMERZ_CANCEL_URL')
 
+# Payment sessions are opened after the pet and its pending payment commit;
+# reconcile_payments retries the ones the gateway did not answer.
+# PAYMENT_GATEWAY can point at pets.payments.FakePaymentGateway to work offline.
+PAYMENT_GATEWAY = config('PAYMENT_GATEWAY', default='pets.payments.SSLCommerzGateway')
+PAYMENT_GATEWAY_TIMEOUT = config('PAYMENT_GATEWAY_TIMEOUT', default=10, cast=float)
+# One keep-alive pool per process; the circuit opens after that many
+# consecutive gateway errors and lets a trial call through after the reset.
+PAYMENT_GATEWAY_URL = config('PAYMENT_GATEWAY_URL', default='')
+PAYMENT_GATEWAY_CONNECT_TIMEOUT = config('PAYMENT_GATEWAY_CONNECT_TIMEOUT', default=3.05, cast=float)
+PAYMENT_GATEWAY_POOL_SIZE = config('PAYMENT_GATEWAY_POOL_SIZE', default=10, cast=int)
+PAYMENT_GATEWAY_CIRCUIT_FAILURES = config('PAYMENT_GATEWAY_CIRCUIT_FAILURES', default=5, cast=int)
+PAYMENT_GATEWAY_CIRCUIT_RESET_SECONDS = config('PAYMENT_GATEWAY_CIRCUIT_RESET_SECONDS', default=30, cast=float)
+PAYMENT_SESSION_TRIES = config('PAYMENT_SESSION_TRIES', default=2, cast=int)
+PAYMENT_SESSION_RETRY_DELAY = config('PAYMENT_SESSION_RETRY_DELAY', default=1.0, cast=float)
+PAYMENT_SESSION_MAX_ATTEMPTS = config('PAYMENT_SESSION_MAX_ATTEMPTS', default=8, cast=int)
+FAKE_PAYMENT_GATEWAY_LATENCY = config('FAKE_PAYMENT_GATEWAY_LATENCY', default=0.5, cast=float)
+FAKE_PAYMENT_GATEWAY_ERROR_RATE = config('FAKE_PAYMENT_GATEWAY_ERROR_RATE', default=0.0, cast=float)
+FAKE_PAYMENT_GATEWAY_REJECT_RATE = config('FAKE_PAYMENT_GATEWAY_REJECT_RATE', default=0.0, cast=float)
+
 # Email settings
 EMAIL_BACKEND = config('EMAIL_BACKEND')
 EMAIL_HOST = config('EMAIL_HOST')
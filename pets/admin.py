@@ -1,6 +1,9 @@
 from django.contrib import admin
-from .models import Pet, PetImage, Payment
+from .models import ArchivedPet, Pet, PetImage, PetImageImport, Payment, SavedSearch
 
 admin.site.register(Pet)
 admin.site.register(PetImage)
+admin.site.register(PetImageImport)
 admin.site.register(Payment)
+admin.site.register(ArchivedPet)
+admin.site.register(SavedSearch)
@@ -1,6 +1,22 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def ensure_search_index(sender, using, **kwargs):
+    from django.db import connections
+    from django.db.migrations.recorder import MigrationRecorder
+    from .search import install_search_index
+
+    connection = connections[using]
+    applied = MigrationRecorder(connection).applied_migrations()
+    if ('pets', '0004_pet_search_index') in applied:
+        install_search_index(connection)
 
 
 class PetsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pets'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        post_migrate.connect(ensure_search_index, sender=self)
@@ -0,0 +1,87 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from msg.models import ArchivedMessage, Message
+from users.models import Post
+from .models import ArchivedPet, ArchivedPetImage, Payment, Pet, PetImage
+
+logger = logging.getLogger(__name__)
+
+PET_FIELDS = (
+    'id', 'owner_id', 'name', 'pet_type', 'breed', 'age', 'gender', 'description',
+    'is_for_adoption', 'price', 'availability', 'created_at', 'updated_at'
+)
+IMAGE_FIELDS = ('id', 'pet_id', 'image', 'status', 'variants', 'uploaded_at')
+MESSAGE_FIELDS = ('id', 'sender_id', 'receiver_id', 'pet_id', 'content', 'timestamp', 'is_read')
+
+
+def archivable_pets(days=None):
+    """
+    Pets unavailable and untouched for ``days``, excluding any with a
+    payment still pending, whose callback must find the live row.
+    """
+    days = settings.PET_ARCHIVE_AFTER_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    return (
+        Pet.objects.filter(availability=False, updated_at__lt=cutoff)
+        .exclude(payments__status=Payment.Status.PENDING)
+        .order_by('id')
+    )
+
+
+def _copy(model, rows, fields):
+    return model.objects.bulk_create([model(**{field: getattr(row, field) for field in fields}) for row in rows])
+
+
+def archive_batch(pet_ids):
+    """
+    Move the given pets with their images and messages to the archive
+    tables and repoint their payments and posts, in one transaction.
+    Returns the number of pets archived.
+    """
+    with transaction.atomic():
+        # Re-check under lock; a pet may have been relisted or paid for since
+        pets = list(
+            Pet.objects.select_for_update().filter(pk__in=pet_ids, availability=False)
+            .exclude(payments__status=Payment.Status.PENDING)
+        )
+        if not pets:
+            return 0
+        ids = [pet.pk for pet in pets]
+        images = PetImage.objects.filter(pet_id__in=ids)
+        messages = Message.objects.filter(pet_id__in=ids)
+
+        _copy(ArchivedPet, pets, PET_FIELDS)
+        _copy(ArchivedPetImage, images, IMAGE_FIELDS)
+        _copy(ArchivedMessage, messages, MESSAGE_FIELDS)
+        for model in (Payment, Post):
+            # SET reads the old row, so archived_pet takes the pet id before it is cleared
+            model.objects.filter(pet_id__in=ids).update(archived_pet_id=F('pet_id'), pet=None)
+
+        # The stored image files now belong to the archived rows, so skip
+        # the PetImage delete signals that would release them.
+        images._raw_delete(images.db)
+        messages._raw_delete(messages.db)
+        Pet.objects.filter(pk__in=ids).delete()
+    return len(ids)
+
+
+def archive_pets(days=None, batch_size=None, limit=None):
+    """Archive every archivable pet in batches. Returns the number archived."""
+    batch_size = batch_size or settings.PET_ARCHIVE_BATCH_SIZE
+    archived = 0
+    last_id = 0
+    while limit is None or archived < limit:
+        size = batch_size if limit is None else min(batch_size, limit - archived)
+        ids = list(archivable_pets(days).filter(pk__gt=last_id).values_list('pk', flat=True)[:size])
+        if not ids:
+            break
+        last_id = ids[-1]
+        archived += archive_batch(ids)
+        logger.info(f"Archived {archived} pets so far")
+    return archived
@@ -0,0 +1,178 @@
+import hashlib
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from PIL import Image
+
+from .models import ImageAsset
+from .storage import discard_uploads, get_image_storage, upload_images
+from .uploads import is_stored
+from .variants import stored_value
+
+logger = logging.getLogger(__name__)
+
+
+def _rewind(file):
+    if hasattr(file, 'seek'):
+        file.seek(0)
+
+
+def content_hash(file):
+    """SHA-256 of a file's bytes, leaving it rewound for the upload."""
+    _rewind(file)
+    digest = hashlib.sha256()
+    for chunk in file.chunks() if hasattr(file, 'chunks') else iter(lambda: file.read(64 * 1024), b''):
+        digest.update(chunk)
+    _rewind(file)
+    return digest.hexdigest()
+
+
+def perceptual_hash(file):
+    """
+    64-bit difference hash: identical for the same photo after resizing or
+    re-encoding. Returns '' for anything Pillow cannot open.
+    """
+    _rewind(file)
+    try:
+        with Image.open(file) as image:
+            pixels = list(image.convert('L').resize((9, 8), Image.Resampling.LANCZOS).getdata())
+    except Exception:
+        return ''
+    finally:
+        _rewind(file)
+    bits = 0
+    for row in range(8):
+        for column in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + column] > pixels[row * 9 + column + 1])
+    return f'{bits:016x}'
+
+
+def _retain(asset_id, refs):
+    # Fails once the last reference is gone and the asset is being deleted
+    return ImageAsset.objects.filter(pk=asset_id, ref_count__gt=0).update(ref_count=F('ref_count') + refs) == 1
+
+
+def _find(sha256, phash):
+    asset = ImageAsset.objects.filter(sha256=sha256).first()
+    if asset is None and phash:
+        asset = ImageAsset.objects.filter(phash=phash).order_by('id').first()
+    return asset
+
+
+def _reuse(sha256, phash, refs):
+    asset = _find(sha256, phash)
+    if asset is not None and _retain(asset.pk, refs):
+        asset.ref_count += refs
+        return asset
+    return None
+
+
+def _register(sha256, phash, resource, refs):
+    try:
+        with transaction.atomic():
+            return ImageAsset.objects.create(sha256=sha256, phash=phash, resource=resource, ref_count=refs)
+    except IntegrityError:
+        # Someone stored the same bytes meanwhile; use theirs, drop ours
+        asset = _reuse(sha256, '', refs)
+        if asset is None:
+            raise
+        discard_uploads([resource])
+        return asset
+
+
+def pet_photo_near_duplicates():
+    # Only pet photos may share an asset by perceptual hash: a look-alike
+    # ID card or profile picture belongs to somebody else.
+    return settings.IMAGE_ASSET_NEAR_DUPLICATES
+
+
+def _fingerprint(file, near_duplicates):
+    return content_hash(file), perceptual_hash(file) if near_duplicates else ''
+
+
+def acquire(file, field, prepare=None, near_duplicates=False, refs=1):
+    """
+    The stored asset for ``file``'s content with ``refs`` more references,
+    uploading it (after ``prepare(file)`` if given) only when no asset with
+    the same bytes, or with ``near_duplicates`` the same perceptual hash,
+    exists yet.
+    """
+    sha256, phash = _fingerprint(file, near_duplicates)
+    asset = _reuse(sha256, phash, refs)
+    if asset is not None:
+        return asset
+    options = {'type': field.type, 'resource_type': field.resource_type, **field.options}
+    resource = get_image_storage().upload(prepare(file) if prepare else file, **options)
+    return _register(sha256, phash, resource, refs)
+
+
+def store_upload(value, field, refs=1, near_duplicates=False):
+    """
+    Stored resource for a SignedUploadField value: direct uploads are used
+    as they are, files go through acquire().
+    """
+    if is_stored(value):
+        return value
+    return acquire(value, field, near_duplicates=near_duplicates, refs=refs).resource
+
+
+def acquire_many(files, field, near_duplicates=False):
+    """
+    acquire() for several files at once, one reference each, with the
+    missing ones uploaded concurrently. Repeats within ``files`` upload once.
+    """
+    fingerprints = [_fingerprint(file, near_duplicates) for file in files]
+    assets, missing, retained = {}, {}, []
+    try:
+        for file, (sha256, phash) in zip(files, fingerprints):
+            if sha256 in assets:
+                _retain(assets[sha256].pk, 1)
+                retained.append(assets[sha256])
+            elif sha256 in missing:
+                missing[sha256][2] += 1
+            else:
+                asset = _reuse(sha256, phash, 1)
+                if asset is not None:
+                    assets[sha256] = asset
+                    retained.append(asset)
+                else:
+                    missing[sha256] = [file, phash, 1]
+        pending = list(missing.items())
+        resources = upload_images([file for _, (file, _, _) in pending], field)
+    except Exception:
+        release_assets(retained)
+        raise
+    for (sha256, (_, phash, refs)), resource in zip(pending, resources):
+        assets[sha256] = _register(sha256, phash, resource, refs)
+    return [assets[sha256] for sha256, _ in fingerprints]
+
+
+def release(resource):
+    """
+    Drop one reference to the asset stored as ``resource``; the last one
+    deletes the asset and, after commit, the stored file. Returns False for
+    resources that predate the registry, which are left alone.
+    """
+    stored = stored_value(resource)
+    if not stored:
+        return False
+    asset = ImageAsset.objects.filter(resource=stored).first()
+    if asset is None:
+        return False
+    _release(asset)
+    return True
+
+
+def release_assets(assets):
+    for asset in assets:
+        _release(asset)
+
+
+def _release(asset):
+    ImageAsset.objects.filter(pk=asset.pk).update(ref_count=F('ref_count') - 1)
+    deleted, _ = ImageAsset.objects.filter(pk=asset.pk, ref_count__lte=0).delete()
+    if deleted:
+        resource = asset.resource
+        transaction.on_commit(lambda: discard_uploads([resource]))
@@ -0,0 +1,134 @@
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db.models import Count
+
+from .models import Pet
+
+KINDS = ('breed', 'name')
+
+
+def normalize(text):
+    return ' '.join((text or '').lower().split())
+
+
+class PrefixIndex:
+    """
+    Sorted array of (normalized term, kind) keys with listing-count weights.
+
+    A lookup is a binary search to the first key sharing the prefix followed
+    by a bounded forward scan, so it never touches the database. Results for
+    repeated prefixes are memoized until the next write. When the number of
+    terms exceeds ``max_terms`` the lightest terms are evicted.
+    """
+
+    def __init__(self, max_terms, max_scan=500, max_cached=1024):
+        self.max_terms = max_terms
+        self.max_scan = max_scan
+        self.max_cached = max_cached
+        self._keys = []
+        self._entries = {}
+        self._results = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, kind, text, delta=1):
+        key = (normalize(text), kind)
+        if not key[0]:
+            return
+        with self._lock:
+            self._results.clear()
+            entry = self._entries.get(key)
+            if entry is None:
+                if delta <= 0:
+                    return
+                self._entries[key] = [delta, text]
+                insort(self._keys, key)
+                if len(self._keys) > self.max_terms:
+                    self._evict()
+                return
+            entry[0] += delta
+            if delta > 0:
+                entry[1] = text
+            if entry[0] <= 0:
+                del self._entries[key]
+                del self._keys[bisect_left(self._keys, key)]
+
+    def _evict(self):
+        # Drop down to 90% of the budget in one pass so inserts near the
+        # limit do not pay for a scan each time.
+        target = int(self.max_terms * 0.9)
+        doomed = sorted(self._entries, key=lambda k: self._entries[k][0])[:len(self._entries) - target]
+        for key in doomed:
+            del self._entries[key]
+        doomed = set(doomed)
+        self._keys = [key for key in self._keys if key not in doomed]
+
+    def lookup(self, prefix, kind=None, limit=10):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        cache_key = (prefix, kind, limit)
+        cached = self._results.get(cache_key)
+        if cached is not None:
+            return cached
+        with self._lock:
+            matches = []
+            index = bisect_left(self._keys, (prefix,))
+            end = min(len(self._keys), index + self.max_scan)
+            while index < end:
+                key = self._keys[index]
+                if not key[0].startswith(prefix):
+                    break
+                if kind is None or key[1] == kind:
+                    weight, display = self._entries[key]
+                    matches.append((weight, key[1], display))
+                index += 1
+            matches.sort(key=lambda match: (-match[0], match[2]))
+            results = [{'value': display, 'kind': kind_, 'count': weight} for weight, kind_, display in matches[:limit]]
+            if len(self._results) >= self.max_cached:
+                self._results.clear()
+            self._results[cache_key] = results
+        return results
+
+
+_index = None
+_built_at = 0.0
+_build_lock = threading.Lock()
+
+
+def build_index():
+    index = PrefixIndex(settings.AUTOCOMPLETE_MAX_TERMS)
+    available = Pet.objects.filter(availability=True).order_by()
+    for kind in KINDS:
+        for row in available.values(kind).annotate(count=Count('pk')).order_by('-count')[:settings.AUTOCOMPLETE_MAX_TERMS]:
+            index.add(kind, row[kind], row['count'])
+    return index
+
+
+def get_index():
+    """
+    The process-wide index, built on first use and rebuilt after
+    AUTOCOMPLETE_REBUILD_SECONDS to pick up writes made by other processes.
+    """
+    global _index, _built_at
+    if _index is None or time.monotonic() - _built_at > settings.AUTOCOMPLETE_REBUILD_SECONDS:
+        with _build_lock:
+            if _index is None or time.monotonic() - _built_at > settings.AUTOCOMPLETE_REBUILD_SECONDS:
+                _index = build_index()
+                _built_at = time.monotonic()
+    return _index
+
+
+def apply_change(old_state, new_state):
+    """Update the in-process index for a pet that changed in this process."""
+    if _index is None:
+        return
+    for state, delta in ((old_state, -1), (new_state, 1)):
+        if state and state.get('availability'):
+            for kind in KINDS:
+                _index.add(kind, state[kind], delta)
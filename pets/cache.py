@@ -0,0 +1,117 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+CATALOG_VERSION_KEY = 'pets:catalog:version'
+PET_VERSION_KEY = 'pets:pet:{pk}:version'
+
+
+def _fresh_version():
+    # Seeded from the clock so an evicted counter never falls back to a
+    # version that still has entries cached under it.
+    return int(time.time() * 1000)
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _fresh_version(), None)
+        version = cache.get(key) or _fresh_version()
+    return version
+
+
+def bump_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _fresh_version()
+        cache.set(key, version, None)
+        return version
+
+
+def catalog_version():
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def pet_version(pk):
+    return get_version(PET_VERSION_KEY.format(pk=pk))
+
+
+def bump_catalog_version():
+    return bump_version(CATALOG_VERSION_KEY)
+
+
+def bump_pet_version(pk):
+    return bump_version(PET_VERSION_KEY.format(pk=pk))
+
+
+def normalized_params(query_params):
+    """
+    Canonical form of a query string: blank values dropped, keys and repeated
+    values sorted, so equivalent filter sets share one cache entry.
+    """
+    items = []
+    for key in sorted(query_params.keys()):
+        values = sorted(v for v in query_params.getlist(key) if v != '')
+        items.extend((key, value) for value in values)
+    return items
+
+
+def _digest(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def list_cache_key(request):
+    digest = _digest(request.get_host(), request.path, normalized_params(request.query_params))
+    return f'pets:list:{catalog_version()}:{digest}'
+
+
+def detail_cache_key(request, pk):
+    digest = _digest(request.get_host(), request.path, normalized_params(request.query_params))
+    return f'pets:detail:{pk}:{pet_version(pk)}:{digest}'
+
+
+def get_or_build(key, build, timeout=None):
+    """
+    Return the cached value for ``key`` or build and store it. Only one
+    caller rebuilds a missing entry; the rest wait briefly for its result
+    and only build themselves if the holder of the lock takes too long.
+    """
+    if timeout is None:
+        timeout = settings.PET_CACHE_TIMEOUT
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, settings.PET_CACHE_LOCK_TIMEOUT):
+        try:
+            value = build()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    deadline = time.monotonic() + settings.PET_CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    return build()
+
+
+def payment_status_key(transaction_id):
+    return f'pets:payment:{_digest(transaction_id)}:status'
+
+
+def cached_payment_status(transaction_id):
+    """The final status recorded for a payment, or None if unknown or still pending."""
+    return cache.get(payment_status_key(transaction_id))
+
+
+def remember_payment_status(transaction_id, status):
+    # Only final statuses are stored; they never change again
+    cache.set(payment_status_key(transaction_id), status, settings.PAYMENT_STATUS_CACHE_TIMEOUT)
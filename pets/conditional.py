@@ -0,0 +1,63 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .cache import list_cache_key
+from .models import Pet
+
+
+def make_etag(*parts):
+    return '"%s"' % hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def pet_validators(pk):
+    """
+    ETag and Last-Modified for a single pet, derived from its updated_at and
+    its images in one aggregate query. Returns (None, None) for unknown pets
+    so the view can 404 as usual.
+    """
+    row = (
+        Pet.objects.filter(pk=pk)
+        .annotate(last_image=Max('images__uploaded_at'), image_count=Count('images'))
+        .values('updated_at', 'last_image', 'image_count')
+        .first()
+    )
+    if row is None:
+        return None, None
+    last_modified = max(filter(None, (row['updated_at'], row['last_image'])))
+    etag = make_etag(pk, row['updated_at'], row['last_image'], row['image_count'])
+    return etag, last_modified
+
+
+def list_validators(request):
+    """
+    ETag for a filtered listing: the catalog version, bumped on every
+    change that can alter a listing, tied to the exact query string. No
+    query runs, so a cached page is revalidated for free. There is no
+    Last-Modified, as the version says nothing about when.
+    """
+    return make_etag(list_cache_key(request)), None
+
+
+def not_modified_response(request, etag, last_modified):
+    """
+    A 304 response when the client's If-None-Match / If-Modified-Since
+    validators still hold, otherwise None.
+    """
+    if etag is None:
+        return None
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
@@ -0,0 +1,137 @@
+import csv
+import json
+import zlib
+from itertools import chain, islice
+
+from django.conf import settings
+
+from .fastpath import PetRowSerializer
+from .models import Pet, PetTombstone
+from .serializers import PetSerializer
+from .sync import settle_horizon
+
+OUTPUTS = ('ndjson', 'csv')
+CONTENT_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+class _Line:
+    """Write target for csv.writer that hands the formatted line back."""
+
+    def write(self, value):
+        return value
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def export_queryset(updated_since=None, until=None):
+    """
+    Pets changed at or after ``updated_since`` (all pets without it) and no
+    later than ``until``. Pass sync.settle_horizon() as ``until`` and use
+    it as the next ``updated_since``: late-committing rows are then picked
+    up by the next pull instead of falling behind it.
+    """
+    queryset = Pet.objects.all()
+    if updated_since is not None:
+        queryset = queryset.filter(updated_at__gte=updated_since)
+    if until is not None:
+        queryset = queryset.filter(updated_at__lte=until)
+    return queryset
+
+
+def export_removals(updated_since, until):
+    """``{'id': ..., 'deleted': True}`` for each pet deleted or archived in the window."""
+    tombstones = (
+        PetTombstone.objects.filter(deleted_at__gte=updated_since, deleted_at__lte=until)
+        .order_by('pet_id').values_list('pet_id', flat=True)
+    )
+    for pk in tombstones.iterator():
+        yield {'id': pk, 'deleted': True}
+
+
+def export_fields(removals=False):
+    """Names of the exported fields, plus ``deleted`` for exports that list removals."""
+    plan = PetRowSerializer.for_serializer(PetSerializer()).plan
+    return [name for name, *_ in plan] + (['deleted'] if removals else [])
+
+
+def export_items(queryset, chunk_size=None):
+    """
+    Full PetSerializer representations of ``queryset`` in id order, read
+    through a server-side cursor and serialized a chunk at a time (one
+    image query per chunk), so memory does not grow with the catalog.
+    """
+    chunk_size = chunk_size or settings.PET_EXPORT_CHUNK_SIZE
+    row_serializer = PetRowSerializer.for_serializer(PetSerializer())
+    rows = queryset.order_by('id').values(*row_serializer.columns).iterator(chunk_size=chunk_size)
+    for chunk in _chunks(rows, chunk_size):
+        yield from row_serializer.serialize(chunk)
+
+
+def _csv_value(name, value):
+    if name == 'images_data' and value:
+        # Same image_urls layout the CSV importer reads
+        return '|'.join(image['image'] for image in value if image['image'])
+    return value
+
+
+def render_lines(items, output, fields=None):
+    if output == 'csv':
+        # The header goes out even when there are no rows
+        writer = csv.writer(_Line())
+        header = fields or export_fields()
+        yield writer.writerow(['image_urls' if name == 'images_data' else name for name in header])
+        for item in items:
+            yield writer.writerow([_csv_value(name, item.get(name, '')) for name in header])
+    else:
+        for item in items:
+            yield json.dumps(item, separators=(',', ':')) + '\n'
+
+
+def render_export(items, output, compress=False, buffer_size=64 * 1024, fields=None):
+    """
+    Encode ``items`` as NDJSON or CSV byte chunks of roughly
+    ``buffer_size``, gzipped on the fly when ``compress`` is set. ``fields``
+    are the CSV columns, export_fields() by default.
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer, size = [], 0
+    for line in render_lines(items, output, fields):
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= buffer_size:
+            chunk = b''.join(buffer)
+            buffer, size = [], 0
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+    chunk = b''.join(buffer)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def export_catalog(output, updated_since=None, compress=False, chunk_size=None):
+    """
+    Byte chunks of the export, and the ``updated_since`` to pass for the
+    next one. Incremental exports end with the pets removed since
+    ``updated_since``.
+    """
+    until = settle_horizon()
+    items = export_items(export_queryset(updated_since, until), chunk_size=chunk_size)
+    if updated_since is not None:
+        items = chain(items, export_removals(updated_since, until))
+    fields = export_fields(removals=updated_since is not None)
+    return render_export(items, output, compress=compress, fields=fields), until
+
+
+def export_filename(output, compress=False):
+    return f"pets.{output}" + ('.gz' if compress else '')
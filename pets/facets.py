@@ -0,0 +1,108 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+from .models import Pet, PetFacetCount
+
+FACETS = ('pet_type', 'gender', 'listing', 'breed')
+TOP_BREEDS = 10
+
+
+def facet_values(state):
+    """Facet -> value pairs a pet contributes to, or {} if it is not listed."""
+    if not state or not state.get('availability'):
+        return {}
+    return {
+        'pet_type': state['pet_type'],
+        'gender': state['gender'],
+        'listing': 'adoption' if state['is_for_adoption'] else 'sale',
+        'breed': state['breed'],
+    }
+
+
+def apply_facet_change(old_state, new_state):
+    """Move a pet's contribution from its old facet values to its new ones."""
+    old, new = facet_values(old_state), facet_values(new_state)
+    for facet in FACETS:
+        if old.get(facet) == new.get(facet):
+            continue
+        if facet in old:
+            increment_facet(facet, old[facet], -1)
+        if facet in new:
+            increment_facet(facet, new[facet], 1)
+
+
+def increment_facet(facet, value, delta):
+    updated = PetFacetCount.objects.filter(facet=facet, value=value).update(count=F('count') + delta)
+    if updated or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            PetFacetCount.objects.create(facet=facet, value=value, count=delta)
+    except IntegrityError:
+        # Another writer created the row first
+        PetFacetCount.objects.filter(facet=facet, value=value).update(count=F('count') + delta)
+
+
+def rebuild_facet_counts():
+    available = Pet.objects.filter(availability=True).order_by()
+    rows = []
+    for facet, field in (('pet_type', 'pet_type'), ('gender', 'gender'), ('breed', 'breed')):
+        for row in available.values(field).annotate(count=Count('pk')):
+            rows.append(PetFacetCount(facet=facet, value=row[field], count=row['count']))
+    for row in available.values('is_for_adoption').annotate(count=Count('pk')):
+        value = 'adoption' if row['is_for_adoption'] else 'sale'
+        rows.append(PetFacetCount(facet='listing', value=value, count=row['count']))
+    with transaction.atomic():
+        PetFacetCount.objects.all().delete()
+        PetFacetCount.objects.bulk_create(rows)
+    return len(rows)
+
+
+def _empty_facets():
+    return {
+        'pet_type': {value: 0 for value, _ in Pet.PET_TYPES},
+        'gender': {value: 0 for value, _ in Pet.GENDER_CHOICES},
+        'listing': {'adoption': 0, 'sale': 0},
+    }
+
+
+def compute_facets(queryset, top_breeds=TOP_BREEDS):
+    """
+    Facet counts for an arbitrary filtered queryset: every fixed-choice
+    facet in one conditional-aggregate query, plus one grouped query for
+    the top breeds.
+    """
+    queryset = queryset.order_by()
+    facets = _empty_facets()
+    aggregates = {'total': Count('pk')}
+    for facet, values in facets.items():
+        for value in values:
+            if facet == 'listing':
+                condition = Q(is_for_adoption=(value == 'adoption'))
+            else:
+                condition = Q(**{facet: value})
+            aggregates[f'{facet}__{value}'] = Count('pk', filter=condition)
+    result = queryset.aggregate(**aggregates)
+    for key, count in result.items():
+        if key != 'total':
+            facet, value = key.split('__', 1)
+            facets[facet][value] = count
+    facets['breed'] = [
+        {'value': row['breed'], 'count': row['count']}
+        for row in queryset.values('breed').annotate(count=Count('pk')).order_by('-count', 'breed')[:top_breeds]
+    ]
+    facets['total'] = result['total']
+    return facets
+
+
+def stored_facets(top_breeds=TOP_BREEDS):
+    """Facet counts for the whole available catalog from PetFacetCount."""
+    facets = _empty_facets()
+    for row in PetFacetCount.objects.exclude(facet='breed').filter(count__gt=0):
+        facets.setdefault(row.facet, {})[row.value] = row.count
+    facets['breed'] = [
+        {'value': row.value, 'count': row.count}
+        for row in PetFacetCount.objects.filter(facet='breed', count__gt=0).order_by('-count', 'value')[:top_breeds]
+    ]
+    facets['total'] = sum(facets['pet_type'].values())
+    return facets
@@ -0,0 +1,184 @@
+import decimal
+from collections import defaultdict
+from types import SimpleNamespace
+
+from rest_framework import ISO_8601, serializers
+from rest_framework.fields import ReadOnlyField
+from rest_framework.settings import api_settings
+
+from .models import PetImage
+from .serializers import PetImageSerializer, cover_image_url
+
+IMAGE_FIELDS = ('images_data', 'cover_image')
+
+# DRF fields whose to_representation is the identity for the values the
+# database driver already returns for the matching model fields.
+IDENTITY_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+
+
+def _static(convert):
+    return lambda: convert
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601 or hasattr(field, 'timezone'):
+        return _static(field.to_representation)
+
+    def bind():
+        # The active timezone is resolved once per page, not once per value
+        field_timezone = field.default_timezone()
+
+        def convert(value):
+            if field_timezone is not None and value.tzinfo is not None:
+                value = value.astimezone(field_timezone)
+            else:
+                value = field.enforce_timezone(value)
+            text = value.isoformat()
+            return text[:-6] + 'Z' if text.endswith('+00:00') else text
+        return convert
+    return bind
+
+
+def _decimal_converter(field):
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output or field.decimal_places is None:
+        return _static(field.to_representation)
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+    return _static(convert)
+
+
+def _model_field_converter(field):
+    # serializers.ModelField reads through the model field, e.g. a
+    # CloudinaryField renders its stored resource path.
+    attname = field.model_field.attname
+
+    def convert(value):
+        return field.to_representation(SimpleNamespace(**{attname: value}))
+    return _static(convert)
+
+
+def _choice_converter(field):
+    if all(isinstance(key, str) for key in field.choices):
+        return _static(None)
+    return _static(field.to_representation)
+
+
+def compile_fields(serializer, image_fields=()):
+    """
+    Turn a serializer's readable fields into (name, column, bind,
+    convert_none) entries that reproduce ``serializer.to_representation``
+    on ``.values()`` rows; ``bind()`` returns the converter for one page.
+    Fields named in ``image_fields`` get a None column and are filled from
+    the image map. Returns None when a field has no column equivalent.
+    """
+    plan = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in image_fields:
+            plan.append((name, None, _static(None), False))
+        elif isinstance(field, serializers.SerializerMethodField):
+            return None
+        elif isinstance(field, serializers.ModelField):
+            # ModelField is handed the whole instance, so DRF never
+            # short-circuits None for it.
+            plan.append((name, field.model_field.attname, _model_field_converter(field), True))
+        elif isinstance(field, ReadOnlyField):
+            plan.append((name, '__'.join(field.source_attrs), _static(None), False))
+        elif isinstance(field, serializers.RelatedField) or '.' in field.source or field.source == '*':
+            return None
+        elif isinstance(field, serializers.DateTimeField):
+            plan.append((name, field.source, _datetime_converter(field), False))
+        elif isinstance(field, serializers.DecimalField):
+            plan.append((name, field.source, _decimal_converter(field), False))
+        elif isinstance(field, serializers.ChoiceField):
+            plan.append((name, field.source, _choice_converter(field), False))
+        elif type(field) in IDENTITY_FIELDS:
+            plan.append((name, field.source, _static(None), False))
+        else:
+            plan.append((name, field.source, _static(field.to_representation), False))
+    return plan
+
+
+def bind_plan(plan):
+    return [(name, column, bind(), convert_none) for name, column, bind, convert_none in plan]
+
+
+def render_value(row, column, convert, convert_none):
+    value = row[column]
+    if convert is None or (value is None and not convert_none):
+        return value
+    return convert(value)
+
+
+_image_plan = None
+
+
+def images_by_pet(pet_ids):
+    """PetImageSerializer output for every image of ``pet_ids``, grouped by pet, in one query."""
+    global _image_plan
+    if _image_plan is None:
+        _image_plan = compile_fields(PetImageSerializer())
+    grouped = defaultdict(list)
+    if not pet_ids:
+        return grouped
+    plan = bind_plan(_image_plan)
+    columns = {entry[1] for entry in plan} | {'pet_id'}
+    for row in PetImage.objects.filter(pet_id__in=pet_ids).order_by('pet_id', 'id').values(*columns):
+        grouped[row['pet_id']].append({
+            name: render_value(row, column, convert, convert_none)
+            for name, column, convert, convert_none in plan
+        })
+    return grouped
+
+
+class PetRowSerializer:
+    """
+    Read-only fast path for PetSerializer listings. Works on ``.values()``
+    rows plus a pre-grouped image map instead of model instances and
+    per-row serializer machinery, and renders exactly what the configured
+    PetSerializer would.
+    """
+    _compiled = {}
+
+    def __init__(self, plan):
+        self.plan = plan
+        self.columns = sorted({entry[1] for entry in plan if entry[1]} | {'id'})
+        self.needs_images = any(entry[1] is None for entry in plan)
+
+    @classmethod
+    def for_serializer(cls, serializer):
+        """The compiled fast path for ``serializer``'s field set, or None if unsupported."""
+        key = tuple(name for name, field in serializer.fields.items() if not field.write_only)
+        if key not in cls._compiled:
+            plan = compile_fields(serializer, image_fields=IMAGE_FIELDS)
+            cls._compiled[key] = cls(plan) if plan is not None else None
+        return cls._compiled[key]
+
+    def serialize(self, rows):
+        images = images_by_pet([row['id'] for row in rows]) if self.needs_images else None
+        plan = bind_plan(self.plan)
+        data = []
+        for row in rows:
+            item = {}
+            for name, column, convert, convert_none in plan:
+                if column is not None:
+                    item[name] = render_value(row, column, convert, convert_none)
+                    continue
+                pet_images = images.get(row['id'], [])
+                if name == 'images_data':
+                    item[name] = pet_images
+                else:
+                    item[name] = cover_image_url(pet_images)
+            data.append(item)
+        return data
@@ -1,6 +1,6 @@
 from django_filters import rest_framework as filters
-from django.db import models
 from .models import Pet
+from .search import search_pets
 
 class PetFilter(filters.FilterSet):
     keyword = filters.CharFilter(method='filter_by_keyword')
@@ -18,8 +18,4 @@ class PetFilter(filters.FilterSet):
         fields = ['pet_type', 'gender', 'min_price', 'max_price', 'min_age', 'max_age', 'breed', 'availability']
 
     def filter_by_keyword(self, queryset, name, value):
-        return queryset.filter(
-            models.Q(name__icontains=value) |
-            models.Q(breed__icontains=value) |
-            models.Q(description__icontains=value)
-        )
\ No newline at end of file
+        return search_pets(queryset, value)
\ No newline at end of file
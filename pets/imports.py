@@ -0,0 +1,241 @@
+import codecs
+import csv
+import io
+import json
+import logging
+import os
+import re
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.core.files import File
+from django.db import DatabaseError, transaction
+from rest_framework import serializers
+
+from users.models import Post
+from .assets import acquire, pet_photo_near_duplicates, release_assets
+from .models import Pet, PetImage, PetImageImport
+from .processing import render_image
+from .serializers import PetSerializer
+from .signals import pets_created_in_bulk
+
+logger = logging.getLogger(__name__)
+
+FILE_TYPES = ('jsonl', 'csv')
+FILE_EXTENSIONS = {'.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'jsonl', '.csv': 'csv'}
+
+
+class RowError(Exception):
+    """A row that could not even be parsed into a dict."""
+
+
+class PetImportSerializer(PetSerializer):
+    """
+    One import row: the PetSerializer fields and validate() rules, with
+    remote image URLs in place of an uploaded file.
+    """
+    image = None
+    image_urls = serializers.ListField(
+        child=serializers.URLField(max_length=500), required=False, write_only=True
+    )
+
+    class Meta(PetSerializer.Meta):
+        fields = [
+            'name', 'pet_type', 'breed', 'age', 'gender', 'description',
+            'is_for_adoption', 'price', 'availability', 'image_urls'
+        ]
+
+    def validate_image_urls(self, value):
+        if len(value) > settings.PET_IMPORT_MAX_IMAGES:
+            raise serializers.ValidationError(f"Maximum {settings.PET_IMPORT_MAX_IMAGES} images allowed")
+        return value
+
+
+def detect_file_type(filename):
+    for extension, file_type in FILE_EXTENSIONS.items():
+        if (filename or '').lower().endswith(extension):
+            return file_type
+    return None
+
+
+def _jsonl_rows(lines):
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, RowError(f"Invalid JSON: {e}")
+            continue
+        if not isinstance(row, dict):
+            yield number, RowError("Expected a JSON object")
+            continue
+        yield number, row
+
+
+def _csv_rows(lines):
+    reader = csv.DictReader(lines)
+    for row in reader:
+        # Blank cells mean "not given", so defaults and validate() apply
+        cleaned = {key: value for key, value in row.items() if key and value not in ('', None)}
+        if None in row:
+            yield reader.line_num, RowError("Row has more cells than the header")
+            continue
+        if 'image_urls' in cleaned:
+            cleaned['image_urls'] = re.split(r'[\s|]+', cleaned['image_urls'].strip())
+        yield reader.line_num, cleaned
+
+
+def read_rows(stream, file_type):
+    """
+    Lazily parse a binary JSONL or CSV stream into (line number, row) pairs,
+    where an unparseable row is a RowError instead of a dict.
+    """
+    lines = codecs.iterdecode(stream, 'utf-8-sig')
+    if file_type == 'csv':
+        return _csv_rows(lines)
+    return _jsonl_rows(lines)
+
+
+class PetImporter:
+    """
+    Validates import rows one at a time and inserts the valid ones in
+    bulk_create batches, together with their free Post and queued image
+    fetches. Invalid rows are reported and skipped; a batch the database
+    rejects is retried row by row so one bad row cannot sink the others.
+    """
+
+    def __init__(self, owner, batch_size=None, max_errors=None):
+        self.owner = owner
+        self.batch_size = batch_size or settings.PET_IMPORT_BATCH_SIZE
+        self.max_errors = settings.PET_IMPORT_MAX_ERRORS if max_errors is None else max_errors
+        # run_validation() keeps no per-row state, so one instance serves every row
+        self.serializer = PetImportSerializer()
+        self.created = 0
+        self.failed = 0
+        self.images_queued = 0
+        self.errors = []
+
+    def run(self, rows):
+        batch = []
+        for number, row in rows:
+            validated = self.validate(number, row)
+            if validated is None:
+                continue
+            batch.append((number, validated))
+            if len(batch) >= self.batch_size:
+                self.insert(batch)
+                batch = []
+        if batch:
+            self.insert(batch)
+        return self.report()
+
+    def validate(self, number, row):
+        if isinstance(row, RowError):
+            self.add_error(number, {'non_field_errors': [str(row)]})
+            return None
+        try:
+            return self.serializer.run_validation(row)
+        except serializers.ValidationError as e:
+            self.add_error(number, e.detail)
+            return None
+
+    def add_error(self, number, detail):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': number, 'errors': detail})
+
+    def insert(self, batch):
+        try:
+            with transaction.atomic():
+                self._insert(batch)
+        except DatabaseError as e:
+            logger.warning(f"Import batch of {len(batch)} rows failed, retrying row by row: {e}")
+            for number, validated in batch:
+                try:
+                    with transaction.atomic():
+                        self._insert([(number, validated)])
+                except DatabaseError as e:
+                    self.add_error(number, {'non_field_errors': [str(e)]})
+
+    def _insert(self, batch):
+        image_urls = [validated.pop('image_urls', []) for _, validated in batch]
+        try:
+            pets = Pet.objects.bulk_create(
+                [Pet(owner=self.owner, **validated) for _, validated in batch]
+            )
+        finally:
+            # Leave the rows intact for a row-by-row retry
+            for (_, validated), urls in zip(batch, image_urls):
+                validated['image_urls'] = urls
+        Post.objects.bulk_create(
+            [Post(user=self.owner, pet=pet, is_free=True, is_paid=False) for pet in pets]
+        )
+        queued = PetImageImport.objects.bulk_create([
+            PetImageImport(pet=pet, source_url=url)
+            for pet, urls in zip(pets, image_urls) for url in urls
+        ])
+        pets_created_in_bulk(pets)
+        self.created += len(pets)
+        self.images_queued += len(queued)
+
+    def report(self):
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'images_queued': self.images_queued,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+
+def download_image(url):
+    """The body of ``url`` as a File, named after the last path segment."""
+    response = requests.get(url, timeout=settings.PET_IMPORT_IMAGE_TIMEOUT)
+    response.raise_for_status()
+    return File(io.BytesIO(response.content), name=os.path.basename(urlsplit(url).path) or 'image')
+
+
+def fetch_image(job):
+    """
+    Download one queued remote image and attach it to its pet, stored and
+    deduplicated like an uploaded photo.
+    """
+    job.attempts += 1
+    try:
+        asset = acquire(
+            download_image(job.source_url), PetImage._meta.get_field('image'), prepare=render_image,
+            near_duplicates=pet_photo_near_duplicates(),
+        )
+    except Exception as e:
+        job.error = str(e)
+        if job.attempts >= settings.PET_IMPORT_IMAGE_ATTEMPTS:
+            job.status = PetImageImport.Status.FAILED
+        job.save(update_fields=['attempts', 'error', 'status', 'updated_at'])
+        logger.error(f"Fetching {job.source_url} for pet {job.pet_id} failed: {e}")
+        return False
+    try:
+        with transaction.atomic():
+            PetImage.objects.create(pet_id=job.pet_id, image=asset.resource)
+            job.status = PetImageImport.Status.DONE
+            job.error = ''
+            job.save(update_fields=['attempts', 'error', 'status', 'updated_at'])
+    except Exception:
+        release_assets([asset])
+        raise
+    return True
+
+
+def fetch_pending_images(limit=None):
+    """Work through queued image imports, oldest first. Returns (fetched, failed)."""
+    jobs = PetImageImport.objects.filter(status=PetImageImport.Status.PENDING).order_by('id')
+    if limit:
+        jobs = jobs[:limit]
+    fetched = failed = 0
+    for job in jobs:
+        if fetch_image(job):
+            fetched += 1
+        else:
+            failed += 1
+    return fetched, failed
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from pets.archive import archivable_pets, archive_pets
+from pets.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        "Move pets that have been unavailable for a while, with their images "
+        "and messages, from the live tables to the archive tables, and prune "
+        "expired delta sync tombstones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help="Default PET_ARCHIVE_AFTER_DAYS")
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--limit', type=int, default=None, help="Archive at most this many pets")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the pets that would be archived")
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = archivable_pets(options['days']).count()
+            self.stdout.write(f"{count} pets would be archived")
+            return
+        archived = archive_pets(days=options['days'], batch_size=options['batch_size'], limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} pets"))
+        pruned = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f"Pruned {pruned} delta sync tombstones"))
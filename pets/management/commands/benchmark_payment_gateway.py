@@ -0,0 +1,63 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+
+from pets.payments import SSLCommerzGateway, StubGatewayServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare a fresh connection per gateway call, as sslcommerz_lib makes, "
+        "with the pooled SSLCommerzGateway, against a local stub gateway."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--latency', type=float, default=0.01, help='Stub seconds per answer')
+
+    def handle(self, *args, **options):
+        server = StubGatewayServer(('127.0.0.1', 0), latency=options['latency'])
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        gateway = SSLCommerzGateway(base_url=server.base_url, pool_size=options['concurrency'])
+        payload = {'total_amount': 20, 'currency': 'USD'}
+
+        def fresh(i):
+            # Previous behaviour: a module-level requests.post, new connection each time
+            response = requests.post(
+                gateway.session_url, data={**payload, 'tran_id': f'bench-{i}', **gateway.credentials()},
+                timeout=gateway.timeout,
+            )
+            return response.json()['GatewayPageURL']
+
+        def pooled(i):
+            return gateway.create_session({**payload, 'tran_id': f'bench-{i}'})
+
+        try:
+            for label, call in (('fresh', fresh), ('pooled', pooled)):
+                connections = server.connections
+                latencies = []
+
+                def timed(i):
+                    start = time.perf_counter()
+                    call(i)
+                    latencies.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                    list(executor.map(timed, range(options['calls'])))
+                elapsed = time.perf_counter() - start
+                latencies.sort()
+                self.stdout.write(
+                    f"{label:7} {options['calls'] / elapsed:8.1f} calls/s  "
+                    f"p50={statistics.median(latencies) * 1000:6.1f}ms  "
+                    f"p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:6.1f}ms  "
+                    f"connections={server.connections - connections}"
+                )
+        finally:
+            server.shutdown()
+            server.server_close()
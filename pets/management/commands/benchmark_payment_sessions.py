@@ -0,0 +1,66 @@
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from pets.models import Pet
+from pets.payments import FakePaymentGateway, GatewayError, GatewayRejected, create_payment, open_session, session_payload
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare opening the payment session inside the pet's transaction with "
+        "the outbox path, against the offline fake gateway."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--latency', type=float, default=0.5, help='Simulated gateway seconds per session')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of transient gateway errors')
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        owner = Pet.objects.select_related('owner').values_list('owner', flat=True).first()
+        if owner is None:
+            self.stderr.write("No pets to take an owner from; seed some with benchmark_pet_queries --keep")
+            return
+        # The benchmark pet and its payments are rolled back, never committed
+        with transaction.atomic():
+            gateway = FakePaymentGateway(latency=options['latency'], error_rate=options['error_rate'], reject_rate=0)
+            pet = Pet.objects.create(
+                owner_id=owner, name='benchmark', pet_type='dog', breed='Benchmark', age=1, gender='male',
+                description='Payment session benchmark', price=20, availability=False,
+            )
+
+            def inline():
+                # Previous behaviour: the gateway call runs with the transaction open
+                start = time.perf_counter()
+                with transaction.atomic():
+                    payment = create_payment(pet.owner, pet, 20, str(uuid.uuid4()))
+                    try:
+                        opened = bool(gateway.create_session(session_payload(payment)))
+                    except (GatewayError, GatewayRejected):
+                        opened = False
+                    held = time.perf_counter() - start
+                    transaction.set_rollback(True)
+                return time.perf_counter() - start, held, opened
+
+            def outbox():
+                start = time.perf_counter()
+                with transaction.atomic():
+                    payment = create_payment(pet.owner, pet, 20, str(uuid.uuid4()))
+                    held = time.perf_counter() - start
+                payment = open_session(payment, gateway=gateway)
+                return time.perf_counter() - start, held, bool(payment.gateway_url)
+
+            for label, run in (('inline', inline), ('outbox', outbox)):
+                results = [run() for _ in range(options['repeat'])]
+                total = statistics.median(result[0] for result in results) * 1000
+                held = statistics.median(result[1] for result in results) * 1000
+                opened = sum(result[2] for result in results)
+                self.stdout.write(
+                    f"{label:7} request={total:8.1f}ms  transaction open={held:8.1f}ms  "
+                    f"sessions opened={opened}/{len(results)}"
+                )
+            transaction.set_rollback(True)
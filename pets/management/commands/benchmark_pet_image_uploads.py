@@ -0,0 +1,59 @@
+import statistics
+import time
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from pets.models import Pet, PetImage
+from pets.storage import LocalStubImageStorage, upload_images
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare serial in-transaction image uploads with the parallel, "
+        "out-of-transaction path, using the offline stub storage."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', type=int, default=5, help='Images per upload request')
+        parser.add_argument('--latency', type=float, default=0.2, help='Simulated seconds per upload')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        pet = Pet.objects.first()
+        if pet is None:
+            self.stderr.write("No pets to attach images to; seed some with benchmark_pet_queries --keep")
+            return
+        storage = LocalStubImageStorage(latency=options['latency'])
+        field = PetImage._meta.get_field('image')
+        files = [
+            SimpleUploadedFile(f'bench{i}.jpg', b'\xff\xd8\xff', content_type='image/jpeg')
+            for i in range(options['images'])
+        ]
+
+        def serial():
+            # Previous behaviour: each row uploads while the transaction is open
+            start = time.perf_counter()
+            with transaction.atomic():
+                rows = [PetImage(pet=pet, image=storage.upload(file)) for file in files]
+                PetImage.objects.bulk_create(rows)
+                held = time.perf_counter() - start
+                transaction.set_rollback(True)
+            return time.perf_counter() - start, held
+
+        def parallel():
+            start = time.perf_counter()
+            resources = upload_images(files, field, storage=storage)
+            with transaction.atomic():
+                opened = time.perf_counter()
+                PetImage.objects.bulk_create([PetImage(pet=pet, image=resource) for resource in resources])
+                held = time.perf_counter() - opened
+                transaction.set_rollback(True)
+            return time.perf_counter() - start, held
+
+        for label, run in (('serial', serial), ('parallel', parallel)):
+            results = [run() for _ in range(options['repeat'])]
+            total = statistics.median(result[0] for result in results) * 1000
+            held = statistics.median(result[1] for result in results) * 1000
+            self.stdout.write(f"{label:9} request={total:8.1f}ms  transaction open={held:8.1f}ms")
@@ -0,0 +1,127 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from pets.filters import PetFilter
+from pets.models import Pet
+from pets.pagination import KeysetPagination
+from users.models import CustomUser
+
+BENCH_EMAIL = 'benchmark@petnest.local'
+
+QUERY_SHAPES = [
+    ('newest', {}),
+    ('type', {'pet_type': 'dog'}),
+    ('type+gender', {'pet_type': 'cat', 'gender': 'female'}),
+    ('type+price', {'pet_type': 'dog', 'min_price': '50', 'max_price': '150'}),
+    ('type+age', {'pet_type': 'cat', 'min_age': '1', 'max_age': '3'}),
+    ('gender', {'gender': 'male'}),
+]
+
+BREEDS = ['Labrador', 'Persian', 'Beagle', 'Siamese', 'Poodle', 'Bengal', 'Husky', 'Maine Coon']
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a large pet catalog and compare browse query plans and latencies "
+        "with and without the Pet indexes. Seeding, index drops and measurements "
+        "all run in one rolled-back transaction, so do not run this against production."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pets', type=int, default=50000, help='Number of pets to seed')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query shape')
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--keep', action='store_true', help='Commit the seeded catalog for later runs')
+        parser.add_argument('--no-plans', action='store_true', help='Skip printing query plans')
+
+    def handle(self, *args, **options):
+        # Rolled back rather than deleted afterwards: deleting would send
+        # post_delete for every seeded pet, leaving tombstones in the sync
+        # feed and bumping facets and the catalog version.
+        with transaction.atomic():
+            self.seed(options['pets'])
+            self.stdout.write(self.style.MIGRATE_HEADING('With indexes'))
+            with_indexes = self.run_shapes(options)
+
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    for index in Pet._meta.indexes:
+                        cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+                self.stdout.write(self.style.MIGRATE_HEADING('Without indexes'))
+                without_indexes = self.run_shapes(options)
+                transaction.set_rollback(True)
+
+            self.stdout.write(self.style.MIGRATE_HEADING('Summary (median ms)'))
+            for label, _ in QUERY_SHAPES:
+                for page in ('first', 'deep'):
+                    key = (label, page)
+                    before, after = without_indexes[key], with_indexes[key]
+                    speedup = before / after if after else float('inf')
+                    self.stdout.write(f"{label:12} {page:5} before={before:8.3f} after={after:8.3f} x{speedup:.1f}")
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def seed(self, count):
+        owner = CustomUser.objects.filter(email=BENCH_EMAIL).first()
+        if owner is None:
+            owner = CustomUser.objects.create_user(email=BENCH_EMAIL, username='benchmark', password=None)
+        existing = Pet.objects.filter(owner=owner).count()
+        if existing >= count:
+            return owner
+
+        rng = random.Random(42)
+        batch = []
+        for i in range(existing, count):
+            adoption = rng.random() < 0.3
+            batch.append(Pet(
+                owner=owner,
+                name=f'Bench {i}',
+                pet_type=rng.choice(['cat', 'dog']),
+                breed=rng.choice(BREEDS),
+                age=Decimal(rng.randint(1, 99)) / 10,
+                gender=rng.choice(['male', 'female']),
+                description='Seeded benchmark listing',
+                is_for_adoption=adoption,
+                price=None if adoption else Decimal(rng.randint(10, 500)),
+                availability=rng.random() < 0.7,
+            ))
+            if len(batch) == 2000:
+                Pet.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Pet.objects.bulk_create(batch)
+        self.stdout.write(f"Seeded {count - existing} pets ({count} total)")
+        return owner
+
+    def run_shapes(self, options):
+        results = {}
+        page_size = options['page_size']
+        paginator = KeysetPagination()
+        ordering = paginator.ordering
+        for label, params in QUERY_SHAPES:
+            base = PetFilter(params, queryset=Pet.objects.filter(availability=True)).qs.order_by(*ordering)
+            first = base[:page_size]
+            # A deep page seeks past the midpoint exactly as the keyset paginator does.
+            midpoint = base.count() // 2
+            mark = base.values_list('created_at', 'id')[midpoint:midpoint + 1].first()
+            deep = first
+            if mark:
+                deep = base.filter(paginator._seek_filter(ordering, list(mark), False))[:page_size]
+
+            for page, queryset in (('first', first), ('deep', deep)):
+                timings = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    list(queryset.all())
+                    timings.append((time.perf_counter() - start) * 1000)
+                results[(label, page)] = statistics.median(timings)
+                self.stdout.write(f"{label:12} {page:5} median={results[(label, page)]:.3f}ms")
+                if not options['no_plans']:
+                    for line in queryset.explain().splitlines():
+                        self.stdout.write(f"    {line}")
+        return results
@@ -0,0 +1,61 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from pets.fastpath import PetRowSerializer
+from pets.models import Pet
+from pets.serializers import PetSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows/second of PetSerializer and the values-based fast path "
+        "on the existing catalog, and check that both render identical output."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Pets per serialized page')
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--query', default='', help="Query string to shape the output, e.g. 'expand=description'")
+
+    def handle(self, *args, **options):
+        request = Request(RequestFactory().get('/pets/list/', data=self.parse_query(options['query'])))
+        context = {'request': request, 'representation': 'compact'}
+        shape = PetSerializer(context=context)
+        row_serializer = PetRowSerializer.for_serializer(shape)
+        if row_serializer is None:
+            raise CommandError("This field set is not supported by the fast path")
+
+        queryset = shape.optimize_queryset(Pet.objects.filter(availability=True).select_related('owner'))
+        queryset = queryset.order_by('-created_at', '-id')[:options['rows']]
+        values = queryset.values(*row_serializer.columns)
+        if not values:
+            raise CommandError("No available pets to serialize; seed some with benchmark_pet_queries --keep")
+
+        def model_path():
+            return PetSerializer(list(queryset.all()), many=True, context=context).data
+
+        def fast_path():
+            return row_serializer.serialize(list(values.all()))
+
+        if json.dumps(model_path()) != json.dumps(fast_path()):
+            raise CommandError("Fast path output differs from PetSerializer")
+
+        for label, run in (('PetSerializer', model_path), ('fast path', fast_path)):
+            rows = 0
+            start = time.perf_counter()
+            for _ in range(options['repeat']):
+                rows += len(run())
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"{label:14} {rows / elapsed:12,.0f} rows/s")
+
+    @staticmethod
+    def parse_query(query):
+        params = {}
+        for part in filter(None, query.split('&')):
+            key, _, value = part.partition('=')
+            params[key] = value
+        return params
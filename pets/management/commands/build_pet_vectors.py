@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from pets.similar import build_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Fit the similar-pets vectors to every available pet and write them to "
+        "PET_VECTORS_PATH, where the web workers pick them up. Run periodically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None, help="Defaults to PET_VECTORS_PATH")
+
+    def handle(self, *args, **options):
+        path = options['output'] or settings.PET_VECTORS_PATH
+        started = time.monotonic()
+        index = build_index()
+        index.save(path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(index)} pet vectors ({len(index.terms)} terms) to {path} "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
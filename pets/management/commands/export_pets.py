@@ -0,0 +1,43 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from pets.exports import OUTPUTS, export_catalog
+from pets.sync import removals_expired
+
+
+class Command(BaseCommand):
+    help = "Stream the pet catalog to a file or stdout as NDJSON or CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', choices=OUTPUTS, default='ndjson')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--updated-since', help="Only pets changed at or after this ISO 8601 datetime, and those removed since")
+        parser.add_argument('--file', help="Write here instead of stdout")
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        updated_since = None
+        if options['updated_since']:
+            updated_since = parse_datetime(options['updated_since'])
+            if updated_since is None:
+                raise CommandError("--updated-since must be an ISO 8601 datetime")
+            if timezone.is_naive(updated_since):
+                updated_since = timezone.make_aware(updated_since)
+            if removals_expired(updated_since):
+                raise CommandError("--updated-since is older than the tracked removals; export the whole catalog")
+
+        chunks, started = export_catalog(
+            options['output'], updated_since, compress=options['gzip'], chunk_size=options['chunk_size']
+        )
+        if options['file']:
+            with open(options['file'], 'wb') as target:
+                for chunk in chunks:
+                    target.write(chunk)
+            self.stderr.write(self.style.SUCCESS(f"Exported to {options['file']}, next --updated-since {started.isoformat()}"))
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from pets.imports import fetch_pending_images
+
+
+class Command(BaseCommand):
+    help = "Fetch the remote images queued by pet imports and attach them to their pets."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help="Fetch at most this many images")
+
+    def handle(self, *args, **options):
+        fetched, failed = fetch_pending_images(limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(f"Fetched {fetched} images, {failed} failed"))
@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pets.imports import FILE_TYPES, PetImporter, detect_file_type, read_rows
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = "Bulk import pets from a JSONL or CSV file. Images are queued for fetch_pet_images."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or - for stdin")
+        parser.add_argument('--owner', required=True, help="Email of the user the pets are listed for")
+        parser.add_argument('--file-type', choices=FILE_TYPES, help="Defaults to the file extension")
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        try:
+            owner = CustomUser.objects.get(email=options['owner'])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"No user with email {options['owner']}")
+        file_type = options['file_type'] or detect_file_type(options['path'])
+        if file_type is None:
+            raise CommandError("Cannot tell the file type from the name, pass --file-type")
+
+        importer = PetImporter(owner, batch_size=options['batch_size'])
+        if options['path'] == '-':
+            report = importer.run(read_rows(sys.stdin.buffer, file_type))
+        else:
+            with open(options['path'], 'rb') as stream:
+                report = importer.run(read_rows(stream, file_type))
+
+        for error in report['errors']:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        if report['errors_truncated']:
+            self.stderr.write(f"... {report['failed'] - len(report['errors'])} more rejected rows not shown")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} pets, rejected {report['failed']} rows, "
+            f"queued {report['images_queued']} images"
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from pets.payments import StubGatewayServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve a local stand-in for the SSLCommerz session endpoint. Point PAYMENT_GATEWAY_URL at it to develop offline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.05, help='Seconds before each answer')
+
+    def handle(self, *args, **options):
+        server = StubGatewayServer((options['host'], options['port']), latency=options['latency'])
+        self.stdout.write(self.style.SUCCESS(f"Payment gateway stub listening on {server.base_url}"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stdout.write(f"Accepted {server.connections} connections")
+            server.server_close()
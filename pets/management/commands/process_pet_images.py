@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from pets.models import PetImage
+from pets.processing import process_images, stale_images
+
+
+class Command(BaseCommand):
+    help = (
+        "Resize and upload staged pet images that the background workers "
+        "did not finish, e.g. because the process restarted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=None,
+            help="Only images staged at least this many seconds ago (default PET_IMAGE_PENDING_GRACE)"
+        )
+        parser.add_argument('--retry-failed', action='store_true', help="Also retry images that failed before")
+
+    def handle(self, *args, **options):
+        statuses = [PetImage.Status.PENDING, PetImage.Status.PROCESSING]
+        if options['retry_failed']:
+            statuses.append(PetImage.Status.FAILED)
+        image_ids = list(
+            stale_images(statuses, older_than=options['older_than'])
+            .exclude(staged_path='').values_list('pk', flat=True)
+        )
+        ready, failed = process_images(image_ids, statuses=statuses)
+        self.stdout.write(self.style.SUCCESS(f"Processed {ready} images, {failed} failed"))
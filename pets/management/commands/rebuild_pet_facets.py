@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from pets.facets import rebuild_facet_counts
+
+
+class Command(BaseCommand):
+    help = "Recompute the pre-aggregated pet facet counts from the Pet table."
+
+    def handle(self, *args, **options):
+        rows = rebuild_facet_counts()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} facet counts"))
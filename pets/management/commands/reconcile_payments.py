@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from pets.payments import reconcile_payments
+
+
+class Command(BaseCommand):
+    help = (
+        "Open gateway sessions for pending payments the gateway did not answer "
+        "at creation time. Schedule it, e.g. every minute."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help="Try at most this many payments")
+
+    def handle(self, *args, **options):
+        opened, failed, pending = reconcile_payments(limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Opened {opened} payment sessions, {failed} failed, {pending} still pending"
+        ))
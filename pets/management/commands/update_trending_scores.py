@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from pets.popularity import update_trending_scores
+
+
+class Command(BaseCommand):
+    help = (
+        "Decay pet trending scores and fold in the views and message starts "
+        "recorded since the last run. Schedule it, e.g. every 15 minutes."
+    )
+
+    def handle(self, *args, **options):
+        updated = update_trending_scores()
+        self.stdout.write(self.style.SUCCESS(f"Updated trending scores of {updated} pets"))
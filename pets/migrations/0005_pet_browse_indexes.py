@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0004_pet_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(condition=models.Q(('availability', True)), fields=['-created_at', '-id'], name='pet_available_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(condition=models.Q(('availability', True)), fields=['pet_type', '-created_at', '-id'], name='pet_available_type_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(condition=models.Q(('availability', True)), fields=['pet_type', 'gender', '-created_at', '-id'], name='pet_available_type_gender_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(condition=models.Q(('availability', True)), fields=['pet_type', 'price'], name='pet_available_type_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(condition=models.Q(('availability', True)), fields=['pet_type', 'age'], name='pet_available_type_age_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:21
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_facet_counts(apps, schema_editor):
+    Pet = apps.get_model('pets', 'Pet')
+    PetFacetCount = apps.get_model('pets', 'PetFacetCount')
+    available = Pet.objects.filter(availability=True).order_by()
+    rows = []
+    for facet in ('pet_type', 'gender', 'breed'):
+        for row in available.values(facet).annotate(count=Count('pk')):
+            rows.append(PetFacetCount(facet=facet, value=row[facet], count=row['count']))
+    for row in available.values('is_for_adoption').annotate(count=Count('pk')):
+        value = 'adoption' if row['is_for_adoption'] else 'sale'
+        rows.append(PetFacetCount(facet='listing', value=value, count=row['count']))
+    PetFacetCount.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0005_pet_browse_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PetFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(max_length=20)),
+                ('value', models.CharField(max_length=100)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('facet', 'value'), name='unique_pet_facet_value')],
+            },
+        ),
+        migrations.RunPython(populate_facet_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:31
+
+import cloudinary.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0007_pet_image_import'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='petimage',
+            name='staged_path',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='petimage',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='petimage',
+            name='image',
+            field=cloudinary.models.CloudinaryField(blank=True, max_length=255, null=True, verbose_name='image'),
+        ),
+    ]
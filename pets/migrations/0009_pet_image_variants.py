@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:33
+
+from django.db import migrations, models
+
+
+def fill_variants(apps, schema_editor):
+    from pets.variants import image_variants
+
+    PetImage = apps.get_model('pets', 'PetImage')
+    batch = []
+    for image in PetImage.objects.exclude(image=None).exclude(image='').only('id', 'image').iterator(chunk_size=1000):
+        image.variants = image_variants(image.image)
+        batch.append(image)
+        if len(batch) >= 1000:
+            PetImage.objects.bulk_update(batch, ['variants'])
+            batch = []
+    PetImage.objects.bulk_update(batch, ['variants'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0008_pet_image_processing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='petimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(fill_variants, migrations.RunPython.noop),
+    ]
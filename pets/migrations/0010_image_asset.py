@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:34
+
+import cloudinary.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0009_pet_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('phash', models.CharField(blank=True, db_index=True, max_length=16)),
+                ('resource', cloudinary.models.CloudinaryField(db_index=True, max_length=255, verbose_name='resource')),
+                ('ref_count', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
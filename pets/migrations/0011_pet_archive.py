@@ -0,0 +1,57 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:38
+
+import cloudinary.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0010_image_asset'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='pet',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payments', to='pets.pet'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedPet',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('pet_type', models.CharField(choices=[('cat', 'Cat'), ('dog', 'Dog')], max_length=10)),
+                ('breed', models.CharField(max_length=100)),
+                ('age', models.DecimalField(decimal_places=1, max_digits=2)),
+                ('gender', models.CharField(choices=[('male', 'Male'), ('female', 'Female')], max_length=10)),
+                ('description', models.TextField()),
+                ('is_for_adoption', models.BooleanField(default=False)),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('availability', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_pets', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='archived_pet',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payments', to='pets.archivedpet'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedPetImage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('image', cloudinary.models.CloudinaryField(blank=True, max_length=255, null=True, verbose_name='image')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', max_length=20)),
+                ('variants', models.JSONField(blank=True, default=dict)),
+                ('uploaded_at', models.DateTimeField()),
+                ('pet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='pets.archivedpet')),
+            ],
+        ),
+    ]
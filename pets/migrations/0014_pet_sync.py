@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:47
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0013_saved_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PetTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pet_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(fields=['updated_at', 'id'], name='pet_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pettombstone',
+            index=models.Index(fields=['deleted_at', 'pet_id'], name='pet_tombstone_sync_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from cloudinary.models import CloudinaryField
 
 class Pet(models.Model):
@@ -42,22 +43,192 @@ class Pet(models.Model):
     availability = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Popularity, written only through pets.popularity with F() updates
+    view_count = models.PositiveIntegerField(default=0, editable=False)
+    message_count = models.PositiveIntegerField(default=0, editable=False)
+    trending_activity = models.FloatField(default=0, editable=False)
+    trending_score = models.FloatField(default=0, editable=False)
+    trending_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    COUNTER_FIELDS = ('view_count', 'message_count', 'trending_activity', 'trending_score', 'trending_updated_at')
+
+    class Meta:
+        # Browse queries only ever see available pets, so every index is
+        # partial on availability and keyed to the PetFilter combinations
+        # in front of the (created_at, id) pagination order.
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='pet_available_recent_idx',
+                condition=models.Q(availability=True),
+            ),
+            models.Index(
+                fields=['pet_type', '-created_at', '-id'],
+                name='pet_available_type_recent_idx',
+                condition=models.Q(availability=True),
+            ),
+            models.Index(
+                fields=['pet_type', 'gender', '-created_at', '-id'],
+                name='pet_available_type_gender_idx',
+                condition=models.Q(availability=True),
+            ),
+            models.Index(
+                fields=['pet_type', 'price'],
+                name='pet_available_type_price_idx',
+                condition=models.Q(availability=True),
+            ),
+            models.Index(
+                fields=['pet_type', 'age'],
+                name='pet_available_type_age_idx',
+                condition=models.Q(availability=True),
+            ),
+            models.Index(
+                fields=['-trending_score', '-id'],
+                name='pet_available_trending_idx',
+                condition=models.Q(availability=True),
+            ),
+            # Delta sync walks every change, including pets leaving availability
+            models.Index(fields=['updated_at', 'id'], name='pet_sync_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so save signals can diff against it
+        # without re-reading the row.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Never write back counters read earlier; the buffered F() updates
+        # made since then would be lost.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.name} ({self.pet_type})"
 
+class PetTombstone(models.Model):
+    """
+    Marks a pet removed from the Pet table (deleted or archived), so delta
+    sync clients holding it learn to drop it. Pruned after
+    PET_SYNC_TOMBSTONE_DAYS.
+    """
+    pet_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'pet_id'], name='pet_tombstone_sync_idx'),
+        ]
+
+    def __str__(self):
+        return f"Pet {self.pet_id} removed at {self.deleted_at}"
+
+class PetFacetCount(models.Model):
+    """
+    Pre-aggregated number of available pets per facet value, kept current
+    by the Pet save/delete signals and used for the unfiltered browse page.
+    """
+    facet = models.CharField(max_length=20)
+    value = models.CharField(max_length=100)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['facet', 'value'], name='unique_pet_facet_value'),
+        ]
+
+    def __str__(self):
+        return f"{self.facet}={self.value}: {self.count}"
+
+class ImageAsset(models.Model):
+    """
+    One stored image file, addressed by the SHA-256 of its bytes and shared
+    by every record that uploaded the same content. ``ref_count`` is the
+    number of those records; the file is deleted with the last one.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    # Optional difference hash for matching re-encoded copies of a photo
+    phash = models.CharField(max_length=16, blank=True, db_index=True)
+    resource = CloudinaryField('resource', db_index=True)
+    ref_count = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Asset {self.sha256[:12]} ({self.ref_count} refs)"
+
 class PetImage(models.Model):
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        PROCESSING = 'processing', 'Processing'
+        READY = 'ready', 'Ready'
+        FAILED = 'failed', 'Failed'
+
     pet = models.ForeignKey(
         Pet,
         on_delete=models.CASCADE,
         related_name='images'
     )
-    image = CloudinaryField('image')
+    # Empty until the processing pipeline has uploaded the staged file
+    image = CloudinaryField('image', null=True, blank=True)
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.READY
+    )
+    staged_path = models.CharField(max_length=255, blank=True)
+    # Rendition name -> URL, filled in whenever the image is saved
+    variants = models.JSONField(default=dict, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Image for {self.pet.name}"
 
+class PetImageImport(models.Model):
+    """
+    Remote image queued by a bulk import. Rows are inserted without
+    touching Cloudinary and the fetch_pet_images command attaches them to
+    the pet afterwards.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    pet = models.ForeignKey(
+        Pet,
+        on_delete=models.CASCADE,
+        related_name='image_imports'
+    )
+    source_url = models.URLField(max_length=500)
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['id'],
+                name='pet_image_import_pending_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"Image import {self.source_url} for pet {self.pet_id}"
+
 class Payment(models.Model):
     class Status(models.TextChoices):
         PENDING = 'pending', 'Pending'
@@ -69,9 +240,19 @@ class Payment(models.Model):
         on_delete=models.CASCADE,
         related_name='payments'
     )
+    # Exactly one of pet / archived_pet is set once the listing is archived
     pet = models.ForeignKey(
         Pet,
-        on_delete=models.CASCADE,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='payments'
+    )
+    archived_pet = models.ForeignKey(
+        'ArchivedPet',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
         related_name='payments'
     )
     transaction_id = models.CharField(max_length=100, unique=True)
@@ -83,6 +264,123 @@ class Payment(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Gateway session outbox: the payment is committed first and the session
+    # opened afterwards, retried by reconcile_payments until it succeeds.
+    gateway_url = models.URLField(max_length=500, blank=True)
+    session_attempts = models.PositiveSmallIntegerField(default=0)
+    session_error = models.CharField(max_length=255, blank=True)
+    next_session_attempt_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['next_session_attempt_at'],
+                name='payment_session_due_idx',
+                condition=models.Q(status='pending', gateway_url=''),
+            ),
+        ]
+
+    @property
+    def listing(self):
+        return self.pet or self.archived_pet
+
+    def __str__(self):
+        return f"Payment {self.transaction_id} for {self.listing.name if self.listing else 'a removed pet'}"
+
+
+class ArchivedPet(models.Model):
+    """
+    A listing that stayed unavailable for PET_ARCHIVE_AFTER_DAYS, moved out
+    of the Pet table by the archive_pets command. Keeps the original id so
+    old links and references still resolve.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_pets'
+    )
+    name = models.CharField(max_length=100)
+    pet_type = models.CharField(max_length=10, choices=Pet.PET_TYPES)
+    breed = models.CharField(max_length=100)
+    age = models.DecimalField(max_digits=2, decimal_places=1)
+    gender = models.CharField(max_length=10, choices=Pet.GENDER_CHOICES)
+    description = models.TextField()
+    is_for_adoption = models.BooleanField(default=False)
+    price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    availability = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.pet_type}, archived)"
+
+
+class ArchivedPetImage(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    pet = models.ForeignKey(
+        ArchivedPet,
+        on_delete=models.CASCADE,
+        related_name='images'
+    )
+    image = CloudinaryField('image', null=True, blank=True)
+    status = models.CharField(max_length=20, choices=PetImage.Status.choices, default=PetImage.Status.READY)
+    variants = models.JSONField(default=dict, blank=True)
+    uploaded_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Archived image for {self.pet.name}"
+
+class SavedSearch(models.Model):
+    """
+    A user's stored PetFilter query. ``filters`` holds the normalized
+    parameters; the pet type, gender and price bounds are copied into
+    their own columns so a new listing can find the searches it might
+    satisfy with one indexed query.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='saved_searches'
+    )
+    name = models.CharField(max_length=100, blank=True)
+    filters = models.JSONField(default=dict)
+    # Blank / null means "any"
+    pet_type = models.CharField(max_length=10, choices=Pet.PET_TYPES, blank=True)
+    gender = models.CharField(max_length=10, choices=Pet.GENDER_CHOICES, blank=True)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pet_type', 'gender'], name='saved_search_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.name or self.filters}"
+
+
+class SavedSearchMatch(models.Model):
+    """A new or updated listing that satisfied a saved search, in its owner's inbox."""
+    search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name='matches')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='saved_search_matches'
+    )
+    pet = models.ForeignKey(Pet, on_delete=models.CASCADE, related_name='saved_search_matches')
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['search', 'pet'], name='unique_saved_search_pet'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='saved_search_inbox_idx'),
+        ]
 
     def __str__(self):
-        return f"Payment {self.transaction_id} for {self.pet.name}"
\ No newline at end of file
+        return f"{self.pet} for {self.search}"
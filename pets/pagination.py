@@ -0,0 +1,200 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def estimate_count(queryset):
+    """
+    Planner row estimate for a queryset. Only PostgreSQL exposes one cheaply,
+    other backends fall back to an exact COUNT(*).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Seek-method pagination over a unique ordering such as (created_at, id).
+
+    The cursor encodes the ordering values of the last row on the page, so
+    every page is a single index range scan no matter how deep it is.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    total_query_param = 'include_total'
+    page_size = 20
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, view, queryset):
+        if hasattr(view, 'get_keyset_ordering'):
+            return tuple(view.get_keyset_ordering(queryset))
+        return tuple(getattr(view, 'keyset_ordering', self.ordering))
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def encode_cursor(self, values, reverse=False):
+        payload = {'v': [v.isoformat() if hasattr(v, 'isoformat') else v for v in values]}
+        if reverse:
+            payload['r'] = 1
+        raw = json.dumps(payload, separators=(',', ':'), default=str).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    @staticmethod
+    def _ordering_field(queryset, name):
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.get_field(name)
+
+    def decode_cursor(self, request, ordering, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            values = payload['v']
+            reverse = bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # Values go straight into the seek filter, so they must be of the
+        # ordering column's type, and never NULL
+        try:
+            values = [
+                self._ordering_field(queryset, field.lstrip('-')).to_python(value)
+                for field, value in zip(ordering, values)
+            ]
+        except (DjangoValidationError, ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if any(value is None for value in values):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def _seek_filter(self, ordering, values, reverse):
+        # Lexicographic "row comes after the cursor" predicate, expanded into
+        # ORs because Django has no portable row-value comparison.
+        # The redundant inclusive bound on the leading column lets the planner
+        # use a single index range scan instead of a multi-index OR.
+        condition = Q()
+        equal = Q()
+        bound = None
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            if bound is None:
+                bound = Q(**{f'{name}__{lookup}e': value})
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return bound & condition
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _position(row, ordering):
+        if isinstance(row, dict):
+            return [row[field.lstrip('-')] for field in ordering]
+        return [getattr(row, field.lstrip('-')) for field in ordering]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        ordering = self.get_ordering(view, queryset)
+        page_size = self.get_page_size(request)
+        values, reverse = self.decode_cursor(request, ordering, queryset)
+
+        self.total = None
+        if str(request.query_params.get(self.total_query_param, '')).lower() in ('1', 'true', 'yes'):
+            self.total = estimate_count(queryset)
+
+        if values is not None:
+            queryset = queryset.filter(self._seek_filter(ordering, values, reverse))
+        if reverse:
+            queryset = queryset.order_by(*[self._flip(f) for f in ordering])
+        else:
+            queryset = queryset.order_by(*ordering)
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_position = None
+        self.previous_position = None
+        if rows:
+            if has_more or reverse:
+                self.next_position = self._position(rows[-1], ordering)
+            if values is not None and (has_more or not reverse):
+                self.previous_position = self._position(rows[0], ordering)
+        return rows
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, self.encode_cursor(self.previous_position, reverse=True)
+        )
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.total is not None:
+            payload['total_estimate'] = self.total
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'total_estimate': {'type': 'integer'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {'name': self.cursor_query_param, 'required': False, 'in': 'query', 'schema': {'type': 'string'}},
+            {'name': self.page_size_query_param, 'required': False, 'in': 'query', 'schema': {'type': 'integer'}},
+            {'name': self.total_query_param, 'required': False, 'in': 'query', 'schema': {'type': 'boolean'}},
+        ]
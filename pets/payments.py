@@ -0,0 +1,514 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+from django.utils.module_loading import import_string
+from sslcommerz_lib import SSLCOMMERZ
+
+from .cache import cached_payment_status, remember_payment_status
+from .models import Payment
+
+logger = logging.getLogger(__name__)
+
+# Seconds of slack on a session lease, for the writes around the gateway calls
+SESSION_LEASE_MARGIN = 5
+
+
+class GatewayError(Exception):
+    """The gateway could not be reached or answered garbage; worth retrying."""
+
+
+class GatewayRejected(Exception):
+    """The gateway refused the session; retrying will not help."""
+
+
+def sslcommerz_client():
+    return SSLCOMMERZ({
+        'store_id': settings.SSLCOMMERZ_STORE_ID,
+        'store_pass': settings.SSLCOMMERZ_STORE_PASSWORD,
+        'issandbox': settings.SSLCOMMERZ_SANDBOX,
+    })
+
+
+class CircuitBreaker:
+    """
+    Fails calls fast after ``failures`` consecutive errors, instead of
+    letting every request wait out the timeout against a dead gateway.
+    After ``reset_seconds`` one trial call is let through: success closes
+    the circuit again, failure keeps it open for another period.
+    """
+
+    def __init__(self, failures, reset_seconds):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self._errors = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if self._trial or time.monotonic() - self._opened_at < self.reset_seconds:
+                return 'open'
+            return 'half-open'
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial or time.monotonic() - self._opened_at < self.reset_seconds:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._errors = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._errors += 1
+            self._trial = False
+            if self._opened_at is not None or self._errors >= self.failures:
+                self._opened_at = time.monotonic()
+
+
+class GatewayMetrics:
+    """Call counts, errors and latency percentiles per gateway operation, over the last ``window`` calls."""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._operations = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation, seconds, ok):
+        """Count one call; ``seconds`` is None for calls the circuit breaker refused."""
+        with self._lock:
+            stats = self._operations.setdefault(
+                operation, {'calls': 0, 'errors': 0, 'latencies': deque(maxlen=self.window)}
+            )
+            stats['calls'] += 1
+            stats['errors'] += not ok
+            if seconds is not None:
+                stats['latencies'].append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            operations = {name: (stats['calls'], stats['errors'], sorted(stats['latencies']))
+                          for name, stats in self._operations.items()}
+        snapshot = {}
+        for name, (calls, errors, latencies) in operations.items():
+            snapshot[name] = {'calls': calls, 'errors': errors}
+            if latencies:
+                snapshot[name].update({
+                    'p50_ms': round(latencies[len(latencies) // 2] * 1000, 1),
+                    'p95_ms': round(latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] * 1000, 1),
+                    'max_ms': round(latencies[-1] * 1000, 1),
+                })
+        return snapshot
+
+
+class SSLCommerzGateway:
+    """
+    Process-wide SSLCommerz client. Talks to the same endpoints as
+    sslcommerz_lib, but over a keep-alive connection pool, with connect and
+    read timeouts, errors raised instead of printed and swallowed, a
+    circuit breaker and latency metrics. ``base_url`` (PAYMENT_GATEWAY_URL)
+    replaces the SSLCommerz host, e.g. with the payment_gateway_stub server.
+    """
+
+    SESSION_PATH = '/gwprocess/v4/api.php'
+
+    def __init__(self, timeout=None, connect_timeout=None, pool_size=None, base_url=None):
+        self.timeout = (
+            settings.PAYMENT_GATEWAY_CONNECT_TIMEOUT if connect_timeout is None else connect_timeout,
+            settings.PAYMENT_GATEWAY_TIMEOUT if timeout is None else timeout,
+        )
+        self.pool_size = settings.PAYMENT_GATEWAY_POOL_SIZE if pool_size is None else pool_size
+        self.client = sslcommerz_client()
+        base_url = (settings.PAYMENT_GATEWAY_URL if base_url is None else base_url).rstrip('/')
+        self.session_url = base_url + self.SESSION_PATH if base_url else self.client.createSessionUrl
+        self.breaker = CircuitBreaker(
+            settings.PAYMENT_GATEWAY_CIRCUIT_FAILURES, settings.PAYMENT_GATEWAY_CIRCUIT_RESET_SECONDS
+        )
+        self.metrics = GatewayMetrics()
+        self._http = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _session(self):
+        # A forked worker must not share the parent's sockets
+        with self._lock:
+            if self._http is None or self._pid != os.getpid():
+                http = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                http.mount('https://', adapter)
+                http.mount('http://', adapter)
+                self._http, self._pid = http, os.getpid()
+            return self._http
+
+    def _request(self, operation, method, url, **kwargs):
+        """The gateway's JSON answer. Raises GatewayError on anything worth retrying later."""
+        if not self.breaker.allow():
+            self.metrics.record(operation, None, False)
+            raise GatewayError("Payment gateway circuit is open")
+        start = time.perf_counter()
+        try:
+            response = self._session().request(method, url, timeout=self.timeout, **kwargs)
+            data = self._parse(response)
+        except requests.RequestException as e:
+            error = GatewayError(str(e))
+        except GatewayError as e:
+            error = e
+        else:
+            self.breaker.record_success()
+            self.metrics.record(operation, time.perf_counter() - start, True)
+            return data
+        self.breaker.record_failure()
+        self.metrics.record(operation, time.perf_counter() - start, False)
+        raise error
+
+    @staticmethod
+    def _parse(response):
+        if response.status_code >= 500:
+            raise GatewayError(f"Gateway returned HTTP {response.status_code}")
+        try:
+            return response.json()
+        except ValueError:
+            raise GatewayError("Gateway returned a non-JSON response")
+
+    def credentials(self):
+        return {'store_id': self.client.store_id, 'store_passwd': self.client.store_pass}
+
+    def create_session(self, payload):
+        """The gateway page URL for a new payment session."""
+        data = self._request('create_session', 'POST', self.session_url, data={**payload, **self.credentials()})
+        if data.get('status') == 'SUCCESS' and data.get('GatewayPageURL'):
+            return data['GatewayPageURL']
+        raise GatewayRejected(data.get('failedreason') or 'Unknown error')
+
+    def hash_valid(self, params):
+        """Whether an IPN's verify_sign matches its fields. Local, no request."""
+        return self.client.hash_validate_ipn(params)
+
+    def stats(self):
+        return {'circuit': self.breaker.state, 'operations': self.metrics.snapshot()}
+
+
+class FakePaymentGateway:
+    """
+    Offline stand-in for benchmarks and local development: answers after
+    ``latency`` seconds, times out like a real client when that exceeds
+    the timeout, and fails transiently or rejects at the given rates.
+    """
+
+    def __init__(self, latency=None, error_rate=None, reject_rate=None, timeout=None):
+        self.latency = settings.FAKE_PAYMENT_GATEWAY_LATENCY if latency is None else latency
+        self.error_rate = settings.FAKE_PAYMENT_GATEWAY_ERROR_RATE if error_rate is None else error_rate
+        self.reject_rate = settings.FAKE_PAYMENT_GATEWAY_REJECT_RATE if reject_rate is None else reject_rate
+        self.timeout = settings.PAYMENT_GATEWAY_TIMEOUT if timeout is None else timeout
+
+    def create_session(self, payload):
+        if self.latency > self.timeout:
+            time.sleep(self.timeout)
+            raise GatewayError(f"Read timed out (timeout={self.timeout})")
+        time.sleep(self.latency)
+        roll = random.random()
+        if roll < self.error_rate:
+            raise GatewayError("Fake gateway error")
+        if roll < self.error_rate + self.reject_rate:
+            raise GatewayRejected("Fake gateway rejection")
+        return f"https://fake-gateway.invalid/pay/{payload['tran_id']}"
+
+    def hash_valid(self, params):
+        return True
+
+    def stats(self):
+        return {}
+
+
+class StubGatewayServer(ThreadingHTTPServer):
+    """
+    Local HTTP stand-in for the SSLCommerz session endpoint, answering
+    after ``latency`` seconds and counting the connections it accepts, so
+    connection reuse can be measured without the real gateway.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0):
+        super().__init__(address, _StubGatewayHandler)
+        self.latency = latency
+        self.connections = 0
+        self._count_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def process_request(self, request, client_address):
+        with self._count_lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+
+class _StubGatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes; with Nagle on, a kept-alive
+    # connection stalls on the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def _answer(self, status, data):
+        time.sleep(self.server.latency)
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode())
+        if urlsplit(self.path).path != SSLCommerzGateway.SESSION_PATH:
+            return self._answer(404, {'status': 'FAILED', 'failedreason': 'Not found'})
+        tran_id = form.get('tran_id', [''])[0]
+        self._answer(200, {'status': 'SUCCESS', 'GatewayPageURL': f"{self.server.base_url}/pay/{tran_id}"})
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+@lru_cache(maxsize=None)
+def get_gateway():
+    return import_string(settings.PAYMENT_GATEWAY)()
+
+
+def session_payload(payment):
+    user, pet = payment.user, payment.pet
+    return {
+        'total_amount': payment.amount,
+        'currency': "USD",
+        'tran_id': payment.transaction_id,
+        'success_url': settings.SSLCOMMERZ_SUCCESS_URL,
+        'fail_url': settings.SSLCOMMERZ_FAIL_URL,
+        'cancel_url': settings.SSLCOMMERZ_CANCEL_URL,
+        'emi_option': 0,
+        'cus_name': user.username,
+        'cus_email': user.email,
+        'cus_phone': user.phone or 'N/A',
+        'cus_add1': user.address or 'N/A',
+        'cus_add2': user.address or 'N/A',
+        'cus_city': user.city or 'Dhaka',
+        'cus_state': user.state or 'Dhaka',
+        'cus_postcode': user.postcode or '1000',
+        'cus_country': 'Bangladesh',
+        'shipping_method': 'NO',
+        'num_of_item': 1,
+        'product_name': f"Pet {'Adoption' if pet.is_for_adoption else 'Sale'} Post",
+        'product_category': 'Pet Listing',
+        'product_profile': 'general'
+    }
+
+
+def create_payment(user, pet, amount, transaction_id):
+    """
+    The pending payment for ``pet``, queued for a gateway session. Create it
+    in the same transaction as the pet, then call open_session() after commit.
+    """
+    return Payment.objects.create(
+        user=user, pet=pet, amount=amount, transaction_id=transaction_id,
+        next_session_attempt_at=timezone.now(),
+    )
+
+
+def fail_payment(payment, reason):
+    """
+    Mark a still-pending payment failed and take its listing down. Only the
+    caller that moves it out of pending does so; returns whether that was us.
+    """
+    with transaction.atomic():
+        failed = Payment.objects.filter(pk=payment.pk, status=Payment.Status.PENDING).update(
+            status=Payment.Status.FAILED, session_error=reason[:255], next_session_attempt_at=None,
+            updated_at=timezone.now(),
+        )
+        if failed and payment.pet_id:
+            pet = payment.pet
+            pet.availability = False
+            pet.save()
+        if failed:
+            transaction.on_commit(lambda: remember_payment_status(payment.transaction_id, Payment.Status.FAILED))
+    if failed:
+        logger.error(f"Payment {payment.transaction_id} failed: {reason}")
+    return bool(failed)
+
+
+def complete_payment(payment):
+    """
+    Mark a still-pending payment completed, publish its post and send the
+    confirmation email once committed. Like fail_payment, only the caller
+    that wins the transition does any of it; returns whether that was us.
+    """
+    from users.models import Post
+
+    with transaction.atomic():
+        completed = Payment.objects.filter(pk=payment.pk, status=Payment.Status.PENDING).update(
+            status=Payment.Status.COMPLETED, next_session_attempt_at=None, updated_at=timezone.now(),
+        )
+        if not completed:
+            return False
+        payment.status = Payment.Status.COMPLETED
+        if payment.pet_id and not Post.objects.filter(user=payment.user, pet=payment.pet).exists():
+            Post.objects.create(user=payment.user, pet=payment.pet, is_paid=True)
+        transaction.on_commit(lambda: remember_payment_status(payment.transaction_id, Payment.Status.COMPLETED))
+        transaction.on_commit(lambda: send_payment_confirmation(payment))
+    return True
+
+
+def send_payment_confirmation(payment):
+    # Best-effort: the payment stands whether or not the email goes out
+    try:
+        html_message = render_to_string('payment_confirmation_email.html', {
+            'user': payment.user,
+            'pet': payment.listing,
+            'transaction_id': payment.transaction_id,
+            'amount': payment.amount,
+            'created_at': payment.created_at
+        })
+        send_mail(
+            'Payment Confirmation - PetNest',
+            strip_tags(html_message),
+            settings.DEFAULT_FROM_EMAIL,
+            [payment.user.email],
+            html_message=html_message
+        )
+    except Exception as e:
+        logger.error(f"Email send error: {e}")
+
+
+def final_payment_status(transaction_id):
+    """
+    The status of a completed or failed payment, from the cache or one
+    indexed read; None if the payment is pending or does not exist.
+    """
+    status = cached_payment_status(transaction_id)
+    if status is None:
+        status = Payment.objects.filter(transaction_id=transaction_id).values_list('status', flat=True).first()
+        if status is None or status == Payment.Status.PENDING:
+            return None
+        remember_payment_status(transaction_id, status)
+    return status
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=settings.PAYMENT_SESSION_RETRY_DELAY * 2 ** attempts)
+
+
+def session_lease(tries):
+    """
+    Seconds ``tries`` session attempts can take at worst: each may use the
+    full connect and read timeouts, and the sleep before try ``n`` is
+    ``n`` retry delays.
+    """
+    calls = tries * (settings.PAYMENT_GATEWAY_CONNECT_TIMEOUT + settings.PAYMENT_GATEWAY_TIMEOUT)
+    sleeps = settings.PAYMENT_SESSION_RETRY_DELAY * sum(range(tries))
+    return calls + sleeps + SESSION_LEASE_MARGIN
+
+
+def open_session(payment, tries=None, gateway=None):
+    """
+    Create the gateway session of a pending payment, outside any
+    transaction, trying up to ``tries`` times. Claims the payment first, so
+    a request and the reconcile command never open it twice. A rejection
+    fails the payment; if every try errors it is left for
+    reconcile_payments, until PAYMENT_SESSION_MAX_ATTEMPTS. Returns the
+    refreshed payment, with ``gateway_url`` set on success.
+    """
+    tries = settings.PAYMENT_SESSION_TRIES if tries is None else tries
+    now = timezone.now()
+    # The lease outlasts every try, so nobody else claims it meanwhile
+    lease = now + timedelta(seconds=session_lease(tries))
+    claimed = Payment.objects.filter(
+        pk=payment.pk, status=Payment.Status.PENDING, gateway_url='', next_session_attempt_at__lte=now
+    ).update(next_session_attempt_at=lease)
+    if not claimed:
+        payment.refresh_from_db()
+        return payment
+
+    gateway = gateway or get_gateway()
+    payload = session_payload(payment)
+    error = ''
+    for attempt in range(tries):
+        if attempt:
+            time.sleep(settings.PAYMENT_SESSION_RETRY_DELAY * attempt)
+        try:
+            url = gateway.create_session(payload)
+        except GatewayRejected as e:
+            Payment.objects.filter(pk=payment.pk).update(session_attempts=F('session_attempts') + attempt + 1)
+            fail_payment(payment, f"Payment initiation failed: {e}")
+            break
+        except GatewayError as e:
+            error = str(e)
+            logger.warning(f"Payment session for {payment.transaction_id} failed (try {attempt + 1}): {e}")
+            continue
+        Payment.objects.filter(pk=payment.pk).update(
+            gateway_url=url, session_error='', next_session_attempt_at=None,
+            session_attempts=F('session_attempts') + attempt + 1,
+        )
+        break
+    else:
+        Payment.objects.filter(pk=payment.pk).update(
+            session_attempts=F('session_attempts') + tries, session_error=error[:255]
+        )
+        payment.refresh_from_db(fields=['session_attempts'])
+        if payment.session_attempts >= settings.PAYMENT_SESSION_MAX_ATTEMPTS:
+            fail_payment(payment, f"Payment initiation failed: {error}")
+        else:
+            Payment.objects.filter(pk=payment.pk).update(
+                next_session_attempt_at=timezone.now() + retry_delay(payment.session_attempts)
+            )
+    payment.refresh_from_db()
+    return payment
+
+
+def due_payments():
+    """Pending payments still without a gateway session whose next attempt is due."""
+    return Payment.objects.filter(
+        status=Payment.Status.PENDING, gateway_url='', next_session_attempt_at__lte=timezone.now()
+    ).select_related('user', 'pet').order_by('next_session_attempt_at')
+
+
+def reconcile_payments(limit=None):
+    """Retry session creation for due payments. Returns (opened, failed, still pending)."""
+    opened = failed = pending = 0
+    for payment in due_payments()[:limit] if limit else due_payments():
+        payment = open_session(payment)
+        if payment.gateway_url:
+            opened += 1
+        elif payment.status == Payment.Status.FAILED:
+            failed += 1
+        else:
+            pending += 1
+    return opened, failed, pending
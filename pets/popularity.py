@@ -0,0 +1,155 @@
+import atexit
+import logging
+import os
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Case, F, Max, Q, Value, When
+from django.db.models.lookups import LessThan
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .models import Pet
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ('view_count', 'message_count')
+
+
+def activity_weights():
+    return {'view_count': 1.0, 'message_count': settings.PET_TRENDING_MESSAGE_WEIGHT}
+
+
+class CounterBuffer:
+    """
+    Per-process totals of counter increments, written out every
+    ``interval`` seconds (or once ``max_pending`` pets have pending counts)
+    as a few ``UPDATE ... SET n = n + k`` statements instead of one write
+    per hit. Pets with identical increments share a statement.
+    """
+
+    def __init__(self, interval, max_pending):
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def increment(self, pk, counter, amount=1):
+        with self._lock:
+            self._pending[pk][counter] += amount
+            full = len(self._pending) >= self.max_pending
+        self._ensure_flusher()
+        if full:
+            self._wakeup.set()
+
+    def _ensure_flusher(self):
+        # A forked worker inherits the buffer but not the thread
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='pet-counter-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing pet counters failed")
+            finally:
+                connections.close_all()
+
+    def flush(self):
+        """Write out everything pending. Returns the number of pets updated."""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+        if not pending:
+            return 0
+        groups = defaultdict(list)
+        for pk, counts in pending.items():
+            groups[tuple(counts[counter] for counter in COUNTERS)].append(pk)
+        weights = activity_weights()
+        try:
+            with transaction.atomic():
+                for amounts, pks in groups.items():
+                    increments = dict(zip(COUNTERS, amounts))
+                    activity = sum(weights[counter] * amount for counter, amount in increments.items())
+                    Pet.objects.filter(pk__in=sorted(pks)).update(
+                        trending_activity=F('trending_activity') + activity,
+                        **{counter: F(counter) + amount for counter, amount in increments.items() if amount},
+                    )
+        except DatabaseError:
+            # Keep the counts for the next attempt rather than dropping them
+            with self._lock:
+                for pk, counts in pending.items():
+                    for counter, amount in counts.items():
+                        self._pending[pk][counter] += amount
+            raise
+        return len(pending)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = CounterBuffer(settings.PET_COUNTER_FLUSH_SECONDS, settings.PET_COUNTER_MAX_PENDING)
+                atexit.register(_flush_at_exit)
+    return _buffer
+
+
+def _flush_at_exit():
+    try:
+        _buffer.flush()
+    except Exception:
+        logger.exception("Flushing pet counters at exit failed")
+
+
+def record_view(pk):
+    get_buffer().increment(pk, 'view_count')
+
+
+def record_message_start(pk):
+    get_buffer().increment(pk, 'message_count')
+
+
+def update_trending_scores(now=None):
+    """
+    Decay every trending score by the time since the last run (halving
+    every PET_TRENDING_HALF_LIFE_HOURS) and add the activity recorded since.
+    Scores that decay below PET_TRENDING_MIN_SCORE drop to zero, so idle
+    pets fall out of later runs. Returns the number of pets updated.
+    """
+    now = now or timezone.now()
+    # Every nonzero score was written by the previous run, at one instant
+    last_run = Pet.objects.filter(trending_score__gt=0).aggregate(last=Max('trending_updated_at'))['last']
+    elapsed = (now - last_run).total_seconds() if last_run else 0
+    decay = 0.5 ** (max(elapsed, 0) / (settings.PET_TRENDING_HALF_LIFE_HOURS * 3600))
+    # One statement, so activity flushed concurrently is either folded in
+    # here or left for the next run, never lost.
+    score = F('trending_score') * decay + F('trending_activity')
+    updated = Pet.objects.filter(Q(trending_score__gt=0) | Q(trending_activity__gt=0)).update(
+        trending_score=Case(
+            When(LessThan(score, settings.PET_TRENDING_MIN_SCORE), then=Value(0.0)),
+            default=score,
+        ),
+        trending_activity=0,
+        trending_updated_at=now,
+    )
+    if updated:
+        transaction.on_commit(bump_catalog_version)
+    return updated
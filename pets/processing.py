@@ -0,0 +1,156 @@
+import io
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import PetImage
+from .assets import acquire, pet_photo_near_duplicates
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def stage_image(upload):
+    """
+    Copy an uploaded file into PET_IMAGE_STAGING_DIR and return its path.
+    This is a local disk write, so it costs the same however slow the
+    image host is.
+    """
+    os.makedirs(settings.PET_IMAGE_STAGING_DIR, exist_ok=True)
+    extension = os.path.splitext(upload.name or '')[1].lower()
+    path = os.path.join(settings.PET_IMAGE_STAGING_DIR, f"{uuid.uuid4().hex}{extension}")
+    with open(path, 'wb') as target:
+        for chunk in upload.chunks():
+            target.write(chunk)
+    return path
+
+
+def create_pending_image(pet, upload):
+    """Stage ``upload`` and add it to ``pet`` as a pending PetImage, processed after commit."""
+    image = PetImage.objects.create(
+        pet=pet, status=PetImage.Status.PENDING, staged_path=stage_image(upload)
+    )
+    schedule_processing([image.pk])
+    return image
+
+
+def render_image(staged):
+    """
+    Re-encode a staged photo as a JPEG no larger than
+    PET_IMAGE_MAX_DIMENSION on either side, with EXIF rotation applied.
+    """
+    staged.seek(0)
+    with Image.open(staged) as source:
+        image = ImageOps.exif_transpose(source)
+        image.thumbnail((settings.PET_IMAGE_MAX_DIMENSION, settings.PET_IMAGE_MAX_DIMENSION))
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=settings.PET_IMAGE_JPEG_QUALITY, optimize=True)
+    size = buffer.tell()
+    buffer.seek(0)
+    return InMemoryUploadedFile(buffer, 'image', f"{uuid.uuid4().hex}.jpg", 'image/jpeg', size, None)
+
+
+def process_image(image):
+    """Render, upload and mark one claimed PetImage ready (or failed). Returns True on success."""
+    try:
+        # Deduplicated on the staged original, so a photo that is already
+        # stored is neither rendered nor uploaded again.
+        with open(image.staged_path, 'rb') as staged:
+            asset = acquire(
+                File(staged), PetImage._meta.get_field('image'), prepare=render_image,
+                near_duplicates=pet_photo_near_duplicates(),
+            )
+    except Exception as e:
+        logger.error(f"Processing image {image.pk} for pet {image.pet_id} failed: {e}")
+        image.status = PetImage.Status.FAILED
+        image.save(update_fields=['status'])
+        return False
+
+    staged_path = image.staged_path
+    image.image = asset.resource
+    image.status = PetImage.Status.READY
+    image.staged_path = ''
+    # A regular save, so the PetImage signal touches the pet and drops cached pages
+    image.save(update_fields=['image', 'variants', 'status', 'staged_path'])
+    try:
+        os.remove(staged_path)
+    except OSError as e:
+        logger.warning(f"Could not remove staged image {staged_path}: {e}")
+    return True
+
+
+def claim_image(pk, statuses=(PetImage.Status.PENDING,)):
+    # Conditional update, so the worker pool and the sweep command never
+    # process the same image twice.
+    claimed = PetImage.objects.filter(pk=pk, status__in=statuses).update(status=PetImage.Status.PROCESSING)
+    return PetImage.objects.get(pk=pk) if claimed else None
+
+
+def process_images(image_ids, statuses=(PetImage.Status.PENDING,)):
+    """Process the images among ``image_ids`` still in ``statuses``. Returns (ready, failed)."""
+    ready = failed = 0
+    for pk in sorted(image_ids):
+        image = claim_image(pk, statuses)
+        if image is None:
+            continue
+        if process_image(image):
+            ready += 1
+        else:
+            failed += 1
+    return ready, failed
+
+
+def _process_in_background(image_ids):
+    try:
+        process_images(image_ids)
+    except Exception:
+        logger.exception(f"Background processing of images {image_ids} failed")
+    finally:
+        # Worker threads get their own connections; don't leave them open
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PET_IMAGE_PROCESSING_WORKERS, thread_name_prefix='pet-image-processing'
+        )
+    return _executor
+
+
+def schedule_processing(image_ids):
+    """
+    Process ``image_ids`` once the current transaction commits: on the
+    in-process worker pool, or right away in this request when
+    PET_IMAGE_PROCESS_IN_BACKGROUND is off (serverless runtimes freeze
+    threads after the response). Anything lost with the process is picked
+    up by the process_pet_images command.
+    """
+    image_ids = list(image_ids)
+    if settings.PET_IMAGE_PROCESS_IN_BACKGROUND:
+        transaction.on_commit(lambda: get_executor().submit(_process_in_background, image_ids))
+    else:
+        transaction.on_commit(lambda: process_images(image_ids), robust=True)
+
+
+def stale_images(statuses, older_than=None):
+    """
+    Images still in ``statuses`` ``older_than`` seconds after upload, i.e.
+    lost with a worker process rather than waiting for one.
+    """
+    older_than = settings.PET_IMAGE_PENDING_GRACE if older_than is None else older_than
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return PetImage.objects.filter(status__in=statuses, uploaded_at__lte=cutoff)
@@ -0,0 +1,108 @@
+from decimal import Decimal
+from urllib.parse import urlencode
+
+from django.db.models import Q
+from django.http import QueryDict
+
+from .filters import PetFilter
+from .models import Pet, SavedSearch, SavedSearchMatch
+from .search import search_pets
+
+# PetFilter parameters a saved search may use. availability is implied:
+# only available listings are ever matched.
+SEARCH_FILTERS = ('keyword', 'pet_type', 'gender', 'min_price', 'max_price', 'min_age', 'max_age', 'breed')
+
+
+def normalize_filters(params):
+    """
+    Validate ``params`` with PetFilter and return the canonical form stored
+    on a SavedSearch: only the supported filters that are set, as strings,
+    with free text lowercased and whitespace collapsed. Raises ValueError
+    with the filter errors if anything is invalid.
+    """
+    data = QueryDict(mutable=True)
+    for name, value in (params or {}).items():
+        data[name] = '' if value is None else str(value)
+    filterset = PetFilter(data, queryset=Pet.objects.none())
+    if not filterset.is_valid():
+        raise ValueError(filterset.errors)
+    normalized = {}
+    for name in SEARCH_FILTERS:
+        value = filterset.form.cleaned_data.get(name)
+        if value in (None, ''):
+            continue
+        if name in ('keyword', 'breed'):
+            value = ' '.join(value.lower().split())
+        normalized[name] = str(value)
+    return normalized
+
+
+def bucket_fields(filters):
+    """Values of the SavedSearch columns the candidate query filters on."""
+    return {
+        'pet_type': filters.get('pet_type', ''),
+        'gender': filters.get('gender', ''),
+        'min_price': Decimal(filters['min_price']) if 'min_price' in filters else None,
+        'max_price': Decimal(filters['max_price']) if 'max_price' in filters else None,
+    }
+
+
+def query_string(filters):
+    """The filters as a pet list query string, for opening the search."""
+    return urlencode(sorted(filters.items()))
+
+
+def candidate_searches(pet):
+    """Saved searches whose pet type, gender and price bounds admit ``pet``."""
+    price = Q(min_price__isnull=True, max_price__isnull=True)
+    if pet.price is not None:
+        # Like the price filters, a bound never matches a pet without a price
+        price |= (
+            (Q(min_price__isnull=True) | Q(min_price__lte=pet.price))
+            & (Q(max_price__isnull=True) | Q(max_price__gte=pet.price))
+        )
+    return (
+        SavedSearch.objects
+        .filter(pet_type__in=('', pet.pet_type), gender__in=('', pet.gender))
+        .filter(price)
+        .exclude(user_id=pet.owner_id)
+    )
+
+
+def _satisfies(filters, pet, keyword_matches):
+    age = Decimal(str(pet.age))
+    if 'min_age' in filters and age < Decimal(filters['min_age']):
+        return False
+    if 'max_age' in filters and age > Decimal(filters['max_age']):
+        return False
+    if 'breed' in filters and filters['breed'] not in (pet.breed or '').lower():
+        return False
+    if 'keyword' in filters:
+        # Same full-text semantics as the list endpoint, one query per
+        # distinct keyword
+        keyword = filters['keyword']
+        if keyword not in keyword_matches:
+            keyword_matches[keyword] = search_pets(Pet.objects.filter(pk=pet.pk), keyword).exists()
+        return keyword_matches[keyword]
+    return True
+
+
+def match_pet(pet):
+    """
+    Add ``pet`` to the inbox of every saved search it satisfies, skipping
+    searches it already matched. Returns the number of searches satisfied.
+    """
+    if not pet.availability:
+        return 0
+    keyword_matches = {}
+    matches = [
+        SavedSearchMatch(search_id=search.pk, user_id=search.user_id, pet_id=pet.pk)
+        for search in candidate_searches(pet).only('id', 'user_id', 'filters')
+        if _satisfies(search.filters, pet, keyword_matches)
+    ]
+    SavedSearchMatch.objects.bulk_create(matches, ignore_conflicts=True)
+    return len(matches)
+
+
+def match_pets(pets):
+    return sum(match_pet(pet) for pet in pets)
@@ -0,0 +1,223 @@
+import logging
+import re
+
+from django.db import OperationalError, connections, models
+from django.db.models.expressions import RawSQL
+from django.db.models.sql.constants import INNER
+
+logger = logging.getLogger(__name__)
+
+PET_TABLE = 'pets_pet'
+FTS_TABLE = 'pets_pet_fts'
+SEARCH_CONFIG = 'english'
+
+# Column weights used for ranking: a hit in the name counts more than one in
+# the breed, which counts more than one buried in the description.
+NAME_WEIGHT, BREED_WEIGHT, DESCRIPTION_WEIGHT = 10.0, 5.0, 1.0
+
+POSTGRES_INSTALL = [
+    f"""
+    ALTER TABLE {PET_TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(breed, '')), 'B') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    f"CREATE INDEX IF NOT EXISTS {PET_TABLE}_search_vector_gin ON {PET_TABLE} USING GIN (search_vector)",
+]
+
+POSTGRES_UNINSTALL = [
+    f"DROP INDEX IF EXISTS {PET_TABLE}_search_vector_gin",
+    f"ALTER TABLE {PET_TABLE} DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {PET_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, breed, description)
+        VALUES (new.id, new.name, new.breed, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {PET_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, breed, description)
+        VALUES ('delete', old.id, old.name, old.breed, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, breed, description ON {PET_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, breed, description)
+        VALUES ('delete', old.id, old.name, old.breed, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, name, breed, description)
+        VALUES (new.id, new.name, new.breed, new.description);
+    END
+    """,
+]
+
+SQLITE_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def install_search_index(connection):
+    """
+    Create the backend specific search index for pets. Safe to call
+    repeatedly: SQLite loses the sync triggers whenever a migration rebuilds
+    the pets table, so this runs again after every migrate.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for statement in POSTGRES_INSTALL:
+                cursor.execute(statement)
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE name LIKE %s", [f'{FTS_TABLE}%'])
+            existing = {row[0] for row in cursor.fetchall()}
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                    f"name, breed, description, content='{PET_TABLE}', content_rowid='id', "
+                    f"tokenize='porter unicode61')"
+                )
+            except OperationalError as e:
+                logger.error(f"SQLite build lacks FTS5, keyword search stays unindexed: {e}")
+                return
+            for statement in SQLITE_TRIGGERS:
+                cursor.execute(statement)
+            # Rebuild when the table or any trigger was missing, the shadow
+            # table may have drifted while writes went unobserved.
+            if not {FTS_TABLE, f'{FTS_TABLE}_ai', f'{FTS_TABLE}_ad', f'{FTS_TABLE}_au'} <= existing:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def uninstall_search_index(connection):
+    statements = {'postgresql': POSTGRES_UNINSTALL, 'sqlite': SQLITE_UNINSTALL}.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+class SQLiteMatchJoin:
+    """
+    ``INNER JOIN (SELECT rowid, score FROM pets_pet_fts WHERE ... MATCH %s)``
+    on the pet id: the FTS5 matches of one query with their bm25 rank, as
+    an entry of Query.alias_map (see django.db.models.sql.datastructures.Join
+    for the interface).
+    """
+    table_name = f'{FTS_TABLE}_match'
+    join_type = INNER
+    nullable = False
+    filtered_relation = None
+
+    def __init__(self, fts_query, parent_alias, table_alias=None):
+        self.fts_query = fts_query
+        self.parent_alias = parent_alias
+        self.table_alias = table_alias
+
+    def as_sql(self, compiler, connection):
+        qn = compiler.quote_name_unless_alias
+        # bm25() is "lower is better"; negate it so both backends rank descending.
+        matches = (
+            f"SELECT rowid, -bm25({FTS_TABLE}, {NAME_WEIGHT}, {BREED_WEIGHT}, {DESCRIPTION_WEIGHT}) AS score "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+        )
+        sql = (
+            f"{self.join_type} ({matches}) {qn(self.table_alias)} "
+            f"ON ({qn(self.table_alias)}.rowid = {qn(self.parent_alias)}.{qn('id')})"
+        )
+        return sql, [self.fts_query]
+
+    def relabeled_clone(self, change_map):
+        return self.__class__(
+            self.fts_query,
+            change_map.get(self.parent_alias, self.parent_alias),
+            change_map.get(self.table_alias, self.table_alias),
+        )
+
+    @property
+    def identity(self):
+        return self.__class__, self.table_name, self.parent_alias, self.fts_query
+
+    def __eq__(self, other):
+        return isinstance(other, SQLiteMatchJoin) and self.identity == other.identity
+
+    def __hash__(self):
+        return hash(self.identity)
+
+
+class MatchRank(models.Expression):
+    """The score column of a SQLiteMatchJoin."""
+    output_field = models.FloatField()
+
+    def __init__(self, alias):
+        super().__init__()
+        self.alias = alias
+
+    def as_sql(self, compiler, connection):
+        return f"{compiler.quote_name_unless_alias(self.alias)}.score", []
+
+    def relabeled_clone(self, change_map):
+        return self.__class__(change_map.get(self.alias, self.alias))
+
+
+def search_terms(value):
+    return re.findall(r'\w+', value or '')
+
+
+def search_pets(queryset, value):
+    """
+    Filter ``queryset`` to pets matching ``value`` and annotate each row with
+    ``search_rank`` (higher is more relevant). Every term must match, as a
+    word prefix, in the name, breed or description.
+    """
+    terms = search_terms(value)
+    if not terms:
+        return queryset
+
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        match = f"{PET_TABLE}.search_vector @@ to_tsquery('{SEARCH_CONFIG}', %s)"
+        rank = f"ts_rank({PET_TABLE}.search_vector, to_tsquery('{SEARCH_CONFIG}', %s))"
+        return queryset.filter(
+            RawSQL(match, [tsquery], output_field=models.BooleanField())
+        ).annotate(search_rank=RawSQL(rank, [tsquery], output_field=models.FloatField()))
+
+    if vendor == 'sqlite' and _sqlite_index_available(queryset.db):
+        fts_query = ' '.join('"%s"*' % term for term in terms)
+        # MATCH runs once, in a joined derived table that carries the rank,
+        # rather than once per candidate row in a correlated subquery.
+        queryset = queryset.all()
+        query = queryset.query
+        alias = query.join(SQLiteMatchJoin(fts_query, query.get_initial_alias()))
+        return queryset.annotate(search_rank=MatchRank(alias))
+
+    condition = models.Q()
+    for term in terms:
+        condition &= (
+            models.Q(name__icontains=term) |
+            models.Q(breed__icontains=term) |
+            models.Q(description__icontains=term)
+        )
+    return queryset.filter(condition).annotate(search_rank=models.Value(0.0, output_field=models.FloatField()))
+
+
+_sqlite_fts_available = {}
+
+
+def _sqlite_index_available(alias):
+    if alias not in _sqlite_fts_available:
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+                available = cursor.fetchone() is not None
+        except OperationalError:
+            available = False
+        if not available:
+            logger.warning("Full-text index missing; falling back to icontains search")
+        _sqlite_fts_available[alias] = available
+    return _sqlite_fts_available[alias]
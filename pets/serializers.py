@@ -1,32 +1,139 @@
-from django.db import transaction
+from collections import defaultdict
+from django.conf import settings
+from django.db import models, transaction
 from rest_framework import serializers
-from .models import Pet, PetImage, Payment
+from .models import ArchivedPet, ArchivedPetImage, Pet, PetImage, Payment, SavedSearch, SavedSearchMatch
+from .processing import create_pending_image
+from .saved_searches import bucket_fields, normalize_filters, query_string
+from .uploads import SignedUploadField, is_stored
 
 class PetImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = PetImage
-        fields = ['id', 'image', 'uploaded_at']
+        fields = ['id', 'image', 'variants', 'status', 'uploaded_at']
+        read_only_fields = ['variants']
+
+def cover_image_url(images_data):
+    """Thumbnail of the first image that has finished processing."""
+    return next((image['variants']['thumb'] for image in images_data if image['variants']), None)
+
+def load_images_data(pets):
+    """
+    Serialize the images of every pet in ``pets`` with a single query and
+    cache the result on each instance as ``_images_data``.
+    """
+    pending = {pet.pk: pet for pet in pets if pet.pk and not hasattr(pet, '_images_data')}
+    if not pending:
+        return
+    images = list(PetImage.objects.filter(pet_id__in=pending).order_by('pet_id', 'id'))
+    grouped = defaultdict(list)
+    for image, item in zip(images, PetImageSerializer(images, many=True).data):
+        grouped[image.pet_id].append(item)
+    for pk, pet in pending.items():
+        pet._images_data = grouped.get(pk, [])
+
+class PetListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        pets = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        if self.child.needs_images():
+            load_images_data([pet for pet in pets if isinstance(pet, Pet)])
+        return super().to_representation(pets)
+
+def add_image(pet, image):
+    # Direct uploads are already stored; files go through the processing pipeline
+    if is_stored(image):
+        return PetImage.objects.create(pet=pet, image=image)
+    return create_pending_image(pet, image)
+
+def split_param(value):
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
 
 class PetSerializer(serializers.ModelSerializer):
     owner = serializers.ReadOnlyField(source='owner.username')
-    image = serializers.ImageField(write_only=True, required=True)
+    image = SignedUploadField(write_only=True, required=True)
     images_data = serializers.SerializerMethodField()
+    cover_image = serializers.SerializerMethodField()
     ref_name = 'PetsPetSerializer'
 
+    # Output shapes. ``?fields=`` replaces the shape with an explicit list,
+    # ``?expand=`` adds fields on top of it.
+    full_fields = [
+        'id', 'owner', 'name', 'pet_type', 'breed', 'age',
+        'gender', 'description', 'is_for_adoption', 'price',
+        'availability', 'created_at', 'updated_at', 'images_data'
+    ]
+    compact_fields = [
+        'id', 'owner', 'name', 'pet_type', 'breed', 'age',
+        'gender', 'is_for_adoption', 'price', 'availability',
+        'created_at', 'cover_image'
+    ]
+
     class Meta:
         model = Pet
         fields = [
             'id', 'owner', 'name', 'pet_type', 'breed', 'age',
             'gender', 'description', 'is_for_adoption', 'price',
             'availability', 'created_at', 'updated_at',
-            'image', 'images_data'
+            'image', 'images_data', 'cover_image'
         ]
+        list_serializer_class = PetListSerializer
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        allowed = self.get_output_fields()
+        for name, field in list(self.fields.items()):
+            if not field.write_only and name not in allowed:
+                self.fields.pop(name)
+
+    def get_output_fields(self):
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            # Writes always echo the full representation
+            return set(self.full_fields)
+        params = request.query_params
+        requested = split_param(params.get('fields'))
+        if requested:
+            return set(requested)
+        if self.context.get('representation') == 'compact':
+            base = self.compact_fields
+        else:
+            base = self.full_fields
+        return set(base) | set(split_param(params.get('expand')))
+
+    def needs_images(self):
+        return 'images_data' in self.fields or 'cover_image' in self.fields
+
+    def optimize_queryset(self, queryset, extra_columns=()):
+        """
+        Restrict ``queryset`` to the columns this serializer will read, plus
+        ``extra_columns``, so fields left out of the response (typically
+        ``description``) are never loaded.
+        """
+        columns = {'id', 'created_at', *extra_columns}
+        for name, field in self.fields.items():
+            if field.write_only or isinstance(field, serializers.SerializerMethodField):
+                continue
+            if name == 'owner':
+                columns.add('owner__username')
+            else:
+                columns.add(field.source)
+        if 'owner' not in self.fields:
+            queryset = queryset.select_related(None)
+        return queryset.only(*columns)
+
+    def to_representation(self, instance):
+        if isinstance(instance, Pet) and self.needs_images():
+            load_images_data([instance])
+        return super().to_representation(instance)
 
     def get_images_data(self, obj):
         if isinstance(obj, Pet) and obj.pk:
-            return PetImageSerializer(obj.images.all(), many=True).data
+            return obj._images_data
         return []
 
+    def get_cover_image(self, obj):
+        return cover_image_url(self.get_images_data(obj))
+
     def validate(self, data):
         is_for_adoption = data.get('is_for_adoption', getattr(self.instance, 'is_for_adoption', False))
         price = data.get('price', getattr(self.instance, 'price', None) if self.instance else None)
@@ -46,36 +153,113 @@ class PetSerializer(serializers.ModelSerializer):
         validated_data.pop('owner', None)
         with transaction.atomic():
             pet = Pet.objects.create(owner=owner, **validated_data)
-            PetImage.objects.create(pet=pet, image=image)
+            add_image(pet, image)
         return pet
 
     def update(self, instance, validated_data):
         image = validated_data.pop('image', None)
         replace_images = validated_data.pop('replace_images', False)
+        instance.__dict__.pop('_images_data', None)
         with transaction.atomic():
             if image and replace_images:
                 instance.images.all().delete()
-                PetImage.objects.create(pet=instance, image=image)
+                add_image(instance, image)
             elif image:
-                PetImage.objects.create(pet=instance, image=image)
+                add_image(instance, image)
             for attr, value in validated_data.items():
                 setattr(instance, attr, value)
             instance.save()
         return instance
 
+class PetImageUploadSerializer(serializers.Serializer):
+    uploads = serializers.ListField(child=SignedUploadField(), required=False)
+
+class ArchivedPetImageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArchivedPetImage
+        fields = ['id', 'image', 'variants', 'status', 'uploaded_at']
+
+class ArchivedPetSerializer(serializers.ModelSerializer):
+    """Read-only detail of an archived listing, in the PetSerializer shape."""
+    owner = serializers.ReadOnlyField(source='owner.username')
+    images_data = ArchivedPetImageSerializer(source='images', many=True, read_only=True)
+    archived = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ArchivedPet
+        fields = PetSerializer.full_fields + ['archived', 'archived_at']
+
+    def get_archived(self, obj):
+        return True
+
 class PaymentSerializer(serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.username', read_only=True)
-    pet_name = serializers.CharField(source='pet.name', read_only=True)
+    pet_name = serializers.SerializerMethodField()
     post_id = serializers.SerializerMethodField()
 
     class Meta:
         model = Payment
         fields = ['id', 'user_name', 'pet_name', 'post_id', 'transaction_id', 'amount', 'status', 'created_at']
 
+    def get_pet_name(self, obj):
+        return obj.listing.name if obj.listing else None
+
     def get_post_id(self, obj):
         from users.models import Post
+        if obj.pet_id is None and obj.archived_pet_id is None:
+            return None
         try:
-            post = Post.objects.get(pet=obj.pet, user=obj.user)
+            post = Post.objects.get(pet_id=obj.pet_id, archived_pet_id=obj.archived_pet_id, user=obj.user)
             return post.id
         except Post.DoesNotExist:
-            return None
\ No newline at end of file
+            return None
+
+class SavedSearchSerializer(serializers.ModelSerializer):
+    unread_count = serializers.IntegerField(read_only=True, default=0)
+    query = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SavedSearch
+        fields = ['id', 'name', 'filters', 'query', 'unread_count', 'created_at']
+
+    def get_query(self, obj):
+        return query_string(obj.filters)
+
+    def validate_filters(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError('Expected an object of pet list filters')
+        try:
+            filters = normalize_filters(value)
+        except ValueError as e:
+            raise serializers.ValidationError(e.args[0])
+        if not filters:
+            raise serializers.ValidationError('A saved search needs at least one filter')
+        return filters
+
+    def validate(self, data):
+        request = self.context['request']
+        limit = settings.SAVED_SEARCH_MAX_PER_USER
+        if self.instance is None and SavedSearch.objects.filter(user=request.user).count() >= limit:
+            raise serializers.ValidationError(f'You can keep at most {limit} saved searches')
+        return data
+
+    def create(self, validated_data):
+        return SavedSearch.objects.create(
+            user=self.context['request'].user, **validated_data, **bucket_fields(validated_data['filters'])
+        )
+
+    def update(self, instance, validated_data):
+        if 'filters' in validated_data:
+            validated_data.update(bucket_fields(validated_data['filters']))
+        return super().update(instance, validated_data)
+
+class SavedSearchMatchSerializer(serializers.ModelSerializer):
+    search_name = serializers.CharField(source='search.name', read_only=True)
+    pet = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SavedSearchMatch
+        fields = ['id', 'search', 'search_name', 'pet', 'is_read', 'created_at']
+
+    def get_pet(self, obj):
+        return PetSerializer(obj.pet, context={**self.context, 'representation': 'compact'}).data
@@ -0,0 +1,139 @@
+import os
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import autocomplete, similar
+from .assets import release
+from .cache import bump_catalog_version, bump_pet_version
+from .facets import apply_facet_change, facet_values, increment_facet
+from .models import Pet, PetImage, PetTombstone
+from .saved_searches import match_pet, match_pets
+from .variants import image_variants
+
+# Fields whose previous values the derived structures need to diff against
+TRACKED_FIELDS = ('availability', 'pet_type', 'gender', 'is_for_adoption', 'breed', 'name')
+
+
+def invalidate_pet(pk):
+    # Bump after commit so a concurrent rebuild cannot cache pre-commit rows
+    # under the new version.
+    def bump():
+        bump_catalog_version()
+        bump_pet_version(pk)
+    transaction.on_commit(bump)
+
+
+def pet_state(instance):
+    return {field: getattr(instance, field) for field in TRACKED_FIELDS}
+
+
+def vector_row(instance):
+    return {field: getattr(instance, field) for field in (*similar.VECTOR_FIELDS, 'availability')}
+
+
+def stored_pet_state(instance):
+    loaded = getattr(instance, '_loaded_values', {})
+    if all(field in loaded for field in TRACKED_FIELDS):
+        return {field: loaded[field] for field in TRACKED_FIELDS}
+    return Pet.objects.filter(pk=instance.pk).values(*TRACKED_FIELDS).first()
+
+
+def pets_created_in_bulk(pets):
+    """
+    bulk_create() sends no signals, so bulk writers call this for the rows
+    they inserted to keep facets, typeahead and cached pages in step.
+    """
+    states = [pet_state(pet) for pet in pets]
+    rows = [vector_row(pet) for pet in pets]
+    deltas = Counter()
+    for state in states:
+        for facet, value in facet_values(state).items():
+            deltas[facet, value] += 1
+    for (facet, value), delta in deltas.items():
+        increment_facet(facet, value, delta)
+
+    def apply():
+        for state in states:
+            autocomplete.apply_change(None, state)
+        for row in rows:
+            similar.apply_change(row)
+        bump_catalog_version()
+    transaction.on_commit(apply)
+    transaction.on_commit(lambda: match_pets(pets), robust=True)
+
+
+@receiver(pre_save, sender=Pet)
+def remember_pet_state(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance._previous_state = None if instance._state.adding else stored_pet_state(instance)
+
+
+@receiver(post_save, sender=Pet)
+def pet_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        old_state, new_state = getattr(instance, '_previous_state', None), pet_state(instance)
+        apply_facet_change(old_state, new_state)
+        transaction.on_commit(lambda: autocomplete.apply_change(old_state, new_state))
+        row = vector_row(instance)
+        transaction.on_commit(lambda: similar.apply_change(row))
+        # Robust: a failing matcher must not fail the save that triggered it
+        transaction.on_commit(lambda: match_pet(instance), robust=True)
+        instance._loaded_values = {**getattr(instance, '_loaded_values', {}), **new_state}
+    invalidate_pet(instance.pk)
+
+
+@receiver(post_delete, sender=Pet)
+def pet_deleted(sender, instance, **kwargs):
+    old_state = pet_state(instance)
+    apply_facet_change(old_state, None)
+    transaction.on_commit(lambda: autocomplete.apply_change(old_state, None))
+    pk = instance.pk
+    transaction.on_commit(lambda: similar.apply_change({'id': pk}))
+    # For delta sync clients; deleting and archiving both end up here
+    PetTombstone.objects.create(pet_id=pk)
+    invalidate_pet(instance.pk)
+
+
+@receiver(pre_save, sender=PetImage)
+def fill_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance.variants = image_variants(instance.image)
+
+
+@receiver(post_save, sender=PetImage)
+@receiver(post_delete, sender=PetImage)
+def pet_image_changed(sender, instance, **kwargs):
+    pet_images_changed(instance.pet_id)
+
+
+@receiver(post_delete, sender=PetImage)
+def release_image_asset(sender, instance, **kwargs):
+    release(instance.image)
+
+
+@receiver(post_delete, sender=PetImage)
+def discard_staged_image(sender, instance, **kwargs):
+    # Deleted before the pipeline got to it
+    path = instance.staged_path
+    if not path:
+        return
+
+    def remove():
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    transaction.on_commit(remove)
+
+
+def pet_images_changed(pet_id):
+    # Image changes count as changes to the listing, so list validators and
+    # anything else keyed on Pet.updated_at notice them. Also called
+    # directly after bulk image writes, which send no signals.
+    Pet.objects.filter(pk=pet_id).update(updated_at=timezone.now())
+    invalidate_pet(pet_id)
@@ -0,0 +1,309 @@
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ArchivedPet, Pet, PetTombstone
+
+# Columns a pet's vector is computed from
+VECTOR_FIELDS = ('id', 'pet_type', 'breed', 'age', 'gender', 'description', 'price')
+
+# Share of the similarity each block contributes: the cosine of two pets is
+# the weighted sum of their text cosine and of how closely each attribute
+# matches. Every block is unit length before weighting.
+BLOCK_WEIGHTS = {'text': 1.0, 'pet_type': 1.0, 'gender': 0.2, 'age': 0.3, 'price': 0.3}
+PET_TYPES = [value for value, _ in Pet.PET_TYPES]
+GENDERS = [value for value, _ in Pet.GENDER_CHOICES]
+MAX_AGE = 10
+
+TOKEN_RE = re.compile(r'[a-z]{2,}')
+
+
+def tokens(row):
+    """Description words, plus breed words marked apart so a shared breed counts on its own."""
+    words = TOKEN_RE.findall((row['description'] or '').lower())
+    words += ['breed:' + word for word in TOKEN_RE.findall((row['breed'] or '').lower())]
+    return words
+
+
+def _angle(fraction):
+    # A [0, 1] value as a unit 2-vector, so the dot product of two of them
+    # is cos(pi/2 * difference): 1 when equal, 0 at opposite ends.
+    theta = min(max(fraction, 0.0), 1.0) * math.pi / 2
+    return math.cos(theta), math.sin(theta)
+
+
+class PetVectorIndex:
+    """
+    Unit-length feature vectors of available pets, one row per pet in a
+    float32 matrix, so the nearest neighbours of a pet are one matrix-vector
+    product away.
+
+    The vocabulary, IDF weights and price scale are fixed when the index is
+    fitted; pets added later are vectorized against them, and removed pets
+    are masked out until the next fit.
+    """
+
+    def __init__(self, vocabulary, idf, price_range, pet_ids=(), matrix=None, built_at=None):
+        self.vocabulary = {term: column for column, term in enumerate(vocabulary)}
+        self.terms = list(vocabulary)
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self.price_range = tuple(float(value) for value in price_range)
+        self.dimensions = len(self.terms) + len(PET_TYPES) + len(GENDERS) + 4
+        pet_ids = list(pet_ids)
+        self._matrix = np.zeros((max(len(pet_ids), 64), self.dimensions), dtype=np.float32)
+        if matrix is not None and len(pet_ids):
+            self._matrix[:len(pet_ids)] = matrix
+        self._ids = np.zeros(len(self._matrix), dtype=np.int64)
+        self._ids[:len(pet_ids)] = pet_ids
+        self._alive = np.zeros(len(self._matrix), dtype=bool)
+        self._alive[:len(pet_ids)] = True
+        self._size = len(pet_ids)
+        self._rows = {int(pk): row for row, pk in enumerate(pet_ids)}
+        self._lock = threading.RLock()
+        # When the rows it was fitted on were read; later changes are
+        # caught up on load
+        self.built_at = built_at
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, pk):
+        return pk in self._rows
+
+    @classmethod
+    def fit(cls, rows, max_terms=None, min_df=None):
+        """Fit the vocabulary, IDF and price scale to ``rows`` and index them all."""
+        max_terms = settings.PET_VECTORS_MAX_TERMS if max_terms is None else max_terms
+        min_df = settings.PET_VECTORS_MIN_DF if min_df is None else min_df
+        rows = list(rows)
+        documents = [tokens(row) for row in rows]
+        df = Counter(term for words in documents for term in set(words))
+        vocabulary = sorted(
+            (term for term, count in df.most_common(max_terms) if count >= min_df)
+        )
+        total = len(rows)
+        idf = [math.log((1 + total) / (1 + df[term])) + 1 for term in vocabulary]
+        prices = [math.log1p(float(row['price'])) for row in rows if row['price'] is not None]
+        price_range = (min(prices), max(prices)) if prices else (0.0, 0.0)
+
+        index = cls(vocabulary, idf, price_range)
+        index.add_many(rows, documents)
+        return index
+
+    def vector(self, row, words=None):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        counts = Counter(term for term in (tokens(row) if words is None else words) if term in self.vocabulary)
+        if counts:
+            columns = np.fromiter((self.vocabulary[term] for term in counts), dtype=np.int64, count=len(counts))
+            text = np.fromiter(counts.values(), dtype=np.float32, count=len(counts)) * self.idf[columns]
+            vector[columns] = text / np.linalg.norm(text) * math.sqrt(BLOCK_WEIGHTS['text'])
+
+        offset = len(self.terms)
+        for block, values in (('pet_type', PET_TYPES), ('gender', GENDERS)):
+            if row[block] in values:
+                vector[offset + values.index(row[block])] = math.sqrt(BLOCK_WEIGHTS[block])
+            offset += len(values)
+
+        vector[offset:offset + 2] = _angle(float(row['age'] or 0) / MAX_AGE)
+        vector[offset:offset + 2] *= math.sqrt(BLOCK_WEIGHTS['age'])
+        if row['price'] is not None:
+            # Log scale: 500 vs 1000 is as different as 5000 vs 10000
+            low, high = self.price_range
+            price = math.log1p(float(row['price']))
+            vector[offset + 2:offset + 4] = _angle((price - low) / (high - low) if high > low else 0.0)
+            vector[offset + 2:offset + 4] *= math.sqrt(BLOCK_WEIGHTS['price'])
+
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def add(self, row):
+        """Index or re-index one pet row."""
+        self.add_many([row])
+
+    def add_many(self, rows, documents=None):
+        documents = documents or [None] * len(rows)
+        vectors = [self.vector(row, words) for row, words in zip(rows, documents)]
+        with self._lock:
+            for row, vector in zip(rows, vectors):
+                position = self._rows.get(row['id'])
+                if position is None:
+                    position = self._append()
+                    self._rows[row['id']] = position
+                    self._ids[position] = row['id']
+                self._matrix[position] = vector
+                self._alive[position] = True
+
+    def _append(self):
+        if self._size == len(self._matrix):
+            # Amortized growth for listings added one at a time
+            capacity = len(self._matrix) * 2
+            self._matrix = np.resize(self._matrix, (capacity, self.dimensions))
+            self._ids = np.resize(self._ids, capacity)
+            self._alive = np.resize(self._alive, capacity)
+            self._alive[self._size:] = False
+        self._size += 1
+        return self._size - 1
+
+    def remove(self, pk):
+        with self._lock:
+            position = self._rows.pop(pk, None)
+            if position is not None:
+                self._alive[position] = False
+
+    def stored_vector(self, pk):
+        with self._lock:
+            position = self._rows.get(pk)
+            return None if position is None else self._matrix[position].copy()
+
+    def nearest(self, vector, limit, exclude=None):
+        """Ids of the ``limit`` indexed pets closest to ``vector``, best first, with their scores."""
+        with self._lock:
+            size = self._size
+            scores = self._matrix[:size] @ vector
+            scores[~self._alive[:size]] = -np.inf
+            if exclude in self._rows:
+                scores[self._rows[exclude]] = -np.inf
+            ids = self._ids[:size].copy()
+        limit = min(limit, size)
+        if limit <= 0:
+            return []
+        # Partial selection first, so only the top ``limit`` scores get sorted
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(ids[position]), float(scores[position])) for position in top if scores[position] > 0]
+
+    def save(self, path):
+        """Write the index to ``path`` atomically, so readers never load a partial file."""
+        with self._lock:
+            live = np.flatnonzero(self._alive[:self._size])
+            arrays = {
+                'terms': np.array(self.terms, dtype=str),
+                'idf': self.idf,
+                'price_range': np.array(self.price_range),
+                'pet_ids': self._ids[live],
+                'matrix': self._matrix[live],
+            }
+            if self.built_at is not None:
+                arrays['built_at'] = np.array(self.built_at.timestamp())
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=directory, suffix='.npz', delete=False) as target:
+            np.savez(target, **arrays)
+        os.replace(target.name, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            built_at = None
+            if 'built_at' in arrays.files:
+                built_at = datetime.fromtimestamp(float(arrays['built_at']), tz=dt_timezone.utc)
+            return cls(
+                arrays['terms'].tolist(), arrays['idf'], arrays['price_range'],
+                pet_ids=arrays['pet_ids'].tolist(), matrix=arrays['matrix'], built_at=built_at,
+            )
+
+
+def available_rows():
+    return Pet.objects.filter(availability=True).order_by('id').values(*VECTOR_FIELDS).iterator(chunk_size=2000)
+
+
+def build_index():
+    built_at = timezone.now()
+    index = PetVectorIndex.fit(available_rows())
+    index.built_at = built_at
+    return index
+
+
+def catch_up(index, since):
+    """Apply to ``index`` the pets changed, deleted or archived after ``since``."""
+    for pk in PetTombstone.objects.filter(deleted_at__gt=since).values_list('pet_id', flat=True):
+        index.remove(pk)
+    for row in Pet.objects.filter(updated_at__gt=since).values(*VECTOR_FIELDS, 'availability').iterator():
+        _apply(index, row)
+
+
+def listing_row(pk):
+    """Vector fields of a live or archived listing, or None."""
+    return (
+        Pet.objects.filter(pk=pk).values(*VECTOR_FIELDS).first()
+        or ArchivedPet.objects.filter(pk=pk).values(*VECTOR_FIELDS).first()
+    )
+
+
+_index = None
+_loaded_mtime = None
+_checked_at = float('-inf')
+_load_lock = threading.Lock()
+
+
+def _file_mtime():
+    try:
+        return os.stat(settings.PET_VECTORS_PATH).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def get_index():
+    """
+    The process-wide index: the file written by build_pet_vectors, reloaded
+    when a newer one appears (checked every PET_VECTORS_RELOAD_SECONDS) and
+    caught up with the changes made since it was built. None until the
+    file exists: fitting the catalog is the command's job, never a
+    request's.
+    """
+    global _index, _loaded_mtime, _checked_at
+    if time.monotonic() - _checked_at < settings.PET_VECTORS_RELOAD_SECONDS:
+        return _index
+    with _load_lock:
+        if time.monotonic() - _checked_at >= settings.PET_VECTORS_RELOAD_SECONDS:
+            mtime = _file_mtime()
+            if mtime is not None and mtime != _loaded_mtime:
+                index = PetVectorIndex.load(settings.PET_VECTORS_PATH)
+                catch_up(index, index.built_at or datetime.fromtimestamp(mtime, tz=dt_timezone.utc))
+                _index, _loaded_mtime = index, mtime
+            _checked_at = time.monotonic()
+    return _index
+
+
+def similar_pets(pk, limit):
+    """
+    Ids of the pets most similar to pet ``pk``, best first, or None if no
+    such listing exists. Pets not in the index yet are vectorized on the
+    fly; before the first build_pet_vectors run there are none.
+    """
+    index = get_index()
+    vector = index.stored_vector(pk) if index is not None else None
+    if vector is None:
+        row = listing_row(pk)
+        if row is None:
+            return None
+        if index is None:
+            return []
+        vector = index.vector(row)
+    return [pet_id for pet_id, _ in index.nearest(vector, limit, exclude=pk)]
+
+
+def apply_change(row):
+    """
+    Keep the in-process index in step with a pet saved or deleted in this
+    process: ``row`` is its VECTOR_FIELDS plus availability, or just the id
+    for a deletion.
+    """
+    if _index is not None:
+        _apply(_index, row)
+
+
+def _apply(index, row):
+    if row.get('availability'):
+        index.add(row)
+    else:
+        index.remove(row['id'])
@@ -0,0 +1,168 @@
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import cloudinary
+import cloudinary.uploader
+import cloudinary.utils
+from django.conf import settings
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class ImageUploadError(Exception):
+    pass
+
+
+class CloudinaryImageStorage:
+    """Uploads straight to Cloudinary, the same call CloudinaryField makes on save."""
+
+    def upload(self, file, **options):
+        if hasattr(file, 'seekable') and file.seekable():
+            file.seek(0)
+        return cloudinary.uploader.upload_resource(file, **options)
+
+    def delete(self, resource):
+        cloudinary.uploader.destroy(resource.public_id, resource_type=resource.resource_type, type=resource.type)
+
+    def upload_ticket(self, public_id, expires, request=None):
+        """Signed parameters that let a client upload ``public_id`` to Cloudinary itself."""
+        params = {'public_id': public_id, 'timestamp': int(time.time())}
+        config = cloudinary.config()
+        return {
+            'url': cloudinary.utils.cloudinary_api_url('upload', resource_type='image'),
+            'fields': {
+                **params,
+                'api_key': config.api_key,
+                'signature': cloudinary.utils.api_sign_request(params, config.api_secret),
+            },
+        }
+
+    def verify_upload(self, public_id, version, signature, format=None):
+        """The resource for a client-side upload, if Cloudinary's response signature checks out."""
+        if not cloudinary.utils.verify_api_response_signature(public_id, version, signature):
+            raise ImageUploadError("Upload signature does not match")
+        return cloudinary.CloudinaryResource(
+            public_id, version=str(version), format=format, type='upload', resource_type='image'
+        )
+
+
+class LocalStubImageStorage:
+    """
+    Offline stand-in that never leaves the process: it sleeps for
+    PET_IMAGE_STORAGE_LATENCY seconds per call to mimic the network round
+    trip and hands back a resource under ``stub/``. For development and
+    benchmarks only.
+    """
+
+    def __init__(self, latency=None):
+        self.latency = settings.PET_IMAGE_STORAGE_LATENCY if latency is None else latency
+        self.deleted = []
+
+    def upload(self, file, **options):
+        time.sleep(self.latency)
+        extension = os.path.splitext(getattr(file, 'name', '') or '')[1].lstrip('.').lower()
+        return cloudinary.CloudinaryResource(
+            f"stub/{uuid.uuid4().hex}",
+            version='1',
+            format=extension or 'jpg',
+            type=options.get('type', 'upload'),
+            resource_type=options.get('resource_type', 'image'),
+        )
+
+    def delete(self, resource):
+        time.sleep(self.latency)
+        self.deleted.append(resource.public_id)
+
+    # Direct uploads go to LocalUploadView, which signs its response the
+    # way Cloudinary does, with an HMAC of the project secret.
+
+    @staticmethod
+    def sign(*parts):
+        return salted_hmac('pets.storage.local-upload', ':'.join(str(part) for part in parts)).hexdigest()
+
+    def upload_ticket(self, public_id, expires, request=None):
+        url = reverse('pet-upload-local')
+        return {
+            'url': request.build_absolute_uri(url) if request is not None else url,
+            'fields': {'public_id': public_id, 'expires': expires, 'signature': self.sign(public_id, expires)},
+        }
+
+    def receive_upload(self, file, public_id, expires, signature):
+        """Store a client upload made with a ticket and answer like Cloudinary would."""
+        if not constant_time_compare(signature, self.sign(public_id, expires)):
+            raise ImageUploadError("Ticket signature does not match")
+        if int(expires) < time.time():
+            raise ImageUploadError("Ticket has expired")
+        extension = os.path.splitext(getattr(file, 'name', '') or '')[1].lstrip('.').lower() or 'jpg'
+        path = os.path.join(settings.MEDIA_ROOT, 'stub_uploads', f"{public_id}.{extension}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as target:
+            for chunk in file.chunks():
+                target.write(chunk)
+        version = int(time.time())
+        return {
+            'public_id': public_id,
+            'version': version,
+            'format': extension,
+            'signature': self.sign(public_id, version),
+        }
+
+    def verify_upload(self, public_id, version, signature, format=None):
+        if not constant_time_compare(str(signature), self.sign(public_id, version)):
+            raise ImageUploadError("Upload signature does not match")
+        return cloudinary.CloudinaryResource(
+            public_id, version=str(version), format=format or 'jpg', type='upload', resource_type='image'
+        )
+
+
+@lru_cache(maxsize=None)
+def get_image_storage():
+    return import_string(settings.PET_IMAGE_STORAGE)()
+
+
+def upload_images(files, field, max_workers=None, storage=None):
+    """
+    Upload ``files`` for the CloudinaryField ``field`` concurrently on a
+    bounded thread pool. Returns the resources in input order. If any
+    upload fails, the ones that succeeded are deleted again and
+    ImageUploadError is raised.
+    """
+    storage = storage or get_image_storage()
+    options = {'type': field.type, 'resource_type': field.resource_type, **field.options}
+    max_workers = min(max_workers or settings.PET_IMAGE_UPLOAD_WORKERS, len(files)) or 1
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pet-image-upload') as executor:
+        futures = [executor.submit(storage.upload, file, **options) for file in files]
+    resources, errors = [], []
+    for future in futures:
+        try:
+            resources.append(future.result())
+        except Exception as e:
+            errors.append(e)
+    if errors:
+        discard_uploads(resources, storage=storage)
+        raise ImageUploadError(f"{len(errors)} of {len(files)} image uploads failed: {errors[0]}")
+    return resources
+
+
+def discard_uploads(resources, max_workers=None, storage=None):
+    """Best-effort removal of uploaded resources whose rows were never written."""
+    if not resources:
+        return
+    storage = storage or get_image_storage()
+
+    def delete(resource):
+        try:
+            storage.delete(resource)
+        except Exception as e:
+            logger.error(f"Could not delete orphaned upload {resource.public_id}: {e}")
+
+    max_workers = min(max_workers or settings.PET_IMAGE_UPLOAD_WORKERS, len(resources))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pet-image-upload') as executor:
+        list(executor.map(delete, resources))
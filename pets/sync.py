@@ -0,0 +1,101 @@
+import base64
+import heapq
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Pet, PetTombstone
+
+
+def encode_token(position):
+    timestamp, pk = position
+    raw = json.dumps({'v': [timestamp.isoformat(), pk]}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_token(token):
+    """The (timestamp, id) position a sync token stands for. Raises ValueError if it is malformed."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        timestamp, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))['v']
+        timestamp = parse_datetime(timestamp)
+    except (TypeError, ValueError, KeyError):
+        raise ValueError('Invalid sync token')
+    if timestamp is None or not isinstance(pk, int):
+        raise ValueError('Invalid sync token')
+    return timestamp, pk
+
+
+def removals_expired(timestamp):
+    # Older than the tombstones: removals since then can no longer be listed
+    return timestamp < timezone.now() - timedelta(days=settings.PET_SYNC_TOMBSTONE_DAYS)
+
+
+def token_expired(position):
+    return removals_expired(position[0])
+
+
+def settle_horizon():
+    """
+    Newest change a reader may hand out a position for. Changes from the
+    last PET_SYNC_SETTLE_SECONDS are held back, so a transaction that
+    commits after a read cannot slip in behind a position already given.
+    """
+    return timezone.now() - timedelta(seconds=settings.PET_SYNC_SETTLE_SECONDS)
+
+
+def _after(timestamp_field, id_field, position):
+    timestamp, pk = position
+    return Q(**{f'{timestamp_field}__gt': timestamp}) | Q(**{timestamp_field: timestamp, f'{id_field}__gt': pk})
+
+
+def changes(since, limit):
+    """
+    The first ``limit`` changes after the ``since`` position, in
+    (updated_at, id) order: pets changed since then, plus tombstones of
+    pets deleted or archived since then. Without ``since`` this is a full
+    sync of the available pets.
+
+    Changes newer than settle_horizon() are left for the next call.
+    Returns (pets, removed pet ids, next position, has_more); removed ids
+    include pets still present but unavailable.
+    """
+    horizon = settle_horizon()
+    pets = Pet.objects.filter(updated_at__lte=horizon).select_related('owner').order_by('updated_at', 'id')
+    if since is None:
+        pets = pets.filter(availability=True)
+        tombstones = PetTombstone.objects.none()
+    else:
+        pets = pets.filter(_after('updated_at', 'id', since))
+        tombstones = (
+            PetTombstone.objects.filter(_after('deleted_at', 'pet_id', since), deleted_at__lte=horizon)
+            .order_by('deleted_at', 'pet_id')
+        )
+
+    merged = heapq.merge(
+        (((pet.updated_at, pet.pk), pet) for pet in pets[:limit + 1]),
+        (((tombstone.deleted_at, tombstone.pet_id), None) for tombstone in tombstones[:limit + 1]),
+        key=lambda item: item[0],
+    )
+    page = [item for _, item in zip(range(limit + 1), merged)]
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    upserts, removed = [], []
+    for position, pet in page:
+        if pet is not None and pet.availability:
+            upserts.append(pet)
+        else:
+            removed.append(position[1])
+    return upserts, removed, page[-1][0] if page else since, has_more
+
+
+def prune_tombstones():
+    """Delete tombstones older than any sync token still accepted. Returns how many."""
+    cutoff = timezone.now() - timedelta(days=settings.PET_SYNC_TOMBSTONE_DAYS)
+    deleted, _ = PetTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
@@ -1,3 +1,480 @@
-from django.test import TestCase
+import base64
+import json
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from msg.models import Message
+from users.models import CustomUser, Post
+from .archive import archive_pets
+from .models import ArchivedPet, Payment, Pet, PetImage, PetTombstone, SavedSearchMatch
+from .payments import complete_payment, create_payment, fail_payment, get_gateway, reconcile_payments
+from .serializers import PetSerializer
+
+
+class PetImageBatchLoadingTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(
+            email='owner@example.com', username='owner', password='password123'
+        )
+        self.client = APIClient()
+        # Listing pages are cached across tests under the same catalog version
+        cache.clear()
+
+    def create_pets(self, count, images_per_pet=2):
+        for i in range(count):
+            pet = Pet.objects.create(
+                owner=self.owner, name=f'Pet {i}', pet_type='dog', breed='Labrador',
+                age='2.0', gender='male', description='Friendly', price='20.00'
+            )
+            for j in range(images_per_pet):
+                PetImage.objects.create(pet=pet, image=f'image/upload/v1/pets/{i}_{j}.jpg')
+
+    def test_serializer_loads_images_in_one_query(self):
+        self.create_pets(10)
+        with self.assertNumQueries(2):
+            data = PetSerializer(Pet.objects.select_related('owner'), many=True).data
+        self.assertEqual(len(data), 10)
+        self.assertTrue(all(len(item['images_data']) == 2 for item in data))
+
+    def test_list_query_count_does_not_grow_with_page_size(self):
+        self.create_pets(2)
+        with CaptureQueriesContext(connection) as small_page:
+            self.assertEqual(self.client.get('/pets/list/?page_size=2').status_code, 200)
+
+        self.create_pets(18)
+        with CaptureQueriesContext(connection) as large_page:
+            self.assertEqual(self.client.get('/pets/list/?page_size=20').status_code, 200)
+
+        self.assertEqual(len(small_page), len(large_page))
+
+
+class KeysetCursorTests(TestCase):
+    def setUp(self):
+        owner = CustomUser.objects.create_user(
+            email='owner@example.com', username='owner', password='password123'
+        )
+        for i in range(3):
+            Pet.objects.create(
+                owner=owner, name=f'Pet {i}', pet_type='dog', breed='Labrador',
+                age='2.0', gender='male', description='Friendly', price='20.00'
+            )
+        self.client = APIClient()
+        # Listing pages are cached across tests under the same catalog version
+        cache.clear()
+
+    def cursor(self, payload):
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+    def test_next_cursor_continues_the_listing(self):
+        first = self.client.get('/pets/list/?page_size=2').json()
+        second = self.client.get(first['next']).json()
+        ids = [pet['id'] for pet in first['results'] + second['results']]
+        self.assertEqual(len(set(ids)), 3)
+
+    def test_cursor_values_of_the_wrong_type_are_rejected(self):
+        for values in (['abc', 'x'], [None, None], ['2024-01-01T00:00:00+00:00', 'x']):
+            response = self.client.get('/pets/list/', {'cursor': self.cursor({'v': values})})
+            self.assertEqual(response.status_code, 404, values)
+
+
+@override_settings(PAYMENT_GATEWAY='pets.payments.FakePaymentGateway')
+class PaymentCallbackTests(TestCase):
+    def setUp(self):
+        get_gateway.cache_clear()
+        self.addCleanup(get_gateway.cache_clear)
+        self.owner = CustomUser.objects.create_user(
+            email='owner@example.com', username='owner', password='password123'
+        )
+        self.pet = Pet.objects.create(
+            owner=self.owner, name='Rex', pet_type='dog', breed='Labrador',
+            age='2.0', gender='male', description='Friendly', price='20.00'
+        )
+        self.payment = create_payment(self.owner, self.pet, '20.00', 'tran-1')
+        self.client = APIClient()
+        # Final payment statuses are cached by transaction id
+        cache.clear()
+
+    def callback(self, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/pets/payment/callback/', {'tran_id': 'tran-1', 'status': status})
+        self.assertEqual(response.status_code, 302)
+        return response['Location'].rsplit('payment=', 1)[1]
+
+    def test_repeated_success_callback_publishes_one_post(self):
+        self.assertEqual(self.callback('VALID'), 'success')
+        self.assertEqual(self.callback('VALID'), 'success')
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.Status.COMPLETED)
+        self.assertEqual(Post.objects.filter(pet=self.pet, is_paid=True).count(), 1)
+
+    def test_success_after_failure_leaves_the_payment_failed(self):
+        self.assertEqual(self.callback('FAILED'), 'failed')
+        self.assertEqual(self.callback('VALID'), 'failed')
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.Status.FAILED)
+        self.assertFalse(Post.objects.filter(pet=self.pet).exists())
+
+    def test_success_racing_a_failure_loses_the_transition(self):
+        # Both callbacks read the payment while it was still pending
+        self.assertTrue(fail_payment(self.payment, 'Gateway reported FAILED'))
+        self.assertFalse(complete_payment(self.payment))
+        self.assertFalse(Post.objects.filter(pet=self.pet).exists())
+
+    def test_callback_for_a_final_payment_skips_the_database(self):
+        self.callback('VALID')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.callback('VALID'), 'success')
+
+
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(
+            email='owner@example.com', username='owner', password='password123'
+        )
+        self.client = APIClient()
+        self.now = timezone.now()
+
+    def create_pet(self, name, seconds_ago):
+        pet = Pet.objects.create(
+            owner=self.owner, name=name, pet_type='dog', breed='Labrador',
+            age='2.0', gender='male', description='Friendly', price='20.00'
+        )
+        # update() leaves updated_at alone, so the pet can be backdated
+        Pet.objects.filter(pk=pet.pk).update(updated_at=self.now - timedelta(seconds=seconds_ago))
+        return pet
+
+    def sync(self, since=None, horizon_seconds_ago=5):
+        horizon = self.now - timedelta(seconds=horizon_seconds_ago)
+        with mock.patch('pets.sync.settle_horizon', return_value=horizon):
+            response = self.client.get('/pets/changes/', {'since': since} if since else {})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_deleted_and_unavailable_pets_are_removed(self):
+        gone = self.create_pet('Gone', 60)
+        sold = self.create_pet('Sold', 60)
+        kept = self.create_pet('Kept', 60)
+        token = self.sync()['next']
+
+        gone_id = gone.pk
+        gone.delete()
+        sold.availability = False
+        sold.save()
+        self.assertTrue(PetTombstone.objects.filter(pet_id=gone_id).exists())
+        self.assertFalse(PetTombstone.objects.filter(pet_id=sold.pk).exists())
+
+        delta = self.sync(token, horizon_seconds_ago=-60)
+        self.assertEqual(delta['changes'], [])
+        self.assertEqual(sorted(delta['removed']), sorted([gone_id, sold.pk]))
+        self.assertNotIn(kept.pk, delta['removed'])
+
+    def test_changes_newer_than_the_settle_horizon_are_held_back(self):
+        settled = self.create_pet('Settled', 60)
+        recent = self.create_pet('Recent', 1)
+        first = self.sync()
+        self.assertEqual([pet['id'] for pet in first['changes']], [settled.pk])
+        self.assertFalse(first['has_more'])
+
+        # A later call, once the horizon has passed it, hands it out
+        later = self.sync(first['next'], horizon_seconds_ago=-10)
+        self.assertEqual([pet['id'] for pet in later['changes']], [recent.pk])
+
+    def test_resumed_sync_sees_a_change_committed_after_the_read(self):
+        first_pet = self.create_pet('First', 60)
+        self.create_pet('Newest', 1)
+        token = self.sync()['next']
+
+        # Stamped before the first read, committed only after it
+        late = self.create_pet('Late', 2)
+
+        delta = self.sync(token, horizon_seconds_ago=-10)
+        ids = [pet['id'] for pet in delta['changes']]
+        self.assertIn(late.pk, ids)
+        self.assertNotIn(first_pet.pk, ids)
+
+
+class PetCacheInvalidationTests(TestCase):
+    def setUp(self):
+        owner = CustomUser.objects.create_user(
+            email='owner@example.com', username='owner', password='password123'
+        )
+        self.pet = Pet.objects.create(
+            owner=owner, name='Rex', pet_type='dog', breed='Labrador',
+            age='2.0', gender='male', description='Friendly', price='20.00'
+        )
+        self.client = APIClient()
+        cache.clear()
+
+    def test_pet_update_misses_the_cached_list(self):
+        first = self.client.get('/pets/list/')
+        with self.assertNumQueries(0):
+            cached = self.client.get('/pets/list/')
+        self.assertEqual(cached.json(), first.json())
+
+        # The version bump runs on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pet.name = 'Max'
+            self.pet.save()
+        with CaptureQueriesContext(connection) as queries:
+            updated = self.client.get('/pets/list/')
+        self.assertGreater(len(queries), 0)
+        self.assertEqual(updated.json()['results'][0]['name'], 'Max')
+        self.assertNotEqual(updated['ETag'], first['ETag'])
+
+    def test_image_upload_changes_the_etags(self):
+        detail = self.client.get(f'/pets/{self.pet.pk}/')
+        listing = self.client.get('/pets/list/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PetImage.objects.create(pet=self.pet, image='image/upload/v1/pets/new.jpg')
+
+        response = self.client.get(f'/pets/{self.pet.pk}/', HTTP_IF_NONE_MATCH=detail['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], detail['ETag'])
+        self.assertEqual(len(response.json()['images_data']), 1)
+        response = self.client.get('/pets/list/', HTTP_IF_NONE_MATCH=listing['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], listing['ETag'])
+
+
+class PetFacetTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(
+            email='owner@example.com', username='owner', password='password123'
+        )
+        self.dogs = [self.create_pet('dog', 'male', 'Labrador') for _ in range(2)]
+        self.create_pet('cat', 'female', 'Persian', is_for_adoption=True)
+        self.create_pet('dog', 'female', 'Beagle', availability=False)
+        self.client = APIClient()
+        cache.clear()
+
+    def create_pet(self, pet_type, gender, breed, **kwargs):
+        return Pet.objects.create(
+            owner=self.owner, name='Pet', pet_type=pet_type, breed=breed, age='2.0',
+            gender=gender, description='Friendly', price='20.00', **kwargs
+        )
+
+    def test_unfiltered_counts_cover_available_pets(self):
+        facets = self.client.get('/pets/facets/').json()
+        self.assertEqual(facets['total'], 3)
+        self.assertEqual(facets['pet_type']['dog'], 2)
+        self.assertEqual(facets['pet_type']['cat'], 1)
+        self.assertEqual(facets['listing'], {'adoption': 1, 'sale': 2})
+        self.assertEqual(facets['breed'][0], {'value': 'Labrador', 'count': 2})
+
+    def test_counts_follow_a_pet_going_off_sale(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dogs[0].availability = False
+            self.dogs[0].save()
+        facets = self.client.get('/pets/facets/').json()
+        self.assertEqual(facets['total'], 2)
+        self.assertEqual(facets['pet_type']['dog'], 1)
+
+    def test_filtered_counts(self):
+        facets = self.client.get('/pets/facets/', {'gender': 'female'}).json()
+        self.assertEqual(facets['total'], 1)
+        self.assertEqual(facets['pet_type'], {'dog': 0, 'cat': 1})
+
+
+class PetExportTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(
+            email='owner@example.com', username='owner', password='password123'
+        )
+        admin = CustomUser.objects.create_user(
+            email='admin@example.com', username='admin', password='password123', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def create_pet(self, name, seconds_ago=0):
+        pet = Pet.objects.create(
+            owner=self.owner, name=name, pet_type='dog', breed='Labrador',
+            age='2.0', gender='male', description='Friendly', price='20.00'
+        )
+        if seconds_ago:
+            Pet.objects.filter(pk=pet.pk).update(updated_at=timezone.now() - timedelta(seconds=seconds_ago))
+        return pet
+
+    def export(self, horizon=None, **params):
+        if horizon is None:
+            response = self.client.get('/pets/export/', params)
+        else:
+            with mock.patch('pets.exports.settle_horizon', return_value=horizon):
+                response = self.client.get('/pets/export/', params)
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content).decode()
+        return body, response['X-Export-Started']
+
+    def records(self, body):
+        return [json.loads(line) for line in body.splitlines()]
+
+    def test_incremental_export_lists_changes_and_removals(self):
+        changed = self.create_pet('Changed', 60)
+        removed = self.create_pet('Removed', 60)
+        self.create_pet('Untouched', 60)
+        body, started = self.export()
+        self.assertEqual(len(self.records(body)), 3)
+
+        changed.name = 'Renamed'
+        changed.save()
+        removed_id = removed.pk
+        removed.delete()
+        body, _ = self.export(horizon=timezone.now() + timedelta(seconds=10), updated_since=started)
+        update, removal = self.records(body)
+        self.assertEqual((update['id'], update['name']), (changed.pk, 'Renamed'))
+        self.assertEqual(removal, {'id': removed_id, 'deleted': True})
+
+    def test_changes_inside_the_settle_window_go_to_the_next_export(self):
+        self.create_pet('Settled', 60)
+        recent = self.create_pet('Recent')
+        body, started = self.export()
+        self.assertNotIn(recent.pk, [record['id'] for record in self.records(body)])
+
+        body, _ = self.export(horizon=timezone.now() + timedelta(seconds=10), updated_since=started)
+        self.assertEqual([record['id'] for record in self.records(body)], [recent.pk])
+
+    def test_empty_csv_export_still_has_a_header(self):
+        body, _ = self.export(output='csv')
+        self.assertEqual(len(body.splitlines()), 1)
+        self.assertIn('image_urls', body.splitlines()[0])
+
+
+class PetArchiveTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(
+            email='owner@example.com', username='owner', password='password123'
+        )
+        self.buyer = CustomUser.objects.create_user(
+            email='buyer@example.com', username='buyer', password='password123'
+        )
+        self.pet = Pet.objects.create(
+            owner=self.owner, name='Rex', pet_type='dog', breed='Labrador', age='2.0',
+            gender='male', description='Friendly', price='20.00', availability=False
+        )
+        Pet.objects.filter(pk=self.pet.pk).update(updated_at=timezone.now() - timedelta(days=365))
+        self.post = Post.objects.create(user=self.owner, pet=self.pet, is_free=True)
+        Message.objects.create(sender=self.buyer, receiver=self.owner, pet=self.pet, content='Still there?')
+        self.client = APIClient()
+        cache.clear()
+
+    def test_archived_listing_stays_readable(self):
+        self.assertEqual(archive_pets(), 1)
+        self.assertFalse(Pet.objects.filter(pk=self.pet.pk).exists())
+        self.assertTrue(ArchivedPet.objects.filter(pk=self.pet.pk).exists())
+
+        response = self.client.get(f'/pets/{self.pet.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], 'Rex')
+        self.assertTrue(response.json()['archived'])
+
+        self.post.refresh_from_db()
+        self.assertIsNone(self.post.pet_id)
+        self.assertEqual(self.post.archived_pet_id, self.pet.pk)
+
+        self.client.force_authenticate(self.owner)
+        conversations = self.client.get('/messenger/messages/conversations/').json()
+        self.assertEqual(len(conversations), 1)
+        self.assertTrue(conversations[0]['archived'])
+        messages = self.client.get(f'/messenger/messages/conversation/{self.buyer.id}/{self.pet.pk}/').json()
+        self.assertEqual([message['content'] for message in messages], ['Still there?'])
+
+    def test_pet_with_a_pending_payment_is_not_archived(self):
+        create_payment(self.owner, self.pet, '20.00', 'tran-1')
+        self.assertEqual(archive_pets(), 0)
+        self.assertTrue(Pet.objects.filter(pk=self.pet.pk).exists())
+
+
+class SavedSearchMatchingTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(
+            email='owner@example.com', username='owner', password='password123'
+        )
+        self.buyer = CustomUser.objects.create_user(
+            email='buyer@example.com', username='buyer', password='password123'
+        )
+        self.client = APIClient()
+
+    def save_search(self, user, filters):
+        self.client.force_authenticate(user)
+        response = self.client.post('/pets/saved-searches/', {'name': 'Search', 'filters': filters}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    def create_pet(self, pet_type, price):
+        # Matching runs once the pet is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            return Pet.objects.create(
+                owner=self.owner, name='Pet', pet_type=pet_type, breed='Labrador',
+                age='2.0', gender='male', description='Friendly', price=price
+            )
+
+    def test_new_listing_reaches_the_matching_inbox(self):
+        self.save_search(self.buyer, {'pet_type': 'dog', 'max_price': '50'})
+        match = self.create_pet('dog', '30.00')
+        self.create_pet('dog', '80.00')
+        self.create_pet('cat', '30.00')
+
+        self.client.force_authenticate(self.buyer)
+        inbox = self.client.get('/pets/saved-searches/inbox/').json()
+        self.assertEqual([item['pet']['id'] for item in inbox['results']], [match.pk])
+
+    def test_own_listing_does_not_match(self):
+        self.save_search(self.owner, {'pet_type': 'dog'})
+        self.create_pet('dog', '30.00')
+        self.assertFalse(SavedSearchMatch.objects.exists())
+
+    def test_invalid_filters_are_rejected(self):
+        self.client.force_authenticate(self.buyer)
+        response = self.client.post(
+            '/pets/saved-searches/', {'filters': {'min_price': 'cheap'}}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(
+    PAYMENT_GATEWAY='pets.payments.FakePaymentGateway', FAKE_PAYMENT_GATEWAY_LATENCY=0,
+    PAYMENT_SESSION_TRIES=1, PAYMENT_SESSION_RETRY_DELAY=0,
+)
+class PaymentOutboxTests(TestCase):
+    def setUp(self):
+        get_gateway.cache_clear()
+        self.addCleanup(get_gateway.cache_clear)
+        owner = CustomUser.objects.create_user(
+            email='owner@example.com', username='owner', password='password123'
+        )
+        pet = Pet.objects.create(
+            owner=owner, name='Rex', pet_type='dog', breed='Labrador',
+            age='2.0', gender='male', description='Friendly', price='20.00'
+        )
+        self.payment = create_payment(owner, pet, '20.00', 'tran-1')
+
+    def test_reconcile_opens_due_sessions_once(self):
+        self.assertEqual(reconcile_payments(), (1, 0, 0))
+        self.payment.refresh_from_db()
+        self.assertTrue(self.payment.gateway_url)
+        self.assertIsNone(self.payment.next_session_attempt_at)
+        self.assertEqual(reconcile_payments(), (0, 0, 0))
+
+    @override_settings(FAKE_PAYMENT_GATEWAY_ERROR_RATE=1.0, PAYMENT_SESSION_RETRY_DELAY=60)
+    def test_failed_session_is_retried_later(self):
+        self.assertEqual(reconcile_payments(), (0, 0, 1))
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.Status.PENDING)
+        self.assertEqual(self.payment.session_attempts, 1)
+        self.assertGreater(self.payment.next_session_attempt_at, timezone.now())
+        # Not due again until the backoff has passed
+        self.assertEqual(reconcile_payments(), (0, 0, 0))
+
+    @override_settings(FAKE_PAYMENT_GATEWAY_ERROR_RATE=1.0, PAYMENT_SESSION_MAX_ATTEMPTS=1)
+    def test_payment_fails_after_the_last_attempt(self):
+        self.assertEqual(reconcile_payments(), (0, 1, 0))
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.Status.FAILED)
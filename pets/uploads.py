@@ -0,0 +1,80 @@
+import json
+import re
+import time
+import uuid
+
+import cloudinary
+from django.conf import settings
+from rest_framework import serializers
+
+from .storage import ImageUploadError, get_image_storage
+from .variants import image_url
+
+# uploads/<user id>/<ticket expiry>-<random>: the owner and deadline travel
+# inside the signed public id, so confirming needs no server-side state.
+PUBLIC_ID_RE = re.compile(r'^uploads/(?P<user>[\w-]+)/(?P<expires>\d+)-[0-9a-f]{32}$')
+
+
+def issue_tickets(user, count, request=None):
+    """Short-lived signed parameters for ``count`` direct uploads by ``user``."""
+    expires = int(time.time()) + settings.UPLOAD_TICKET_TTL
+    storage = get_image_storage()
+    return [
+        storage.upload_ticket(f"uploads/{user.pk}/{expires}-{uuid.uuid4().hex}", expires, request=request)
+        for _ in range(count)
+    ]
+
+
+def confirm_upload(user, data):
+    """
+    The stored resource for a finished direct upload, after checking that
+    the storage backend signed it, that it was ticketed for ``user`` and
+    that it arrived before the ticket expired.
+    """
+    if not isinstance(data, dict) or not all(data.get(key) for key in ('public_id', 'version', 'signature')):
+        raise ImageUploadError("Expected public_id, version and signature")
+    match = PUBLIC_ID_RE.match(str(data['public_id']))
+    if match is None or not user.is_authenticated or match.group('user') != str(user.pk):
+        raise ImageUploadError("This upload was not ticketed for you")
+    try:
+        version = int(data['version'])
+    except (TypeError, ValueError):
+        raise ImageUploadError("Invalid version")
+    # The version is the upload's own timestamp; allow for clock skew
+    if version > int(match.group('expires')) + settings.UPLOAD_TICKET_CLOCK_SKEW:
+        raise ImageUploadError("Uploaded after the ticket expired")
+    return get_image_storage().verify_upload(
+        data['public_id'], version, data['signature'], format=data.get('format')
+    )
+
+
+class SignedUploadField(serializers.ImageField):
+    """
+    An image given either as an uploaded file, as before, or as the
+    confirmation of a direct upload (an object, or its JSON in form data)
+    that is verified and turned into the stored resource.
+    """
+    default_error_messages = {
+        'invalid_upload': 'Invalid upload confirmation: {reason}',
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            try:
+                data = json.loads(data)
+            except ValueError:
+                self.fail('invalid_upload', reason='not valid JSON')
+        if isinstance(data, dict):
+            try:
+                return confirm_upload(self.context['request'].user, data)
+            except ImageUploadError as e:
+                self.fail('invalid_upload', reason=str(e))
+        return super().to_internal_value(data)
+
+    def to_representation(self, value):
+        return image_url(value)
+
+
+def is_stored(value):
+    """True for an already stored resource, False for a file still to upload."""
+    return isinstance(value, cloudinary.CloudinaryResource)
@@ -1,24 +1,52 @@
 from django.urls import path
 from .views import (
     PetCreateView,
+    PetImportView,
+    PetExportView,
     PetListView,
+    PetChangesView,
+    PetFacetsView,
+    PetAutocompleteView,
     PetDetailView,
+    PetSimilarView,
     PetUpdateView,
     PetDeleteView,
     PetImageUploadView,
+    UploadTicketView,
+    LocalUploadView,
     PaymentCallbackView,
+    PaymentSessionView,
+    PaymentGatewayStatsView,
     PaymentHistoryView,
-    PetImageDeleteView
+    PetImageDeleteView,
+    SavedSearchListCreateView,
+    SavedSearchDetailView,
+    SavedSearchInboxView,
+    SavedSearchInboxReadView,
 )
 
 urlpatterns = [
     path('create/', PetCreateView.as_view(), name='pet-create'),
+    path('import/', PetImportView.as_view(), name='pet-import'),
+    path('export/', PetExportView.as_view(), name='pet-export'),
     path('list/', PetListView.as_view(), name='pet-list'),
+    path('changes/', PetChangesView.as_view(), name='pet-changes'),
+    path('facets/', PetFacetsView.as_view(), name='pet-facets'),
+    path('autocomplete/', PetAutocompleteView.as_view(), name='pet-autocomplete'),
     path('<int:pk>/', PetDetailView.as_view(), name='pet-detail'),
+    path('<int:pk>/similar/', PetSimilarView.as_view(), name='pet-similar'),
     path('<int:pk>/update/', PetUpdateView.as_view(), name='pet-update'),
     path('<int:pk>/delete/', PetDeleteView.as_view(), name='pet-delete'),
     path('<int:pk>/upload-images/', PetImageUploadView.as_view(), name='pet-upload-images'),
+    path('saved-searches/', SavedSearchListCreateView.as_view(), name='saved-search-list'),
+    path('saved-searches/<int:pk>/', SavedSearchDetailView.as_view(), name='saved-search-detail'),
+    path('saved-searches/inbox/', SavedSearchInboxView.as_view(), name='saved-search-inbox'),
+    path('saved-searches/inbox/read/', SavedSearchInboxReadView.as_view(), name='saved-search-inbox-read'),
+    path('uploads/tickets/', UploadTicketView.as_view(), name='pet-upload-tickets'),
+    path('uploads/local/', LocalUploadView.as_view(), name='pet-upload-local'),
     path('payment/callback/', PaymentCallbackView.as_view(), name='payment-callback'),
+    path('payment/<str:transaction_id>/session/', PaymentSessionView.as_view(), name='payment-session'),
+    path('payment/gateway/stats/', PaymentGatewayStatsView.as_view(), name='payment-gateway-stats'),
     path('payment/history/', PaymentHistoryView.as_view(), name='payment-history'),
      path('images/<int:image_id>/delete/', PetImageDeleteView.as_view(), name='pet-image-delete'),
 ]
\ No newline at end of file
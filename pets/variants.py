@@ -0,0 +1,65 @@
+import re
+from functools import lru_cache
+
+import cloudinary
+from cloudinary.models import CLOUDINARY_FIELD_DB_RE
+
+# Named renditions served instead of the original upload. Cloudinary
+# derives each one on first request and caches it on its CDN.
+VARIANTS = {
+    'thumb': {'width': 200, 'height': 200, 'crop': 'fill', 'gravity': 'auto'},
+    'card': {'width': 600, 'crop': 'limit'},
+    'full': {'width': 1600, 'crop': 'limit'},
+}
+DELIVERY_OPTIONS = {'fetch_format': 'auto', 'quality': 'auto', 'secure': True}
+
+
+def stored_value(resource):
+    """The string a CloudinaryField stores for ``resource``, or None."""
+    if isinstance(resource, cloudinary.CloudinaryResource):
+        return resource.get_prep_value()
+    return resource or None
+
+
+def _parse(stored):
+    # Same "<resource_type>/<type>/v<version>/<public_id>.<format>" layout
+    # CloudinaryField writes; bare public ids (profile pictures) also occur.
+    match = re.match(CLOUDINARY_FIELD_DB_RE, stored)
+    return {
+        'public_id': match.group('public_id'),
+        'version': match.group('version'),
+        'format': match.group('format'),
+        'type': match.group('type') or 'upload',
+        'resource_type': match.group('resource_type') or 'image',
+    }
+
+
+@lru_cache(maxsize=4096)
+def _variants(stored):
+    resource = cloudinary.CloudinaryResource(**_parse(stored))
+    return {
+        name: resource.build_url(**options, **DELIVERY_OPTIONS)
+        for name, options in VARIANTS.items()
+    }
+
+
+@lru_cache(maxsize=4096)
+def _url(stored):
+    return cloudinary.CloudinaryResource(**_parse(stored)).build_url()
+
+
+def image_variants(resource):
+    """
+    URLs of every named rendition of a Cloudinary resource (or its stored
+    string), memoized per resource. Empty for a missing image.
+    """
+    stored = stored_value(resource)
+    if not stored:
+        return {}
+    return dict(_variants(stored))
+
+
+def image_url(resource):
+    """Memoized delivery URL of the original upload, or None."""
+    stored = stored_value(resource)
+    return _url(stored) if stored else None
@@ -1,22 +1,47 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import transaction
+from django.db.models import Count, Q
 from rest_framework import generics, permissions, status
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.views import APIView
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.conf import settings
-from sslcommerz_lib import SSLCOMMERZ
 import uuid
 import logging
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
 from django.shortcuts import redirect  
+from django.urls import reverse
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework.parsers import MultiPartParser, FormParser
 
-from .models import Pet, PetImage, Payment
-from .serializers import PetSerializer, PaymentSerializer
+from .models import ArchivedPet, Pet, PetImage, Payment, SavedSearch, SavedSearchMatch
+from .serializers import (
+    ArchivedPetSerializer, PetSerializer, PaymentSerializer, PetImageUploadSerializer,
+    SavedSearchMatchSerializer, SavedSearchSerializer, load_images_data,
+)
 from .filters import PetFilter
+from .pagination import KeysetPagination
+from .cache import detail_cache_key, get_or_build, list_cache_key
+from .facets import compute_facets, stored_facets
+from .autocomplete import KINDS as AUTOCOMPLETE_KINDS, get_index as get_autocomplete_index
+from .similar import similar_pets
+from .payments import (
+    complete_payment, create_payment, fail_payment, final_payment_status, get_gateway, open_session,
+)
+from . import sync
+from .popularity import record_view
+from .fastpath import PetRowSerializer
+from .exports import CONTENT_TYPES as EXPORT_CONTENT_TYPES, OUTPUTS as EXPORT_OUTPUTS, export_catalog, export_filename
+from .imports import FILE_TYPES as IMPORT_FILE_TYPES, PetImporter, detect_file_type, read_rows
+from .signals import pet_images_changed
+from .assets import acquire_many, pet_photo_near_duplicates, release_assets
+from .storage import ImageUploadError, LocalStubImageStorage, get_image_storage
+from .uploads import issue_tickets
+from .variants import image_variants
+from .conditional import list_validators, make_etag, not_modified_response, pet_validators, set_validators
 from rest_framework.permissions import AllowAny
 
 # Set up logging
@@ -37,7 +62,7 @@ class IsAdminOrModerator(permissions.BasePermission):
 class PetCreateView(generics.CreateAPIView):
     queryset = Pet.objects.all()
     serializer_class = PetSerializer
-    parser_classes = [MultiPartParser, FormParser]
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
     # permission_classes = [permissions.IsAuthenticated, IsVerifiedUser]
 
     def create(self, request, *args, **kwargs):
@@ -75,86 +100,305 @@ class PetCreateView(generics.CreateAPIView):
                 headers = self.get_success_headers(pet_payload)
                 return Response(pet_payload, status=status.HTTP_201_CREATED, headers=headers)
 
-            # Payment needed
+            # Payment needed: commit the pet with a pending payment first and
+            # talk to the gateway only once no transaction is open.
             amount = 5.00 if is_for_adoption else 20.00
-            transaction_id = str(uuid.uuid4())
             pet = serializer.save(owner=user)
+            payment = create_payment(user, pet, amount, str(uuid.uuid4()))
+
+        payment = open_session(payment)
+        return self.payment_response(payment, pet, request)
+
+    def payment_response(self, payment, pet, request):
+        if payment.gateway_url:
+            return Response({
+                'payment_url': payment.gateway_url,
+                'transaction_id': payment.transaction_id,
+                'pet': PetSerializer(pet, context={'request': request}).data
+            }, status=status.HTTP_202_ACCEPTED)
+        if payment.status == Payment.Status.FAILED:
+            return Response({'detail': payment.session_error}, status=status.HTTP_400_BAD_REQUEST)
+        # Gateway unreachable for now; reconcile_payments keeps trying and the
+        # client can poll the session endpoint for the URL.
+        return Response({
+            'detail': 'Payment gateway is not responding, retrying shortly',
+            'payment_url': None,
+            'transaction_id': payment.transaction_id,
+            'session_url': reverse('payment-session', args=[payment.transaction_id]),
+            'pet': PetSerializer(pet, context={'request': request}).data
+        }, status=status.HTTP_202_ACCEPTED)
+
+class PetImportView(APIView):
+    """
+    Bulk listing import for shelters: a JSONL or CSV file of pets created
+    for ``owner`` (defaults to the caller) as free posts, with images
+    fetched afterwards by the fetch_pet_images command.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsAdminOrModerator]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': 'A JSONL or CSV file is required'}, status=status.HTTP_400_BAD_REQUEST)
+        file_type = request.data.get('file_type') or detect_file_type(upload.name)
+        if file_type not in IMPORT_FILE_TYPES:
+            return Response(
+                {'file_type': f"Must be one of: {', '.join(IMPORT_FILE_TYPES)}"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        owner = request.user
+        if request.data.get('owner'):
+            from users.models import CustomUser
+            try:
+                owner = CustomUser.objects.get(pk=request.data['owner'])
+            except (CustomUser.DoesNotExist, DjangoValidationError):
+                return Response({'owner': 'User not found'}, status=status.HTTP_400_BAD_REQUEST)
+
+        report = PetImporter(owner).run(read_rows(upload, file_type))
+        logger.info(f"Imported {report['created']} pets for {owner.email}, {report['failed']} rows rejected")
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_400_BAD_REQUEST)
+
+class PetExportView(APIView):
+    """
+    Streams the whole catalog, or the pets changed since ``updated_since``
+    followed by ``{"id": ..., "deleted": true}`` records of the ones
+    removed, as NDJSON or CSV. Pass the X-Export-Started value of one
+    export as ``updated_since`` of the next to pick up only what changed.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsAdminOrModerator]
 
-            sslcommerz_settings = {
-                'store_id': settings.SSLCOMMERZ_STORE_ID,
-                'store_pass': settings.SSLCOMMERZ_STORE_PASSWORD,
-                'issandbox': settings.SSLCOMMERZ_SANDBOX
-            }
-            sslcommerz = SSLCOMMERZ(sslcommerz_settings)
-
-            post_body = {
-                'total_amount': amount,
-                'currency': "USD",
-                'tran_id': transaction_id,
-                'success_url': settings.SSLCOMMERZ_SUCCESS_URL,
-                'fail_url': settings.SSLCOMMERZ_FAIL_URL,
-                'cancel_url': settings.SSLCOMMERZ_CANCEL_URL,
-                'emi_option': 0,
-                'cus_name': user.username,
-                'cus_email': user.email,
-                'cus_phone': user.phone or 'N/A',
-                'cus_add1': user.address or 'N/A',
-                'cus_add2': user.address or 'N/A',
-                'cus_city': user.city or 'Dhaka',
-                'cus_state': user.state or 'Dhaka',
-                'cus_postcode': user.postcode or '1000',
-                'cus_country': 'Bangladesh',
-                'shipping_method': 'NO',
-                'num_of_item': 1,
-                'product_name': f"Pet {'Adoption' if is_for_adoption else 'Sale'} Post",
-                'product_category': 'Pet Listing',
-                'product_profile': 'general'
-            }
+    def get(self, request):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORT_OUTPUTS:
+            return Response({'output': f"Must be one of: {', '.join(EXPORT_OUTPUTS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        compress = str(request.query_params.get('gzip', '')).lower() in ('1', 'true', 'yes')
+
+        updated_since = None
+        if request.query_params.get('updated_since'):
+            updated_since = parse_datetime(request.query_params['updated_since'])
+            if updated_since is None:
+                return Response({'updated_since': 'Expected an ISO 8601 datetime'}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(updated_since):
+                updated_since = timezone.make_aware(updated_since)
+            if sync.removals_expired(updated_since):
+                return Response(
+                    {'detail': 'Removals that old are no longer tracked, export the whole catalog', 'reset': True},
+                    status=status.HTTP_410_GONE,
+                )
 
+        chunks, started = export_catalog(output, updated_since, compress=compress)
+        response = StreamingHttpResponse(
+            chunks, content_type='application/gzip' if compress else EXPORT_CONTENT_TYPES[output]
+        )
+        response['Content-Disposition'] = f'attachment; filename="{export_filename(output, compress)}"'
+        response['X-Export-Started'] = started.isoformat()
+        return response
+
+class PetChangesView(APIView):
+    """
+    Delta sync: the available pets changed since ``since`` (a token from a
+    previous response) and the ids of pets to drop. Without ``since`` it
+    lists every available pet. Follow ``next`` while ``has_more``; a 410
+    means the token is too old and the client should sync from scratch.
+    """
+    permission_classes = [AllowAny]
+    default_limit = 100
+    max_limit = 500
+
+    def get(self, request):
+        since = None
+        if request.query_params.get('since'):
             try:
-                response = sslcommerz.createSession(post_body)
-                if response.get('status') == 'SUCCESS' and response.get('GatewayPageURL'):
-                    Payment.objects.create(
-                        user=user,
-                        pet=pet,
-                        transaction_id=transaction_id,
-                        amount=amount
-                    )
-                    return Response({
-                        'payment_url': response['GatewayPageURL'],
-                        'transaction_id': transaction_id,
-                        'pet': PetSerializer(pet, context={'request': request}).data
-                    }, status=status.HTTP_202_ACCEPTED)
-                else:
-                    pet.delete()
-                    logger.error(f"Payment initiation failed: {response.get('failedreason', 'Unknown error')}")
-                    return Response({
-                        'detail': f"Payment initiation failed: {response.get('failedreason', 'Unknown error')}"
-                    }, status=status.HTTP_400_BAD_REQUEST)
-            except Exception as e:
-                pet.delete()
-                logger.error(f"Payment initiation error: {str(e)}")
-                return Response({
-                    'detail': f"Payment initiation failed: {str(e)}"
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                since = sync.decode_token(request.query_params['since'])
+            except ValueError as e:
+                return Response({'since': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            if sync.token_expired(since):
+                return Response(
+                    {'detail': 'Sync token expired, sync again from scratch', 'reset': True},
+                    status=status.HTTP_410_GONE,
+                )
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+        limit = max(limit, 1)
+
+        pets, removed, position, has_more = sync.changes(since, limit)
+        context = {'request': request, 'view': self, 'representation': 'compact'}
+        return Response({
+            'changes': PetSerializer(pets, many=True, context=context).data,
+            'removed': removed,
+            'next': sync.encode_token(position) if position else None,
+            'has_more': has_more,
+        })
 
 class PetListView(generics.ListAPIView):
-    queryset = Pet.objects.filter(availability=True)
+    queryset = Pet.objects.filter(availability=True).select_related('owner')
     serializer_class = PetSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = PetFilter
+    pagination_class = KeysetPagination
+    permission_classes = [AllowAny]
+
+    # ?ordering= values, each a unique keyset for the pagination cursor
+    orderings = {
+        'trending': ('-trending_score', '-id'),
+    }
+    # ?view= values; full is the default, compact trims cards for grid pages
+    views = ('full', 'compact')
+
+    def get_queryset(self):
+        ordering = self.orderings.get(self.requested_ordering(), ())
+        return self.get_serializer().optimize_queryset(
+            super().get_queryset(), extra_columns=[field.lstrip('-') for field in ordering]
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['representation'] = self.requested_view()
+        return context
+
+    def requested_view(self):
+        view = self.request.query_params.get('view') or 'full'
+        if view not in self.views:
+            raise ValidationError({'view': f"Must be one of: {', '.join(self.views)}"})
+        return view
+
+    def requested_ordering(self):
+        ordering = self.request.query_params.get('ordering')
+        if ordering and ordering not in self.orderings:
+            raise ValidationError({'ordering': f"Must be one of: {', '.join(self.orderings)}"})
+        return ordering
+
+    def get_keyset_ordering(self, queryset):
+        # An explicit ordering wins; keyword searches are otherwise ranked by
+        # relevance and everything else is newest first.
+        ordering = self.requested_ordering()
+        if ordering:
+            return self.orderings[ordering]
+        if 'search_rank' in queryset.query.annotations:
+            return ('-search_rank', '-id')
+        return KeysetPagination.ordering
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        # Trending recomputes bump the catalog version too
+        etag, last_modified = list_validators(request)
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        def build():
+            row_serializer = PetRowSerializer.for_serializer(self.get_serializer())
+            if settings.PET_FAST_LIST_SERIALIZER and row_serializer is not None:
+                ordering_columns = [field.lstrip('-') for field in self.get_keyset_ordering(queryset)]
+                rows = self.paginate_queryset(queryset.values(*row_serializer.columns, *ordering_columns))
+                return self.get_paginated_response(row_serializer.serialize(rows)).data
+            page = self.paginate_queryset(queryset)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data).data
+
+        data = get_or_build(list_cache_key(request), build)
+        return set_validators(Response(data), etag, last_modified)
+
+class PetFacetsView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        filterset = PetFilter(request.query_params, queryset=Pet.objects.filter(availability=True), request=request)
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+        filtered = any(
+            value not in (None, '') for name, value in filterset.form.cleaned_data.items()
+            if name in request.query_params
+        )
+
+        def build():
+            if filtered:
+                return compute_facets(filterset.qs)
+            return stored_facets()
+
+        return Response(get_or_build(list_cache_key(request), build))
+
+class PetAutocompleteView(APIView):
     permission_classes = [AllowAny]
+    max_limit = 20
+
+    def get(self, request):
+        prefix = request.query_params.get('q', '')
+        kind = request.query_params.get('kind') or None
+        if kind is not None and kind not in AUTOCOMPLETE_KINDS:
+            return Response({'kind': f"Must be one of: {', '.join(AUTOCOMPLETE_KINDS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), self.max_limit)
+        except ValueError:
+            limit = 10
+        return Response({'results': get_autocomplete_index().lookup(prefix, kind=kind, limit=limit)})
 
 class PetDetailView(generics.RetrieveAPIView):
-    queryset = Pet.objects.all()
+    queryset = Pet.objects.select_related('owner')
     serializer_class = PetSerializer
     permission_classes = [AllowAny]
 
+    def get_queryset(self):
+        return self.get_serializer().optimize_queryset(super().get_queryset())
+
+    def retrieve(self, request, *args, **kwargs):
+        etag, last_modified = pet_validators(kwargs['pk'])
+        if etag is None:
+            return self.retrieve_archived(request, kwargs['pk'])
+        record_view(kwargs['pk'])
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        data = get_or_build(
+            detail_cache_key(request, kwargs['pk']),
+            lambda: super(PetDetailView, self).retrieve(request, *args, **kwargs).data
+        )
+        return set_validators(Response(data), etag, last_modified)
+
+    def retrieve_archived(self, request, pk):
+        # Archived listings never change, so archived_at is a complete validator
+        archived = ArchivedPet.objects.select_related('owner').prefetch_related('images').filter(pk=pk).first()
+        if archived is None:
+            raise NotFound()
+        etag, last_modified = make_etag(pk, archived.archived_at), archived.archived_at
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        return set_validators(Response(ArchivedPetSerializer(archived).data), etag, last_modified)
+
+class PetSimilarView(APIView):
+    permission_classes = [AllowAny]
+    max_limit = 20
+
+    def get(self, request, pk):
+        try:
+            limit = min(int(request.query_params.get('limit', 6)), self.max_limit)
+        except ValueError:
+            limit = 6
+        # Over-fetch: the index can still hold pets sold since it was loaded
+        ids = similar_pets(pk, limit * 2)
+        if ids is None:
+            raise NotFound()
+        context = {**self.get_serializer_context(), 'representation': 'compact'}
+        serializer = PetSerializer(context=context)
+        pets = serializer.optimize_queryset(
+            Pet.objects.filter(pk__in=ids, availability=True).select_related('owner')
+        ).in_bulk()
+        ranked = [pets[pet_id] for pet_id in ids if pet_id in pets][:limit]
+        return Response({'results': PetSerializer(ranked, many=True, context=context).data})
+
+    def get_serializer_context(self):
+        return {'request': self.request, 'format': self.format_kwarg, 'view': self}
+
 class PetUpdateView(generics.UpdateAPIView):
     queryset = Pet.objects.all()
     serializer_class = PetSerializer
     permission_classes = [permissions.IsAuthenticated, IsVerifiedUser, IsOwner]
-    parser_classes = [MultiPartParser, FormParser]  # allow file/form data
+    parser_classes = [MultiPartParser, FormParser, JSONParser]  # allow file/form data or JSON
 
     def update(self, request, *args, **kwargs):
         # Force partial update so 'image' is optional
@@ -192,7 +436,7 @@ class PetDeleteView(generics.DestroyAPIView):
 
 class PetImageUploadView(APIView):
     permission_classes = [permissions.IsAuthenticated]
-    parser_classes = [MultiPartParser]
+    parser_classes = [MultiPartParser, JSONParser]
 
     def post(self, request, pk):
         try:
@@ -200,23 +444,84 @@ class PetImageUploadView(APIView):
         except Pet.DoesNotExist:
             return Response({'detail': 'Pet not found or unauthorized'}, status=404)
 
+        # Files in ``images``, and/or confirmations of direct uploads in ``uploads``
+        confirmations = PetImageUploadSerializer(data=request.data, context={'request': request})
+        confirmations.is_valid(raise_exception=True)
+        direct = confirmations.validated_data.get('uploads', [])
         images = request.FILES.getlist('images')
-        if not images:
+        if not images and not direct:
             return Response({'detail': 'No images provided'}, status=400)
-        if len(images) > 5:
+        if len(images) + len(direct) > 5:
             return Response({'detail': 'Maximum 5 images allowed'}, status=400)
 
-        with transaction.atomic():
-            for image in images:
-                PetImage.objects.create(pet=pet, image=image)
+        # Upload concurrently before opening the transaction, so it only
+        # spans the insert and not the network round trips. Photos already
+        # stored by anyone are reused instead of uploaded again.
+        try:
+            assets = acquire_many(
+                images, PetImage._meta.get_field('image'), near_duplicates=pet_photo_near_duplicates()
+            )
+        except ImageUploadError as e:
+            logger.error(f"Image upload for pet {pet.pk} failed: {e}")
+            return Response({'detail': 'Image upload failed'}, status=502)
+
+        try:
+            with transaction.atomic():
+                PetImage.objects.bulk_create([
+                    PetImage(pet=pet, image=resource, variants=image_variants(resource))
+                    for resource in direct + [asset.resource for asset in assets]
+                ])
+                pet_images_changed(pet.pk)
+        except Exception:
+            release_assets(assets)
+            raise
 
         return Response({'detail': 'Images uploaded successfully'}, status=201)
 
+class UploadTicketView(APIView):
+    """
+    Signed, short-lived parameters for uploading images straight to the
+    image host. Send the host's response back in place of the file wherever
+    an image is accepted.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        try:
+            count = int(request.data.get('count', 1))
+        except (TypeError, ValueError):
+            count = 0
+        if not 1 <= count <= settings.UPLOAD_TICKET_MAX:
+            return Response({'count': f"Must be between 1 and {settings.UPLOAD_TICKET_MAX}"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'tickets': issue_tickets(request.user, count, request=request)}, status=status.HTTP_201_CREATED)
+
+class LocalUploadView(APIView):
+    """Upload endpoint of LocalStubImageStorage, so the direct upload flow works offline."""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        storage = get_image_storage()
+        if not isinstance(storage, LocalStubImageStorage):
+            return Response({'detail': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': 'This field is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result = storage.receive_upload(
+                upload, request.data.get('public_id', ''), request.data.get('expires', 0), request.data.get('signature', '')
+            )
+        except (ImageUploadError, ValueError) as e:
+            return Response({'detail': str(e)}, status=status.HTTP_403_FORBIDDEN)
+        return Response(result)
+
 class PaymentCallbackView(APIView):
     permission_classes = [permissions.AllowAny]
 
     SUCCESS_STATUSES = {'VALID', 'VALIDATED', 'SUCCESS', 'VALIDATION_SUCCESS'}
     FAIL_STATUSES = {'FAILED', 'CANCELLED', 'CANCEL'}
+    FINAL_TAGS = {Payment.Status.COMPLETED: 'success', Payment.Status.FAILED: 'failed'}
 
     def _redirect(self, tag='error'):
         frontend_base = settings.FRONTEND_URL.rstrip('/')
@@ -257,23 +562,25 @@ class PaymentCallbackView(APIView):
             logger.error("Callback missing tran_id")
             return self._redirect('error')
 
+        # The gateway repeats callbacks (POST then GET); once the payment is
+        # final they only need to be told where it ended up.
+        final_status = final_payment_status(transaction_id)
+        if final_status is not None:
+            logger.info(f"Payment {transaction_id} already {final_status}; skipping duplicate callback")
+            return self._redirect(self.FINAL_TAGS[final_status])
+
         # Fetch payment
         try:
-            payment = Payment.objects.get(transaction_id=transaction_id)
+            payment = Payment.objects.select_related('user', 'pet').get(transaction_id=transaction_id)
         except Payment.DoesNotExist:
             logger.error(f"Payment not found for transaction {transaction_id}")
             return self._redirect('not_found')
 
         # Attempt hash validation only when signature fields are present (IPN style)
+        gateway = get_gateway()
         try:
-            sslcommerz_settings = {
-                'store_id': settings.SSLCOMMERZ_STORE_ID,
-                'store_pass': settings.SSLCOMMERZ_STORE_PASSWORD,
-                'issandbox': settings.SSLCOMMERZ_SANDBOX
-            }
-            sslcommerz = SSLCOMMERZ(sslcommerz_settings)
             if 'verify_sign' in params and 'verify_key' in params:
-                is_valid = sslcommerz.hash_validate(params)
+                is_valid = gateway.hash_valid(params)
                 if not is_valid:
                     logger.warning(f"hash_validate failed for tran_id={transaction_id}")
             else:
@@ -281,58 +588,54 @@ class PaymentCallbackView(APIView):
         except Exception as e:
             logger.error(f"hash_validate exception tran_id={transaction_id}: {e}")
 
-        # Process status
-        with transaction.atomic():
-            try:
-                if status_val in self.SUCCESS_STATUSES:
-                    payment.status = Payment.Status.COMPLETED
-                    payment.save()
-
-                    # Create post if not already created
-                    from users.models import Post
-                    if not Post.objects.filter(user=payment.user, pet=payment.pet).exists():
-                        Post.objects.create(user=payment.user, pet=payment.pet, is_paid=True)
-
-                    # Email confirmation (best-effort)
-                    try:
-                        subject = 'Payment Confirmation - PetNest'
-                        html_message = render_to_string('payment_confirmation_email.html', {
-                            'user': payment.user,
-                            'pet': payment.pet,
-                            'transaction_id': payment.transaction_id,
-                            'amount': payment.amount,
-                            'created_at': payment.created_at
-                        })
-                        send_mail(
-                            subject,
-                            strip_tags(html_message),
-                            settings.DEFAULT_FROM_EMAIL,
-                            [payment.user.email],
-                            html_message=html_message
-                        )
-                    except Exception as e:
-                        logger.error(f"Email send error: {e}")
-
-                    return self._redirect('success')
-
-                elif status_val in self.FAIL_STATUSES or not status_val:
-                    payment.status = Payment.Status.FAILED
-                    payment.save()
-                    try:
-                        pet = payment.pet
-                        pet.availability = False
-                        pet.save()
-                    except Exception as e:
-                        logger.error(f"Failed to mark pet unavailable on failure: {e}")
-                    return self._redirect('failed')
-
-                else:
-                    logger.warning(f"Unknown payment status '{status_val}' for tran_id={transaction_id}")
-                    return self._redirect('error')
-
-            except Exception as e:
-                logger.error(f"Callback processing exception for tran_id={transaction_id}: {e}")
+        # Process status. Only the callback that moves the payment out of
+        # pending creates the post, sends the email or takes the pet down;
+        # a concurrent duplicate loses the conditional update and just
+        # reports the outcome.
+        try:
+            if status_val in self.SUCCESS_STATUSES:
+                complete_payment(payment)
+            elif status_val in self.FAIL_STATUSES or not status_val:
+                fail_payment(payment, f"Gateway reported {status_val or 'no status'}")
+            else:
+                logger.warning(f"Unknown payment status '{status_val}' for tran_id={transaction_id}")
                 return self._redirect('error')
+        except Exception as e:
+            logger.error(f"Callback processing exception for tran_id={transaction_id}: {e}")
+            return self._redirect('error')
+
+        payment.refresh_from_db(fields=['status'])
+        return self._redirect(self.FINAL_TAGS.get(payment.status, 'error'))
+
+class PaymentSessionView(APIView):
+    """
+    Gateway session of the caller's payment: its URL once opened, or the
+    pending / failed state. A pending payment whose retry is due is tried
+    again right away.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, transaction_id):
+        payment = Payment.objects.select_related('user', 'pet').filter(
+            transaction_id=transaction_id, user=request.user
+        ).first()
+        if payment is None:
+            raise NotFound()
+        if payment.status == Payment.Status.PENDING and not payment.gateway_url:
+            payment = open_session(payment, tries=1)
+        return Response({
+            'transaction_id': payment.transaction_id,
+            'status': payment.status,
+            'payment_url': payment.gateway_url or None,
+            'detail': payment.session_error or None,
+        })
+
+class PaymentGatewayStatsView(APIView):
+    """Circuit state and per-operation latency of this process's payment gateway client."""
+    permission_classes = [permissions.IsAuthenticated, IsAdminOrModerator]
+
+    def get(self, request):
+        return Response(get_gateway().stats())
 
 class PaymentHistoryView(generics.ListAPIView):
     serializer_class = PaymentSerializer
@@ -341,5 +644,65 @@ class PaymentHistoryView(generics.ListAPIView):
     def get_queryset(self):
         user = self.request.user
         if user.is_staff or user.is_superuser:
-            return Payment.objects.all().select_related('user', 'pet')
-        return Payment.objects.filter(user=user).select_related('user', 'pet')
\ No newline at end of file
+            return Payment.objects.all().select_related('user', 'pet', 'archived_pet')
+        return Payment.objects.filter(user=user).select_related('user', 'pet', 'archived_pet')
+
+class SavedSearchListCreateView(generics.ListCreateAPIView):
+    serializer_class = SavedSearchSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return (
+            SavedSearch.objects.filter(user=self.request.user)
+            .annotate(unread_count=Count('matches', filter=Q(matches__is_read=False, matches__pet__availability=True)))
+            .order_by('-created_at')
+        )
+
+class SavedSearchDetailView(generics.RetrieveUpdateDestroyAPIView):
+    serializer_class = SavedSearchSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return SavedSearch.objects.filter(user=self.request.user)
+
+class SavedSearchInboxView(generics.ListAPIView):
+    """Listings that matched the user's saved searches, newest first; still-available ones only."""
+    serializer_class = SavedSearchMatchSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        queryset = SavedSearchMatch.objects.filter(user=self.request.user, pet__availability=True)
+        search = self.request.query_params.get('search')
+        if search:
+            try:
+                queryset = queryset.filter(search_id=int(search))
+            except ValueError:
+                raise ValidationError({'search': 'Expected a saved search id'})
+        if self.request.query_params.get('unread', '').lower() in ('1', 'true', 'yes'):
+            queryset = queryset.filter(is_read=False)
+        return queryset.select_related('search', 'pet__owner')
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        # Cover images for the whole page in one query
+        load_images_data([match.pet for match in page])
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+class SavedSearchInboxReadView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        """Mark the given match ``ids`` read, or every match of ``search`` / the whole inbox without them."""
+        matches = SavedSearchMatch.objects.filter(user=request.user, is_read=False)
+        ids = request.data.get('ids')
+        if ids is not None:
+            if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+                return Response({'ids': 'Expected a list of match ids'}, status=status.HTTP_400_BAD_REQUEST)
+            matches = matches.filter(pk__in=ids)
+        elif request.data.get('search'):
+            try:
+                matches = matches.filter(search_id=int(request.data['search']))
+            except (TypeError, ValueError):
+                return Response({'search': 'Expected a saved search id'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'marked_read': matches.update(is_read=True)})
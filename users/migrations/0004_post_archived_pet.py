@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0011_pet_archive'),
+        ('users', '0003_alter_customuser_profile_picture_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='archived_pet',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='posts', to='pets.archivedpet'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='pet',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='posts', to='pets.pet'),
+        ),
+    ]
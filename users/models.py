@@ -1,7 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 import uuid
-from pets.models import Pet
+from pets.models import ArchivedPet, Pet
 from cloudinary.models import CloudinaryField
 
 class CustomUserManager(BaseUserManager):
@@ -96,10 +96,12 @@ class VerificationRequest(models.Model):
 class Post(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='posts')
-    pet = models.ForeignKey(Pet, on_delete=models.CASCADE, related_name='posts')
+    pet = models.ForeignKey(Pet, on_delete=models.SET_NULL, null=True, blank=True, related_name='posts')
+    archived_pet = models.ForeignKey(ArchivedPet, on_delete=models.SET_NULL, null=True, blank=True, related_name='posts')
     is_paid = models.BooleanField(default=False)
     is_free = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"Post for {self.pet.name} by {self.user.email}"
\ No newline at end of file
+        listing = self.pet or self.archived_pet
+        return f"Post for {listing.name if listing else 'a removed pet'} by {self.user.email}"
\ No newline at end of file
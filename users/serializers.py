@@ -1,14 +1,17 @@
 from rest_framework import serializers
 from .models import CustomUser, VerificationRequest, Post
 from pets.models import Pet
-from cloudinary.uploader import upload
+from pets.assets import release, store_upload
+from pets.uploads import SignedUploadField
+from pets.variants import image_url, image_variants
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
 
 class VerificationRequestSerializer(serializers.ModelSerializer):
-    nid_front = serializers.ImageField(use_url=True)
-    nid_back = serializers.ImageField(use_url=True)
+    nid_front = SignedUploadField(use_url=True)
+    nid_back = SignedUploadField(use_url=True)
 
     class Meta:
         model = VerificationRequest
@@ -58,7 +61,7 @@ class UserRegisterSerializer(serializers.ModelSerializer):
         return CustomUser.objects.create_user(**validated_data)
 
 class UserProfileSerializer(serializers.ModelSerializer):
-    profile_picture = serializers.ImageField(use_url=True, required=False, allow_null=True)
+    profile_picture = SignedUploadField(use_url=True, required=False, allow_null=True)
 
     class Meta:
         model = CustomUser
@@ -67,39 +70,54 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         profile_picture = validated_data.pop('profile_picture', None)
+        previous_picture = instance.profile_picture
         if profile_picture:
-            upload_result = upload(profile_picture)
-            instance.profile_picture = upload_result['public_id']
+            instance.profile_picture = store_upload(
+                profile_picture, CustomUser._meta.get_field('profile_picture'), near_duplicates=False
+            )
         elif profile_picture == '':
             instance.profile_picture = None
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
+        try:
+            instance.save()
+        except Exception:
+            if instance.profile_picture is not previous_picture:
+                release(instance.profile_picture)
+            raise
+        if instance.profile_picture is not previous_picture:
+            # Only once the row no longer points at it
+            transaction.on_commit(lambda: release(previous_picture))
         return instance
 
 # In serializers.py
 class AdminUserSerializer(serializers.ModelSerializer):
     profile_picture = serializers.SerializerMethodField()
+    profile_picture_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = CustomUser
-        fields = ['id', 'username', 'email', 'role', 'is_verified', 'verification_status', 'date_joined', 'phone', 'address', 'city', 'state', 'postcode', 'profile_picture']
+        fields = ['id', 'username', 'email', 'role', 'is_verified', 'verification_status', 'date_joined', 'phone', 'address', 'city', 'state', 'postcode', 'profile_picture', 'profile_picture_variants']
 
     def get_profile_picture(self, obj):
-        return obj.profile_picture.url if obj.profile_picture else None
+        return image_url(obj.profile_picture)
+
+    def get_profile_picture_variants(self, obj):
+        return image_variants(obj.profile_picture) or None
 
 class PostSerializer(serializers.ModelSerializer):
     pet = serializers.PrimaryKeyRelatedField(queryset=Pet.objects.all())
 
     class Meta:
         model = Post
-        fields = ['id', 'user', 'pet', 'is_paid', 'is_free', 'created_at']
-        read_only_fields = ['user', 'is_paid', 'is_free', 'created_at']
+        # archived_pet is set in place of pet once the listing is archived
+        fields = ['id', 'user', 'pet', 'archived_pet', 'is_paid', 'is_free', 'created_at']
+        read_only_fields = ['user', 'archived_pet', 'is_paid', 'is_free', 'created_at']
 
 class AdminPostSerializer(serializers.ModelSerializer):
     class Meta:
         model = Post
-        fields = ['id', 'user', 'pet', 'is_paid', 'is_free', 'created_at']
+        fields = ['id', 'user', 'pet', 'archived_pet', 'is_paid', 'is_free', 'created_at']
 
 class AdminVerificationRequestSerializer(serializers.ModelSerializer):
     nid_front = serializers.ImageField(use_url=True)
@@ -115,7 +133,7 @@ class AdminVerificationRequestSerializer(serializers.ModelSerializer):
             'id': str(obj.user.id),
             'username': obj.user.username,
             'email': obj.user.email,
-            'profile_picture': obj.user.profile_picture.url if obj.user.profile_picture else None,  # add avatar URL
+            'profile_picture': image_url(obj.user.profile_picture),  # add avatar URL
             'role': obj.user.role,
             'is_verified': obj.user.is_verified,
         }
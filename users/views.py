@@ -5,6 +5,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny, BasePermission
 from rest_framework import status, generics
 from .models import CustomUser, Post, VerificationRequest
+from pets.assets import release, store_upload
 from .serializers import (
     UserSerializer, UserRegisterSerializer, UserProfileSerializer, PostSerializer,
     AdminUserSerializer, AdminPostSerializer, VerificationRequestSerializer,
@@ -72,30 +73,51 @@ class VerificationRequestView(generics.CreateAPIView):
     def perform_create(self, serializer):
         user = self.request.user
         nid_number = serializer.validated_data['nid_number']
+
+        # Each NID image is stored once and referenced by both the request
+        # and the user record.
+        nid_front = store_upload(serializer.validated_data['nid_front'], VerificationRequest._meta.get_field('nid_front'), refs=2, near_duplicates=False)
+        nid_back = store_upload(serializer.validated_data['nid_back'], VerificationRequest._meta.get_field('nid_back'), refs=2, near_duplicates=False)
         
-        if CustomUser.objects.exclude(id=user.id).filter(nid_number=nid_number).exists() or \
-           VerificationRequest.objects.exclude(user=user).filter(nid_number=nid_number).exists():
-            serializer.save(
-                user=user,
-                status=VerificationRequest.Status.REJECTED,
-                notes="Verification rejected: National ID number already in use."
-            )
-            user.verification_status = CustomUser.VerificationStatus.REJECTED
-            user.is_verified = False
-        else:
-            serializer.save(user=user, status=VerificationRequest.Status.PENDING)
-            user.verification_status = CustomUser.VerificationStatus.PENDING
-            user.is_verified = False
-        
-        user.phone = serializer.validated_data['phone']
-        user.address = serializer.validated_data['address']
-        user.city = serializer.validated_data['city']
-        user.state = serializer.validated_data['state']
-        user.postcode = serializer.validated_data['postcode']
-        user.nid_number = serializer.validated_data['nid_number']
-        user.nid_front = serializer.validated_data['nid_front']
-        user.nid_back = serializer.validated_data['nid_back']
-        user.save()
+        previous_front, previous_back = user.nid_front, user.nid_back
+        try:
+            with transaction.atomic():
+                if CustomUser.objects.exclude(id=user.id).filter(nid_number=nid_number).exists() or \
+                   VerificationRequest.objects.exclude(user=user).filter(nid_number=nid_number).exists():
+                    serializer.save(
+                        user=user,
+                        nid_front=nid_front,
+                        nid_back=nid_back,
+                        status=VerificationRequest.Status.REJECTED,
+                        notes="Verification rejected: National ID number already in use."
+                    )
+                    user.verification_status = CustomUser.VerificationStatus.REJECTED
+                    user.is_verified = False
+                else:
+                    serializer.save(user=user, nid_front=nid_front, nid_back=nid_back, status=VerificationRequest.Status.PENDING)
+                    user.verification_status = CustomUser.VerificationStatus.PENDING
+                    user.is_verified = False
+
+                user.phone = serializer.validated_data['phone']
+                user.address = serializer.validated_data['address']
+                user.city = serializer.validated_data['city']
+                user.state = serializer.validated_data['state']
+                user.postcode = serializer.validated_data['postcode']
+                user.nid_number = serializer.validated_data['nid_number']
+                user.nid_front = nid_front
+                user.nid_back = nid_back
+                user.save()
+
+                def release_previous():
+                    release(previous_front)
+                    release(previous_back)
+                # Only once the user no longer points at them
+                transaction.on_commit(release_previous)
+        except Exception:
+            # Both references taken above
+            for resource in (nid_front, nid_back, nid_front, nid_back):
+                release(resource)
+            raise
 
 class UserStatusView(APIView):
     permission_classes = [IsAuthenticated]